@@ -0,0 +1,3 @@
+"""
+Benchmarks of the smartcard_control hot paths, runnable without PC/SC library nor reader (see scard_stub)
+"""
@@ -0,0 +1,111 @@
+"""
+Benchmark suite of the hot paths, writing machine readable results
+
+Runs without hardware: the virtual backend is used and smartcard.scard is replaced by a stub when the PC/SC library
+is not available.
+
+usage: python -m benchmarks [--only decode,apdu,observer,monitoring,devices,scheduler] [--output results.json]
+                            [--compare baseline.json] [--threshold PERCENT] [--quick]
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from benchmarks.scard_stub import installScardStub
+
+RESULTS_VERSION = 1
+BENCHMARKS = ('decode', 'apdu', 'observer', 'monitoring', 'devices', 'scheduler')
+
+
+def resultKey(result):
+    return result['name'], tuple(sorted(result['params'].items()))
+
+
+def compareResults(results, baseline, threshold):
+    """Print the variation of each result against the baseline.
+
+    @param threshold: regression threshold in percent
+    @return: list of the regressed results names
+    """
+    baseline_results = {resultKey(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get(resultKey(result))
+        if previous is None or not previous['value']:
+            continue
+        variation = (result['value'] - previous['value']) / previous['value'] * 100
+        regressed = variation < -threshold if result['better'] == 'higher' else variation > threshold
+        print("{:<48} {:<16} {:>14.2f} -> {:>14.2f} {:<10} {:>+8.1f} %{}".format(result['name'], formatParams(result['params']), previous['value'],
+                                                                                result['value'], result['unit'], variation, "  REGRESSION" if regressed else ""))
+        if regressed:
+            regressions.append(result['name'])
+    return regressions
+
+
+def formatParams(params):
+    return ','.join('{}={}'.format(key, value) for key, value in sorted(params.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Hot paths benchmark suite')
+    parser.add_argument("--only", default=','.join(BENCHMARKS), help="comma separated benchmarks to run among: " + ', '.join(BENCHMARKS))
+    parser.add_argument("-o", "--output", help="write the results in this json file")
+    parser.add_argument("--compare", help="json results file to compare with, the exit status is 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=10, help="regression threshold in percent (default: 10)")
+    parser.add_argument("--quick", action="store_true", help="less iterations and readers, for a smoke run")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.only.split(',') if name.strip()]
+    for name in selected:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark: {}".format(name))
+
+    stubbed = installScardStub()
+    from benchmarks import hot_paths
+
+    iterations = 1000 if args.quick else 20000
+    readers_counts = [1, 8] if args.quick else [1, 8, 32, 128]
+    events = 20 if args.quick else 200
+
+    results = []
+    if 'decode' in selected:
+        results += hot_paths.benchDecode(iterations * 10)
+    if 'apdu' in selected:
+        results += hot_paths.benchApdu(iterations)
+    if 'observer' in selected:
+        results += hot_paths.benchConnectionObserver(iterations)
+    if 'monitoring' in selected:
+        results += hot_paths.benchMonitoring(readers_counts, events)
+    if 'devices' in selected:
+        results += hot_paths.benchDevicesListManager([1, 16, 128], iterations // 10)
+    if 'scheduler' in selected:
+        results += hot_paths.benchScheduler(iterations * 5, 100 if args.quick else 1000)
+
+    for result in results:
+        print("{:<48} {:<16} {:>14.2f} {}".format(result['name'], formatParams(result['params']), result['value'], result['unit']))
+
+    output = {'version': RESULTS_VERSION,
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+              'scard_stub': stubbed,
+              'results': results}
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(output, output_file, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        print()
+        regressions = compareResults(results, baseline, args.threshold)
+        if regressions:
+            print("{} regression(s) above {} %".format(len(regressions), args.threshold))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
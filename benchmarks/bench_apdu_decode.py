@@ -0,0 +1,54 @@
+"""
+Benchmark of the ISO 7816 status word decoding
+
+Compares the precompiled table lookup of apdu_utils.decodeStatusWord with the former linear scan over
+APDU_ISO7816_RESPONSE_LIST, for status words located at the beginning, the middle and the end of the csv table,
+matched by a wildcard row or unknown.
+
+usage: python benchmarks/bench_apdu_decode.py [-n NUMBER]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from smartcard_control.utils import apdu_utils
+
+STATUS_WORDS = [('first row', 0x61, 0x10),
+                ('middle row', 0x6A, 0x82),
+                ('last exact row', 0x9F, 0x04),
+                ('counter 63CX', 0x63, 0xC2),
+                ('wildcard 9xXX', 0x9B, 0x42),
+                ('unknown', 0x12, 0x34)]
+
+
+def linearScan(sw1, sw2):
+    """Former implementation of parseIsoApduResponse (without the string formatting)."""
+    sw1 = '{:02X}'.format(sw1)
+    sw2 = '{:02X}'.format(sw2)
+    for response in apdu_utils.APDU_ISO7816_RESPONSE_LIST:
+        if sw1.upper() in response.values() and sw2.upper() in response.values():
+            return response
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ISO 7816 status word decoding benchmark')
+    parser.add_argument("-n", "--number", type=int, default=100000, help="number of decodings per status word")
+    args = parser.parse_args()
+
+    setup_time = timeit.timeit(apdu_utils.initIsoApduStatusWordTable, number=1)
+    print("table load : {:.2f} ms".format(setup_time * 1e3))
+    apdu_utils.initIsoApduResponseList()
+
+    print("{:<16} {:>14} {:>14}".format("status word", "table (ns)", "scan (ns)"))
+    for name, sw1, sw2 in STATUS_WORDS:
+        table_time = timeit.timeit(lambda: apdu_utils.decodeStatusWord(sw1, sw2), number=args.number)
+        scan_time = timeit.timeit(lambda: linearScan(sw1, sw2), number=args.number)
+        print("{:<16} {:>14.0f} {:>14.0f}".format(name, table_time / args.number * 1e9, scan_time / args.number * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark of the APDU logging
+
+Measures the cost of ConsoleCardConnectionObserver.update for a command and its response, compared with the former
+implementation formatting the APDUs before calling logging, with logging off (CRITICAL, the default without -v) and
+with logging on (INFO) written to a file directly or through a queue handler, the file being on a fast or a slow storage.
+
+usage: python benchmarks/bench_apdu_logging.py [-n NUMBER] [--write-latency S]
+"""
+import argparse
+import logging
+import os
+import queue
+import sys
+import tempfile
+import time
+import timeit
+from logging.handlers import QueueHandler, QueueListener
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from smartcard.CardConnectionEvent import CardConnectionEvent
+from smartcard.util import toHexString
+
+from smartcard_control.model.card_manager import ConsoleCardConnectionObserver
+from smartcard_control.utils import apdu_utils
+from smartcard_control.utils.apdu_utils import parseIsoApduResponse
+
+COMMAND = CardConnectionEvent('command', [apdu_utils.VERIFY_PIN_1234_CMD, 2])
+RESPONSE = CardConnectionEvent('response', [[0x01, 0x02, 0x03, 0x04], 0x90, 0x00])
+
+
+def formerUpdate(cardconnection, ccevent):
+    """Former implementation of ConsoleCardConnectionObserver.update (command and response events)."""
+    if 'command' == ccevent.type:
+        logging.info('command > %s ', toHexString(ccevent.args[0]))
+
+    elif 'response' == ccevent.type:
+        message = toHexString(ccevent.args[0])
+        sw1 = toHexString([ccevent.args[-2]])
+        sw2 = toHexString([ccevent.args[-1]])
+        logging.debug('response : %s %s %s', toHexString([ccevent.args[-2]]), toHexString([ccevent.args[-1]]), toHexString(ccevent.args[0]))
+        if not message:
+            logging.info(parseIsoApduResponse(sw1, sw2))
+        else:
+            logging.info(parseIsoApduResponse(sw1, sw2, message))
+
+
+class SlowFileHandler(logging.FileHandler):
+    """File handler on a slow storage."""
+
+    def __init__(self, filename, write_latency):
+        super().__init__(filename)
+        self.write_latency = write_latency
+
+    def emit(self, record):
+        time.sleep(self.write_latency)
+        super().emit(record)
+
+
+def measure(update, number):
+    def exchange():
+        update(None, COMMAND)
+        update(None, RESPONSE)
+    return timeit.timeit(exchange, number=number) / number * 1e9
+
+
+def setHandler(handler, level):
+    root = logging.getLogger()
+    for old_handler in list(root.handlers):
+        root.removeHandler(old_handler)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='APDU logging benchmark')
+    parser.add_argument("-n", "--number", type=int, default=20000, help="number of command/response exchanges")
+    parser.add_argument("--write-latency", type=float, default=0.001, help="time taken by each write to the slow storage, in seconds")
+    args = parser.parse_args()
+
+    apdu_utils.initIsoApduStatusWordTable()
+    update = ConsoleCardConnectionObserver().update
+    formatter = logging.Formatter("%(asctime)s  [%(levelname)s] %(module)s/%(lineno)d - %(message)s")
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        file_handler = logging.FileHandler(os.path.join(log_dir, 'bench.log'))
+        file_handler.setFormatter(formatter)
+
+        print("{:<30} {:>14} {:>14}".format("per command + response", "former (ns)", "current (ns)"))
+        setHandler(file_handler, logging.CRITICAL)
+        print("{:<30} {:>14.0f} {:>14.0f}".format("logging off (CRITICAL)", measure(formerUpdate, args.number), measure(update, args.number)))
+
+        setHandler(file_handler, logging.INFO)
+        print("{:<30} {:>14.0f} {:>14.0f}".format("INFO, file handler", measure(formerUpdate, args.number), measure(update, args.number)))
+
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, file_handler)
+        listener.start()
+        setHandler(QueueHandler(log_queue), logging.INFO)
+        print("{:<30} {:>14.0f} {:>14.0f}".format("INFO, queue handler", measure(formerUpdate, args.number), measure(update, args.number)))
+        listener.stop()
+
+        slow_number = max(args.number // 100, 1)
+        slow_file_handler = SlowFileHandler(os.path.join(log_dir, 'bench_slow.log'), args.write_latency)
+        slow_file_handler.setFormatter(formatter)
+        setHandler(slow_file_handler, logging.INFO)
+        print("{:<30} {:>14.0f} {:>14.0f}".format("INFO, slow file handler", measure(formerUpdate, slow_number), measure(update, slow_number)))
+
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, slow_file_handler)
+        listener.start()
+        setHandler(QueueHandler(log_queue), logging.INFO)
+        print("{:<30} {:>14.0f} {:>14.0f}".format("INFO, slow file queue handler", measure(formerUpdate, slow_number), measure(update, slow_number)))
+        setHandler(logging.NullHandler(), logging.CRITICAL)
+        listener.stop()
+        file_handler.close()
+        slow_file_handler.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark of the card and reader monitoring
+
+Runs card and reader observers on the virtual backend while cards are removed/inserted at a fixed rate,
+and reports the number of threads, the process CPU usage and the rate of calls to the PC/SC layer.
+
+usage: python benchmarks/bench_monitoring.py [--observers N] [--readers N] [--rate EVENTS_PER_S] [--duration S]
+                                             [--observer-delay S] [--queued] [--coalescing-window S]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from smartcard_control.model.backend.backend import setBackend
+from smartcard_control.model.backend.virtual_backend import VirtualBackend
+from smartcard_control.model.monitoring.card_monitoring import CardObserver, CardMonitor
+from smartcard_control.model.monitoring.reader_monitoring import ReaderObserver, ReaderMonitor
+
+
+class CountingBackend(object):
+    """Backend proxy counting the calls to the PC/SC layer."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.calls = Counter()
+
+    def __getattr__(self, name):
+        attribute = getattr(self.backend, name)
+        if not name.startswith('SCard') or name == 'SCardGetErrorMessage':
+            return attribute
+
+        def call(*args):
+            self.calls[name] += 1
+            return attribute(*args)
+        return call
+
+
+class CountingCardObserver(CardObserver):
+
+    def __init__(self, delay=0):
+        super().__init__()
+        self.events = 0
+        self.delay = delay
+
+    def update(self, handlers):
+        added_cards, removed_cards = handlers
+        self.events += len(added_cards) + len(removed_cards)
+        if self.delay:
+            time.sleep(self.delay)
+
+
+class CountingReaderObserver(ReaderObserver):
+
+    def __init__(self):
+        super().__init__()
+        self.events = 0
+
+    def update(self, handlers):
+        added_readers, removed_readers = handlers
+        self.events += len(added_readers) + len(removed_readers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Card and reader monitoring benchmark')
+    parser.add_argument("--observers", type=int, default=12, help="number of card observers (and of reader observers)")
+    parser.add_argument("--readers", type=int, default=32, help="number of virtual readers")
+    parser.add_argument("--rate", type=float, default=200, help="card insertions/removals per second")
+    parser.add_argument("--duration", type=float, default=3, help="duration of the measure in seconds")
+    parser.add_argument("--observer-delay", type=float, default=0, help="time spent by the card observers in each notification, in seconds")
+    parser.add_argument("--queued", action="store_true", help="notify the card observers on their own worker threads")
+    parser.add_argument("--coalescing-window", type=float, default=0, help="coalescing window of the queued card observers, in seconds")
+    args = parser.parse_args()
+
+    virtual_backend = VirtualBackend(readers=args.readers)
+    backend = CountingBackend(virtual_backend)
+    setBackend(backend)
+
+    base_threads = threading.active_count()
+    card_observers = [CountingCardObserver(args.observer_delay) for _ in range(args.observers)]
+    reader_observers = [CountingReaderObserver() for _ in range(args.observers)]
+    registered_card_observers = []
+    for observer in card_observers:
+        registered_card_observers.append(CardMonitor().addObserver(observer, polling_timeout=100, queued=args.queued, coalescing_window=args.coalescing_window))
+    for observer in reader_observers:
+        ReaderMonitor().addObserver(observer, polling_timeout=100)
+    time.sleep(0.5)
+    monitoring_threads = threading.active_count() - base_threads
+
+    # Each reader has its card removed then inserted back
+    period = 2 * args.readers / args.rate
+    schedule = []
+    for i in range(args.readers):
+        schedule.append((i / args.rate, 'remove', i, None))
+        schedule.append((period / 2 + i / args.rate, 'insert', i, None))
+    backend.calls.clear()
+    # Counters of the setup (devices present reported to the new observers), not part of the measure
+    setup_events = sum(o.events for o in card_observers)
+    if args.queued:
+        setup_dropped_events = sum(o.dropped_events for o in registered_card_observers)
+        setup_coalesced_events = sum(o.coalesced_events for o in registered_card_observers)
+    schedule_thread = virtual_backend.playSchedule(schedule, repeat=0)
+    cpu_start = time.process_time()
+    start = time.monotonic()
+    time.sleep(args.duration)
+    cpu_time = time.process_time() - cpu_start
+    elapsed = time.monotonic() - start
+    calls = dict(backend.calls)
+    received_events = (sum(o.events for o in card_observers) - setup_events) / len(card_observers)
+    schedule_thread.stop()
+    if args.queued:
+        dropped_events = (sum(o.dropped_events for o in registered_card_observers) - setup_dropped_events) / len(card_observers)
+        coalesced_events = (sum(o.coalesced_events for o in registered_card_observers) - setup_coalesced_events) / len(card_observers)
+
+    CardMonitor().deleteObservers()
+    ReaderMonitor().deleteObservers()
+
+    print("observers          : {} card + {} reader".format(args.observers, args.observers))
+    print("monitoring threads : {}".format(monitoring_threads))
+    print("cpu usage          : {:.1f} %".format(100 * cpu_time / elapsed))
+    print("card events        : {:.0f} /s played, {:.0f} /s received by each card observer".format(
+        schedule_thread.events_count / elapsed, received_events / elapsed))
+    if args.queued:
+        print("queued observers   : {:.0f} dropped, {:.0f} coalesced events by each card observer".format(dropped_events, coalesced_events))
+    for name, count in sorted(calls.items()):
+        print("{:<18} : {:.0f} calls/s".format(name, count / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Benchmarks of the hot paths: status word decoding, APDU logging observer, monitoring loop, devices list manager and
+reader queue scheduling
+
+Each benchmark returns a list of results: {'name', 'params', 'value', 'unit', 'better'} where better is 'higher' or
+'lower'. They are run by python -m benchmarks.
+"""
+import logging
+import os
+import threading
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+from smartcard.Card import Card
+from smartcard.CardConnectionEvent import CardConnectionEvent
+
+from smartcard_control.model.backend.backend import setBackend
+from smartcard_control.model.backend.virtual_backend import VirtualBackend
+from smartcard_control.model.card_manager import ConsoleCardConnectionObserver, DevicesListManager, DevicesSnapshot
+from smartcard_control.model.card_scheduler import CardScheduler, ScheduledTask, HIGH_PRIORITY, LOW_PRIORITY
+from smartcard_control.model.card_session_pool import CardSession
+from smartcard_control.model.monitoring.card_monitoring import CardObserver, CardMonitor
+from smartcard_control.utils import apdu_utils
+from smartcard_control.utils.apdu import Apdu, Response
+
+from benchmarks.bench_monitoring import CountingBackend
+
+STATUS_WORDS = [('90', '00'), ('61', '10'), ('6A', '82'), ('63', 'C2'), ('9B', '42'), ('12', '34')]
+
+
+def result(name, value, unit, better, **params):
+    return {'name': name, 'params': params, 'value': value, 'unit': unit, 'better': better}
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(int(len(values) * percent / 100.0), len(values) - 1)]
+
+
+def benchDecode(number):
+    """parseIsoApduResponse throughput over a mix of status words."""
+    apdu_utils.initIsoApduStatusWordTable()
+
+    def decode():
+        for sw1, sw2 in STATUS_WORDS:
+            apdu_utils.parseIsoApduResponse(sw1, sw2, '01 02')
+
+    elapsed = timeit.timeit(decode, number=number)
+    return [result('decode.parseIsoApduResponse', number * len(STATUS_WORDS) / elapsed, 'calls/s', 'higher')]
+
+
+def benchApdu(number):
+    """Custom APDU input parsing and response rendering: lists of int (split/int, toHexString) against Apdu/Response."""
+    from smartcard.util import toHexString
+    text = '00 A4 04 00 0E 31 50 41 59 2E 53 59 53 2E 44 44 46 30 31 00'
+    data = list(range(64))
+
+    def parseList():
+        return [int(s, base=16) for s in text.split(" ")]
+
+    def renderList():
+        return toHexString(data), toHexString([0x90]), toHexString([0x00])
+
+    def renderResponse():
+        response = Response(data, 0x90, 0x00)
+        return response.data_hex, response.sw1, response.sw2
+
+    results = []
+    for name, function in (('list', parseList), ('Apdu.fromHex', lambda: Apdu.fromHex(text))):
+        results.append(result('apdu.parse', timeit.timeit(function, number=number) / number * 1e9, 'ns/apdu', 'lower', implementation=name))
+    for name, function in (('toHexString', renderList), ('Response', renderResponse)):
+        results.append(result('apdu.render_response', timeit.timeit(function, number=number) / number * 1e9, 'ns/response', 'lower', implementation=name))
+    return results
+
+
+def benchConnectionObserver(number):
+    """ConsoleCardConnectionObserver.update cost per event, logging off and on."""
+    observer = ConsoleCardConnectionObserver()
+    command = CardConnectionEvent('command', [apdu_utils.VERIFY_PIN_1234_CMD, 2])
+    response = CardConnectionEvent('response', [[0x01, 0x02, 0x03, 0x04], 0x90, 0x00])
+
+    class Connection(object):
+        def getReader(self):
+            return 'Reader 00 00'
+
+    connection = Connection()
+
+    def exchange():
+        observer.update(connection, command)
+        observer.update(connection, response)
+
+    results = []
+    root = logging.getLogger()
+    handlers = root.handlers
+    level = root.level
+    with open(os.devnull, 'w') as devnull:
+        handler = logging.StreamHandler(devnull)
+        handler.setFormatter(logging.Formatter("%(asctime)s  [%(levelname)s] %(module)s/%(lineno)d - %(message)s"))
+        root.handlers = [handler]
+        for level_name in ('CRITICAL', 'INFO'):
+            root.setLevel(getattr(logging, level_name))
+            elapsed = timeit.timeit(exchange, number=number)
+            results.append(result('observer.ConsoleCardConnectionObserver.update', elapsed / (2 * number) * 1e9, 'ns/event', 'lower', level=level_name))
+    root.handlers = handlers
+    root.setLevel(level)
+    return results
+
+
+class LatencyCardObserver(CardObserver):
+
+    def __init__(self):
+        super().__init__()
+        self.event = threading.Event()
+        self.time = None
+        self.cards = 0
+
+    def update(self, handlers):
+        added_cards, removed_cards = handlers
+        self.cards += len(added_cards) - len(removed_cards)
+        self.time = time.perf_counter()
+        self.event.set()
+
+
+def benchMonitoring(readers_counts, events):
+    """Monitoring loop event latency (card removal/insertion to observer notification) and cost as the reader count grows."""
+    results = []
+    for readers in readers_counts:
+        virtual_backend = VirtualBackend(readers=readers)
+        backend = CountingBackend(virtual_backend)
+        setBackend(backend)
+
+        observer = LatencyCardObserver()
+        CardMonitor().addObserver(observer, polling_timeout=100)
+        deadline = time.monotonic() + 10
+        while observer.cards < readers and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        readers_names = virtual_backend.getReaders()
+        latencies = []
+        backend.calls.clear()
+        cpu_start = time.process_time()
+        for i in range(events):
+            reader = readers_names[(i // 2) % readers]
+            observer.event.clear()
+            start = time.perf_counter()
+            if i % 2:
+                virtual_backend.insertCard(reader)
+            else:
+                virtual_backend.removeCard(reader)
+            if observer.event.wait(5):
+                latencies.append(observer.time - start)
+        cpu_time = time.process_time() - cpu_start
+        iterations = backend.calls['SCardGetStatusChange']
+
+        CardMonitor().deleteObserver(observer)
+        setBackend(virtual_backend)
+
+        results.append(result('monitoring.event_latency.p50', percentile(latencies, 50) * 1e6, 'us', 'lower', readers=readers))
+        results.append(result('monitoring.event_latency.p99', percentile(latencies, 99) * 1e6, 'us', 'lower', readers=readers))
+        results.append(result('monitoring.iterations_per_event', iterations / events, 'iterations', 'lower', readers=readers))
+        results.append(result('monitoring.cpu_per_iteration', cpu_time / max(iterations, 1) * 1e6, 'us', 'lower', readers=readers))
+        results.append(result('monitoring.missed_events', events - len(latencies), 'events', 'lower', readers=readers))
+    return results
+
+
+def benchDevicesListManager(cards_counts, number):
+    """DevicesListManager card observer update cost per card event (insertion then removal of every card)."""
+    results = []
+    observer = DevicesListManager.ManagerCardObserver()
+    snapshot = DevicesListManager.snapshot
+    for cards_count in cards_counts:
+        cards = [Card('Reader {:03d} 00'.format(i), [0x3B, 0x80, 0x80, 0x01, 0x01]) for i in range(cards_count)]
+
+        def insertRemove():
+            observer.update((cards, []))
+            observer.update(([], cards))
+
+        DevicesListManager.snapshot = DevicesSnapshot()
+        elapsed = timeit.timeit(insertRemove, number=number)
+        results.append(result('devices_list_manager.card_update', elapsed / (2 * number * cards_count) * 1e9, 'ns/card', 'lower', cards=cards_count))
+    DevicesListManager.snapshot = snapshot
+    return results
+
+
+def benchScheduler(number, backlog):
+    """Reader queue scheduling: push/pop cost per task, and latency of a health check queued behind a bulk job backlog,
+    at high priority against a single FIFO queue (same priority and client as the bulk job)."""
+    results = []
+    scheduler = CardScheduler()
+    tasks = [ScheduledTask(None, None, (), i % 3, i % 4) for i in range(number)]
+    start = time.perf_counter()
+    for task in tasks:
+        scheduler.push(task)
+    while scheduler.pop()[0] is not None:
+        pass
+    results.append(result('scheduler.push_pop', (time.perf_counter() - start) / number * 1e9, 'ns/task', 'lower'))
+
+    def exchange():
+        # Simulated APDU exchange, releasing the GIL as SCardTransmit
+        time.sleep(0.0001)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for name, priority, client in (('fifo', LOW_PRIORITY, 'bulk'), ('priority', HIGH_PRIORITY, 'health')):
+            session = CardSession('Reader 00 00', None, executor)
+            bulk = [session.submit(exchange, priority=LOW_PRIORITY, client='bulk') for _ in range(backlog)]
+            start = time.perf_counter()
+            session.submit(time.perf_counter, priority=priority, client=client).result()
+            latency = time.perf_counter() - start
+            for future in bulk:
+                future.result()
+            results.append(result('scheduler.health_check_latency', latency * 1e6, 'us', 'lower', backlog=backlog, scheduling=name))
+    return results
@@ -0,0 +1,105 @@
+"""
+Stub of the smartcard.scard module, to run the benchmarks without the PC/SC library nor any reader
+
+The constants have the pcsc-lite values and the SCard* functions answer SCARD_E_NO_SERVICE: the benchmarks only use
+the virtual backend, smartcard.scard is only imported for its constants.
+"""
+import sys
+import types
+
+SCARD_CONSTANTS = {
+    'SCARD_S_SUCCESS': 0x00000000,
+    'SCARD_E_CANCELLED': 0x80100002,
+    'SCARD_E_INVALID_HANDLE': 0x80100003,
+    'SCARD_E_INVALID_PARAMETER': 0x80100004,
+    'SCARD_E_INVALID_VALUE': 0x80100011,
+    'SCARD_E_TIMEOUT': 0x8010000A,
+    'SCARD_E_SHARING_VIOLATION': 0x8010000B,
+    'SCARD_E_NO_SMARTCARD': 0x8010000C,
+    'SCARD_E_UNKNOWN_READER': 0x80100009,
+    'SCARD_E_NOT_TRANSACTED': 0x80100016,
+    'SCARD_E_READER_UNAVAILABLE': 0x80100017,
+    'SCARD_E_NO_SERVICE': 0x8010001D,
+    'SCARD_E_SERVICE_STOPPED': 0x8010001E,
+    'SCARD_E_NO_READERS_AVAILABLE': 0x8010002E,
+    'SCARD_W_UNRESPONSIVE_CARD': 0x80100066,
+    'SCARD_W_UNPOWERED_CARD': 0x80100067,
+    'SCARD_W_RESET_CARD': 0x80100068,
+    'SCARD_W_REMOVED_CARD': 0x80100069,
+    'SCARD_SCOPE_USER': 0,
+    'SCARD_SCOPE_TERMINAL': 1,
+    'SCARD_SCOPE_SYSTEM': 2,
+    'SCARD_SHARE_EXCLUSIVE': 1,
+    'SCARD_SHARE_SHARED': 2,
+    'SCARD_SHARE_DIRECT': 3,
+    'SCARD_LEAVE_CARD': 0,
+    'SCARD_RESET_CARD': 1,
+    'SCARD_UNPOWER_CARD': 2,
+    'SCARD_EJECT_CARD': 3,
+    'SCARD_STATE_UNAWARE': 0x0000,
+    'SCARD_STATE_IGNORE': 0x0001,
+    'SCARD_STATE_CHANGED': 0x0002,
+    'SCARD_STATE_UNKNOWN': 0x0004,
+    'SCARD_STATE_UNAVAILABLE': 0x0008,
+    'SCARD_STATE_EMPTY': 0x0010,
+    'SCARD_STATE_PRESENT': 0x0020,
+    'SCARD_STATE_ATRMATCH': 0x0040,
+    'SCARD_STATE_EXCLUSIVE': 0x0080,
+    'SCARD_STATE_INUSE': 0x0100,
+    'SCARD_STATE_MUTE': 0x0200,
+    'SCARD_STATE_UNPOWERED': 0x0400,
+    'SCARD_PROTOCOL_UNDEFINED': 0,
+    'SCARD_PROTOCOL_T0': 1,
+    'SCARD_PROTOCOL_T1': 2,
+    'SCARD_PROTOCOL_RAW': 4,
+    'SCARD_PROTOCOL_T15': 8,
+    'SCARD_PROTOCOL_ANY': 3,
+    'SCARD_PCI_T0': 1,
+    'SCARD_PCI_T1': 2,
+    'SCARD_PCI_RAW': 4,
+    'INFINITE': 0xFFFFFFFF,
+}
+
+
+def _noService(*args):
+    return SCARD_CONSTANTS['SCARD_E_NO_SERVICE'], None
+
+
+def _getErrorMessage(hresult):
+    return 'PC/SC stub error: 0x{:08X}'.format(hresult & 0xFFFFFFFF)
+
+
+def createScardStub():
+    module = types.ModuleType('smartcard.scard', __doc__)
+    module.__dict__.update(SCARD_CONSTANTS)
+    module.SCardGetErrorMessage = _getErrorMessage
+
+    def __getattr__(name):
+        # Any other SCard* function of the PC/SC API
+        if name.startswith('SCard'):
+            return _noService
+        raise AttributeError("module 'smartcard.scard' has no attribute '{}'".format(name))
+
+    module.__getattr__ = __getattr__
+    return module
+
+
+def installScardStub():
+    """Replace smartcard.scard by the stub if it cannot be imported (no PC/SC library).
+
+    It must be called before importing smartcard or smartcard_control modules.
+
+    @return: True if the stub was installed, False if the real module is used
+    """
+    try:
+        import smartcard.scard
+        return False
+    except ImportError:
+        # Forget the partially imported pyscard modules, they are imported again with the stub
+        for name in [name for name in sys.modules if name == 'smartcard' or name.startswith('smartcard.')]:
+            del sys.modules[name]
+
+    sys.modules['smartcard.scard'] = createScardStub()
+    import smartcard
+    smartcard.scard = sys.modules['smartcard.scard']
+    return True
@@ -10,6 +10,17 @@ if sys.version_info[0:2] < (2, 6):
     raise RuntimeError("smartcard_control requires Python 3.0+ to build.")
 
 from smartcard_control.controller.main_controller import VERSION_STR
+from smartcard_control.utils import apdu_response_table_gen
+
+
+class BuildPyCommand(build_py):
+    """Compile the ISO 7816 status word table from apdu_response.csv before building"""
+
+    def run(self):
+        with open(apdu_response_table_gen.TABLE_FILE, 'w', encoding='utf-8') as table_file:
+            table_file.write(apdu_response_table_gen.renderTableModule())
+        build_py.run(self)
+
 
 setup(name="smartcard_control",
       version=VERSION_STR,
@@ -18,9 +29,12 @@ setup(name="smartcard_control",
       author_email="elouan.p@gmail.com",
       url="https://github.com/ElouanPetereau/smartcard_control",
       packages=find_packages(include=['smartcard_control', 'smartcard_control.*']),
+      package_data={'smartcard_control.utils': ['apdu_response.csv']},
+      cmdclass={'build_py': BuildPyCommand},
       entry_points={
           'console_scripts': [
               'smartcard_control = smartcard_control.controller.main_controller:run',
+              'smartcard_control_daemon = smartcard_control.controller.daemon:run',
           ]
       },
       install_requires=['pyscard >= 2.0.0'],
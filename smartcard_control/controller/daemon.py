@@ -0,0 +1,389 @@
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+from contextlib import nullcontext
+from concurrent.futures import TimeoutError
+
+from smartcard.CardType import AnyCardType
+from smartcard.scard import SCARD_SHARE_SHARED, SCARD_LEAVE_CARD
+from smartcard.util import toBytes
+
+from smartcard_control.controller.main_controller import setup_logging, VERSION_STR
+from smartcard_control.model.backend.backend import BACKEND_NAMES, setBackend
+from smartcard_control.model.backend.virtual_backend import VirtualBackend
+from smartcard_control.model.card_manager import DevicesListManager
+from smartcard_control.model.card_session_pool import CardSessionPool
+from smartcard_control.utils.apdu import Apdu
+from smartcard_control.utils.constants import SHARE_MODES
+
+"""
+Headless daemon owning the devices list manager and the card connections, serving a local (Unix) socket API
+
+The daemon keeps a connection open to every present card (CardSessionPool): clients share these warm connections, the
+APDUs of the clients being queued and run in order on each reader.
+
+Protocol: each request is a json object answered by a json object with the same "id". The messages are either json lines
+(the client sends '{' first) or length-prefixed frames (4 bytes big endian length followed by the utf-8 json).
+
+    {"id": 1, "op": "list"}
+        -> {"id": 1, "version": 3, "readers": ["..."], "cards": [{"reader": "...", "atr": "3B 80 80 01 01"}], "sessions": ["..."]}
+    {"id": 2, "op": "connect", "reader": "..."}
+        -> {"id": 2, "reader": "...", "atr": "3B 80 80 01 01"}
+    {"id": 3, "op": "transmit", "reader": "...", "apdu": "00A4040000", "auto_response": true}
+        -> {"id": 3, "data": "6F10...", "sw": "9000", "round_trips": 2}
+    {"id": 4, "op": "batch", "reader": "...", "apdus": ["...", "..."], "stop_on_error": true}
+        -> {"id": 4, "responses": [{"data": "...", "sw": "9000", "round_trips": 1}, ...]}
+    {"id": 5, "op": "metrics"}
+        -> {"id": 5, "readers": {"...": {"high": {"depth": 0, "p99_wait": 0.0012, ...}, "normal": {...}, "low": {...}}}}
+    errors: {"id": 4, "error": "message", "type": "CardConnectionException"}
+
+The transmit and batch requests take an optional "priority" ("high", "normal" or "low") and "deadline" (maximum time
+to wait in the reader queue, in seconds), the connections of the clients being served in turn (see CardScheduler).
+
+usage: python -m smartcard_control.controller.daemon [--socket PATH] [-b virtual] [-v...]
+"""
+
+DEFAULT_SOCKET_PATH = os.path.join(os.environ.get('XDG_RUNTIME_DIR', tempfile.gettempdir()), 'smartcard_control.sock')
+# Time to wait for the result of a request, in seconds
+DEFAULT_REQUEST_TIMEOUT = 30
+# Largest accepted frame or json line, in bytes
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+FRAME_HEADER = struct.Struct('>I')
+
+
+def readFrame(stream):
+    """Read a length-prefixed frame.
+
+    @return: the frame payload, None at the end of the stream
+    """
+    header = stream.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    length = FRAME_HEADER.unpack(header)[0]
+    if length > MAX_MESSAGE_SIZE:
+        raise Exception("Frame of {} bytes larger than {} bytes".format(length, MAX_MESSAGE_SIZE))
+    payload = stream.read(length)
+    if len(payload) < length:
+        return None
+    return payload
+
+
+def writeFrame(stream, payload):
+    stream.write(FRAME_HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+class CardDaemon(object):
+    """Serve the list/connect/transmit/batch API over a Unix socket, on the connections of a CardSessionPool.
+
+    Each client is served by its own thread, its requests being answered in order.
+    """
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            daemon = self.server.card_daemon
+            first = self.rfile.peek(1)[:1]
+            json_lines = first == b'{'
+            logging.debug("daemon client connected (%s)", 'json lines' if json_lines else 'frames')
+            while True:
+                try:
+                    if json_lines:
+                        message = self.rfile.readline(MAX_MESSAGE_SIZE + 1)
+                        if not message:
+                            return
+                        if not message.strip():
+                            continue
+                    else:
+                        message = readFrame(self.rfile)
+                        if message is None:
+                            return
+                except Exception as e:
+                    logging.warning("daemon client error: %s", e)
+                    return
+
+                response = json.dumps(daemon.handleMessage(message, client=id(self))).encode('utf-8')
+                try:
+                    if json_lines:
+                        self.wfile.write(response + b'\n')
+                        self.wfile.flush()
+                    else:
+                        writeFrame(self.wfile, response)
+                except OSError as e:
+                    logging.debug("daemon client disconnected: %s", e)
+                    return
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, pool=None, request_timeout=DEFAULT_REQUEST_TIMEOUT):
+        """
+        @param socket_path: path of the Unix socket
+        @param pool: CardSessionPool of the card connections, a new one if None
+        @param request_timeout: time to wait for the result of a request, in seconds
+        """
+        self.socket_path = socket_path
+        self.pool = CardSessionPool() if pool is None else pool
+        self.request_timeout = request_timeout
+        self.__server = None
+        self.__thread = None
+
+        self.__operations = {'list': self.__list,
+                             'connect': self.__connect,
+                             'transmit': self.__transmit,
+                             'batch': self.__batch,
+                             'metrics': self.__metrics}
+
+    def start(self):
+        """Start the devices list manager, the session pool and the socket server thread."""
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+                raise Exception("A daemon is already listening on " + self.socket_path)
+            except OSError:
+                # Socket left by a stopped daemon
+                os.unlink(self.socket_path)
+            finally:
+                probe.close()
+
+        DevicesListManager.getInstance().start()
+        self.pool.start()
+
+        self.__server = CardDaemon.Server(self.socket_path, CardDaemon.RequestHandler)
+        self.__server.card_daemon = self
+        os.chmod(self.socket_path, 0o600)
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name='daemon', daemon=True)
+        self.__thread.start()
+        logging.info("daemon listening on %s", self.socket_path)
+
+    def stop(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        self.pool.stop()
+        DevicesListManager.getInstance().stop()
+
+    def handleMessage(self, message, client=None):
+        """Decode and run a request.
+
+        @param message: json request (bytes or str)
+        @param client: identifier of the client connection, for the round-robin between the clients
+        @return: the response (dict)
+        """
+        request_id = None
+        try:
+            request = json.loads(message)
+            if not isinstance(request, dict):
+                raise Exception("Request is not a json object")
+            request_id = request.get('id')
+            operation = self.__operations.get(request.get('op'))
+            if operation is None:
+                raise Exception("Unknown operation: {}".format(request.get('op')))
+            response = operation(request, client)
+        except TimeoutError:
+            response = {'error': "Request timeout", 'type': 'TimeoutError'}
+        except Exception as e:
+            response = {'error': str(e) or repr(e), 'type': e.__class__.__name__}
+        response['id'] = request_id
+        return response
+
+    def __list(self, request, client):
+        snapshot = DevicesListManager.getSnapshot()
+        return {'version': snapshot.version,
+                'readers': list(snapshot.readers),
+                'cards': [{'reader': reader, 'atr': atr} for reader, atr in snapshot.cards],
+                'sessions': self.pool.getReaders()}
+
+    def __connect(self, request, client):
+        reader = self.__getReader(request)
+        atr = DevicesListManager.getSnapshot().getAtr(reader)
+        if atr is None:
+            raise Exception("No card on reader: " + reader)
+        session = self.pool.openSession(reader, toBytes(atr))
+        if session is None:
+            raise Exception("The card of reader {} does not match the card type".format(reader))
+        session.opened.result(self.request_timeout)
+        return {'reader': reader, 'atr': atr}
+
+    def __transmit(self, request, client):
+        session = self.pool.getSession(self.__getReader(request))
+        apdu = Apdu.fromHex(request.get('apdu', ''))
+        future = session.submit(self.__runApdus, session.card_manager, [apdu], request.get('auto_response'), False,
+                                priority=request.get('priority'), client=client, deadline=request.get('deadline'))
+        return self.__getResult(future)[0]
+
+    def __batch(self, request, client):
+        session = self.pool.getSession(self.__getReader(request))
+        apdus = [Apdu.fromHex(apdu) for apdu in request.get('apdus', [])]
+        # A single task: the APDUs of the batch are not interleaved with the ones of other clients
+        future = session.submit(self.__runApdus, session.card_manager, apdus, request.get('auto_response'), request.get('stop_on_error', False),
+                                priority=request.get('priority'), client=client, deadline=request.get('deadline'))
+        return {'responses': self.__getResult(future)}
+
+    def __getResult(self, future):
+        # A timed out task is cancelled, so its APDUs are not sent once the client is told they were not. If it is already
+        # running, its result is awaited: a client retrying could send a command (write, VERIFY...) twice otherwise
+        try:
+            return future.result(self.request_timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise
+            return future.result()
+
+    def __metrics(self, request, client):
+        return {'readers': self.pool.getMetrics()}
+
+    @staticmethod
+    def __runApdus(card_manager, apdus, auto_response, stop_on_error):
+        responses = []
+        # One PC/SC transaction: the other processes cannot send commands in the middle of a batch either
+        with card_manager.transaction() if len(apdus) > 1 else nullcontext():
+            for apdu in apdus:
+                response = card_manager.transmitApdu(apdu, auto_response)
+                responses.append({'data': response.data.hex().upper(), 'sw': '{:04X}'.format(response.sw), 'round_trips': card_manager.round_trips})
+                if stop_on_error and not response.isSuccess():
+                    break
+        return responses
+
+    @staticmethod
+    def __getReader(request):
+        reader = request.get('reader')
+        if not reader:
+            raise Exception("Missing reader")
+        return reader
+
+
+class DaemonClient(object):
+    """Client of the daemon socket API, using length-prefixed frames.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=None):
+        self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__socket.settimeout(timeout)
+        self.__socket.connect(socket_path)
+        self.__stream = self.__socket.makefile('rwb')
+        self.__next_id = 0
+
+    def request(self, op, **params):
+        """Send a request and wait for its response.
+
+        @raise Exception: if the daemon answered an error
+        """
+        self.__next_id += 1
+        params.update({'id': self.__next_id, 'op': op})
+        writeFrame(self.__stream, json.dumps(params).encode('utf-8'))
+        payload = readFrame(self.__stream)
+        if payload is None:
+            raise Exception("Connection closed by the daemon")
+        response = json.loads(payload)
+        if 'error' in response:
+            raise Exception("{}: {}".format(response.get('type'), response['error']))
+        return response
+
+    def list(self):
+        return self.request('list')
+
+    def connect(self, reader):
+        return self.request('connect', reader=reader)
+
+    def transmit(self, reader, apdu, auto_response=None, priority=None, deadline=None):
+        """@param apdu: hexadecimal string, bytes, list of int or Apdu
+        @param priority: 'high', 'normal' (default) or 'low'
+        @param deadline: maximum time to wait in the reader queue, in seconds
+        @return: (data, sw1, sw2) as for CardManager.transmit
+        """
+        response = self.request('transmit', reader=reader, apdu=_toHex(apdu), auto_response=auto_response, priority=priority, deadline=deadline)
+        return _toResponse(response)
+
+    def batch(self, reader, apdus, stop_on_error=False, auto_response=None, priority=None, deadline=None):
+        """@return: list of (data, sw1, sw2)"""
+        response = self.request('batch', reader=reader, apdus=[_toHex(apdu) for apdu in apdus], stop_on_error=stop_on_error, auto_response=auto_response,
+                                priority=priority, deadline=deadline)
+        return [_toResponse(item) for item in response['responses']]
+
+    def metrics(self):
+        """@return: dict of reader name: queue depth and wait time statistics per priority class"""
+        return self.request('metrics')['readers']
+
+    def close(self):
+        self.__stream.close()
+        self.__socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _toHex(apdu):
+    if isinstance(apdu, str):
+        return apdu
+    return bytes(apdu).hex()
+
+
+def _toResponse(response):
+    sw = int(response['sw'], 16)
+    return list(bytes.fromhex(response['data'])), sw >> 8, sw & 0xFF
+
+
+def main():
+    parser = argparse.ArgumentParser(description='smartcard_control daemon: serve the cards over a local socket API')
+    parser.add_argument("-s", "--socket", default=DEFAULT_SOCKET_PATH, help="path of the Unix socket (default: {})".format(DEFAULT_SOCKET_PATH))
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="use (several times) to be more verbose")
+    parser.add_argument("-l", "--logfile", help="write the logs in a file instead of the console")
+    parser.add_argument("-b", "--backend", choices=BACKEND_NAMES, default='pcsc', help="PC/SC backend (default: pcsc)")
+    parser.add_argument("--virtual-readers", type=int, default=2, help="number of simulated readers of the virtual backend (default: 2)")
+    parser.add_argument("--virtual-config", help="json configuration file of the virtual backend")
+    parser.add_argument("-m", "--share-mode", type=int, choices=sorted(SHARE_MODES), default=SCARD_SHARE_SHARED,
+                        help="share mode of the card connections (default: {})".format(SCARD_SHARE_SHARED))
+    parser.add_argument("-w", "--max-workers", type=int, default=32, help="number of worker threads of the card connections (default: 32)")
+    parser.add_argument("-a", "--auto-response", action="store_true", help="chain GET RESPONSE and correct Le by default")
+    parser.add_argument('--version', action='version', version="%(prog)s {}".format(VERSION_STR))
+    args = parser.parse_args()
+
+    levels = [logging.CRITICAL, logging.ERROR, logging.WARNING, logging.INFO, logging.DEBUG]
+    log_listener = setup_logging(levels[min(args.verbose, len(levels) - 1)], args.logfile)
+
+    if args.backend == 'virtual':
+        setBackend(VirtualBackend.fromConfigFile(args.virtual_config) if args.virtual_config else VirtualBackend(readers=args.virtual_readers))
+    else:
+        setBackend(args.backend)
+
+    pool = CardSessionPool(max_workers=args.max_workers, card_type=AnyCardType(), share_mode=args.share_mode, disposition=SCARD_LEAVE_CARD,
+                           auto_response=args.auto_response)
+    card_daemon = CardDaemon(args.socket, pool)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    try:
+        card_daemon.start()
+        while not stop_event.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        card_daemon.stop()
+        log_listener.stop()
+    return 0
+
+
+def run():
+    sys.exit(main())
+
+
+if __name__ == '__main__':
+    run()
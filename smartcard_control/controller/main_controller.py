@@ -1,5 +1,8 @@
 import argparse
 import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
 
 from smartcard.CardRequest import CardRequest
 from smartcard.CardType import ATRCardType, AnyCardType
@@ -8,10 +11,16 @@ from smartcard.scard import SCARD_SHARE_SHARED, SCARD_LEAVE_CARD
 
 from smartcard.util import toBytes, toHexString
 
+from smartcard_control.utils.apdu import Apdu
 from smartcard_control.utils.apdu_utils import parseIsoApduResponse
 from smartcard_control.utils.constants import SHARE_MODES, DISPOSITIONS
 
+from smartcard_control.model.backend.backend import BACKEND_NAMES, setBackend
+from smartcard_control.model.backend.virtual_backend import VirtualBackend
+from smartcard_control.model.apdu_script import ApduScript, ScriptRunner
 from smartcard_control.model.card_manager import DevicesListManager, CardManager
+from smartcard_control.model.provisioning import ProvisioningPipeline
+from smartcard_control.model.trace.trace_recorder import ApduTraceRecorder, DEFAULT_CAPACITY
 from smartcard_control.utils import apdu_utils
 from smartcard_control.view import menu_util
 from smartcard_control.view.menu_util import printChooseShareMode
@@ -19,16 +28,49 @@ from smartcard_control.view.menu_util import printChooseShareMode
 VERSION_INFO = (1, 0, 1, 0)
 VERSION_STR = '%i.%i.%i' % VERSION_INFO[:3]
 
+# Commands of the transmit menu, built once
+PREDEFINED_APDUS = {'1': Apdu(apdu_utils.VERIFY_WRONG_PIN_SIZE_CMD),
+                    '2': Apdu(apdu_utils.VERIFY_WRONG_PIN_FORMAT_CMD),
+                    '3': Apdu(apdu_utils.VERIFY_WRONG_PIN_CMD),
+                    '4': Apdu(apdu_utils.VERIFY_PIN_1234_CMD),
+                    '5': Apdu(apdu_utils.VERIFY_PIN_9876_CMD),
+                    '6': Apdu(apdu_utils.MODIFY_1234to1234_CDM),
+                    '7': Apdu(apdu_utils.MODIFY_1234to9876_CDM),
+                    '8': Apdu(apdu_utils.MODIFY_9876to1234_CDM)}
+
 share_mode = SCARD_SHARE_SHARED
 disposition = SCARD_LEAVE_CARD
 card_manager = None
 devices_list_manager = None
 logging_level = logging.DEBUG
 logging_file = None
+backend_name = 'pcsc'
+virtual_readers = 2
+virtual_config = None
+trace_file = None
+trace_size = DEFAULT_CAPACITY
+auto_response = False
+command = None
+script_file = None
+script_reader = None
+script_variables = {}
+script_transaction = False
+script_stop_on_failure = False
+verify_file = None
+provision_workers = 64
+provision_retries = 2
+provision_count = None
+provision_eject = True
+report_interval = 5.0
 
 
 def setup_parser():
     global logging_level, logging_file
+    global backend_name, virtual_readers, virtual_config
+    global trace_file, trace_size
+    global auto_response
+    global command, script_file, script_reader, script_transaction, script_stop_on_failure
+    global verify_file, provision_workers, provision_retries, provision_count, provision_eject, report_interval
 
     DEFAULT_LOGGING_FILE = "smartcard_control.log"
     parser = argparse.ArgumentParser(
@@ -48,8 +90,79 @@ def setup_parser():
                         const=DEFAULT_LOGGING_FILE,
                         # choices=['choice1', 'choice2'],
                         help="write project logs in a file instead of the current console (default: ./{})".format(DEFAULT_LOGGING_FILE))
+    parser.add_argument("-b", "--backend",
+                        choices=BACKEND_NAMES,
+                        default=backend_name,
+                        help="PC/SC backend to use, 'virtual' simulates readers and cards without hardware (default: {})".format(backend_name))
+    parser.add_argument("--virtual-readers",
+                        type=int,
+                        default=virtual_readers,
+                        help="number of simulated readers, each with a card inserted, for the virtual backend (default: {})".format(virtual_readers))
+    parser.add_argument("--virtual-config",
+                        action="store",
+                        help="json configuration file of the virtual backend (readers, atr, latency, rules, schedule), overrides --virtual-readers")
+    parser.add_argument("-t", "--trace",
+                        action="store",
+                        help="record the card connection events and the APDUs in a binary trace file (memory mapped ring, see model.trace)")
+    parser.add_argument("--trace-size",
+                        type=int,
+                        default=trace_size,
+                        help="size of the trace ring in bytes, the oldest records are overwritten when full (default: {})".format(trace_size))
+    parser.add_argument("-a", "--auto-response",
+                        action="store_true",
+                        help="chain GET RESPONSE commands on 61XX status words and re-issue the commands with the corrected Le on 6CXX")
     parser.add_argument('--version', action='version', version="%(prog)s {}".format(VERSION_STR))
 
+    subparsers = parser.add_subparsers(dest='command', metavar='command', help="run a command instead of the interactive menu")
+    run_parser = subparsers.add_parser('run', help="run an APDU script (see model.apdu_script) on a card, without prompting")
+    run_parser.add_argument("script",
+                            help="APDU script file")
+    run_parser.add_argument("-r", "--reader",
+                            help="name of the reader of the card (default: the first card found)")
+    run_parser.add_argument("-D", "--define",
+                            action="append",
+                            default=[],
+                            metavar="NAME=HEX",
+                            help="define a script variable (several times allowed)")
+    run_parser.add_argument("--transaction",
+                            action="store_true",
+                            help="run the whole script in one PC/SC transaction")
+    run_parser.add_argument("-x", "--stop-on-failure",
+                            action="store_true",
+                            help="stop at the first unexpected status word")
+
+    provision_parser = subparsers.add_parser('provision', help="run an APDU script on every card inserted, on all the readers in parallel")
+    provision_parser.add_argument("script",
+                                  help="APDU script file run on each card")
+    provision_parser.add_argument("--verify",
+                                  help="APDU script file verifying each card after the provisioning script")
+    provision_parser.add_argument("-D", "--define",
+                                  action="append",
+                                  default=[],
+                                  metavar="NAME=HEX",
+                                  help="define a script variable (several times allowed)")
+    provision_parser.add_argument("-w", "--workers",
+                                  type=int,
+                                  default=provision_workers,
+                                  help="number of cards provisioned at the same time (default: {})".format(provision_workers))
+    provision_parser.add_argument("--retries",
+                                  type=int,
+                                  default=provision_retries,
+                                  help="new attempts on a failed card (default: {})".format(provision_retries))
+    provision_parser.add_argument("-n", "--count",
+                                  type=int,
+                                  help="stop after this number of cards (default: until interrupted)")
+    provision_parser.add_argument("--no-eject",
+                                  action="store_true",
+                                  help="leave the provisioned cards in their reader instead of ejecting them")
+    provision_parser.add_argument("--transaction",
+                                  action="store_true",
+                                  help="run the scripts of a card in one PC/SC transaction")
+    provision_parser.add_argument("--report-interval",
+                                  type=float,
+                                  default=report_interval,
+                                  help="seconds between the progress reports (default: {})".format(report_interval))
+
     args = parser.parse_args()
 
     if not args.verbose:
@@ -66,21 +179,88 @@ def setup_parser():
     if args.logfile is not None:
         logging_file = args.logfile
 
+    backend_name = args.backend
+    virtual_readers = args.virtual_readers
+    virtual_config = args.virtual_config
+    trace_file = args.trace
+    trace_size = args.trace_size
+    auto_response = args.auto_response
+
+    command = args.command
+    if command in ('run', 'provision'):
+        script_file = args.script
+        script_transaction = args.transaction
+        for define in args.define:
+            name, separator, value = define.partition('=')
+            if not separator:
+                parser.error("invalid variable definition (NAME=HEX expected): " + define)
+            script_variables[name.strip()] = value
+    if command == 'run':
+        script_reader = args.reader
+        script_stop_on_failure = args.stop_on_failure
+    elif command == 'provision':
+        verify_file = args.verify
+        provision_workers = args.workers
+        provision_retries = args.retries
+        provision_count = args.count
+        provision_eject = not args.no_eject
+        report_interval = args.report_interval
+
+
+def setup_logging(level=None, log_file=None):
+    """Configure the root logger to write through a queue, so the transmit path and the monitoring threads never wait for the
+    console or the log file: records are written by the returned QueueListener thread.
+
+    @param level: logging level, the one of the command line if None
+    @param log_file: log file, the one of the command line (or the console) if None
+    """
+    if level is None:
+        level = logging_level
+    if log_file is None:
+        log_file = logging_file
+    if log_file is not None:
+        handler = logging.FileHandler(log_file)
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s  [%(levelname)s] %(module)s/%(lineno)d - %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # The record message only: the listener handler applies the format
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    logging.basicConfig(level=level, handlers=[queue_handler])
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    return listener
+
+
+def setup_backend():
+    if backend_name == 'virtual':
+        if virtual_config is not None:
+            setBackend(VirtualBackend.fromConfigFile(virtual_config))
+        else:
+            setBackend(VirtualBackend(readers=virtual_readers))
+    else:
+        setBackend(backend_name)
+
 
 def main():
     # Log config
-    global logging_level, logging_file
-    if logging_file is not None:
-        logging.basicConfig(level=logging_level, filename=logging_file, format="%(asctime)s  [%(levelname)s] %(module)s/%(lineno)d - %(message)s")
-    else:
-        logging.basicConfig(level=logging_level, format="%(asctime)s  [%(levelname)s] %(module)s/%(lineno)d - %(message)s")
+    log_listener = setup_logging()
+
+    # PC/SC backend
+    setup_backend()
 
     global devices_list_manager
     global card_manager
     # Create card manager (Singleton)
     devices_list_manager = DevicesListManager.getInstance()
     devices_list_manager.start()
-    card_manager = CardManager(request_timeout=10, card_type=AnyCardType(), share_mode=share_mode)
+    card_manager = CardManager(request_timeout=10, card_type=AnyCardType(), share_mode=share_mode, auto_response=auto_response)
+    trace_recorder = None
+    if trace_file is not None:
+        trace_recorder = ApduTraceRecorder(trace_file, capacity=trace_size)
+        card_manager.addConnectionObserver(trace_recorder)
 
     try:
         leave_main_menu = False
@@ -91,10 +271,82 @@ def main():
         devices_list_manager.stop()
     except KeyboardInterrupt:
         pass
+    finally:
+        if trace_recorder is not None:
+            trace_recorder.close()
+        log_listener.stop()
+
+
+def run_script():
+    """Run the script of the run command.
+
+    @return: exit status, 0 if every status word was the expected one, 1 on a failed expectation, 2 on an error
+    """
+    try:
+        script = ApduScript.fromFile(script_file, script_variables)
+    except Exception as e:
+        menu_util.printError(e)
+        return 2
+
+    log_listener = setup_logging()
+    setup_backend()
+    script_card_manager = CardManager(request_timeout=10, card_type=AnyCardType(), share_mode=share_mode, auto_response=auto_response)
+    trace_recorder = None
+    if trace_file is not None:
+        trace_recorder = ApduTraceRecorder(trace_file, capacity=trace_size)
+        script_card_manager.addConnectionObserver(trace_recorder)
+    try:
+        script_card_manager.connect(reader=script_reader)
+        try:
+            result = ScriptRunner(script_card_manager, stop_on_failure=script_stop_on_failure, transaction=script_transaction).run(script)
+        finally:
+            script_card_manager.disconnect(disposition=disposition)
+        menu_util.printScriptResult(result)
+        return 1 if result.failures else 0
+    except Exception as e:
+        menu_util.printError(e)
+        return 2
+    finally:
+        if trace_recorder is not None:
+            trace_recorder.close()
+        log_listener.stop()
+
+
+def run_provisioning():
+    """Provision the cards inserted until provision_count cards are done or the user interrupts.
+
+    @return: exit status, 0 if every card was provisioned, 1 if some failed, 2 on an error
+    """
+    try:
+        script = ApduScript.fromFile(script_file, script_variables)
+        verify_script = None if verify_file is None else ApduScript.fromFile(verify_file, script_variables)
+    except Exception as e:
+        menu_util.printError(e)
+        return 2
+
+    log_listener = setup_logging()
+    setup_backend()
+    pipeline = ProvisioningPipeline(script, verify_script, max_workers=provision_workers, retries=provision_retries, share_mode=share_mode,
+                                    transaction=script_transaction, eject=provision_eject)
+    try:
+        pipeline.start()
+        while not pipeline.wait(provision_count if provision_count is not None else float('inf'), report_interval):
+            menu_util.printProvisioningProgress(pipeline.stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+        log_listener.stop()
+    menu_util.printProvisioningStats(pipeline.stats(), pipeline.failed_cards)
+    return 1 if pipeline.failed else 0
 
 
 def run():
     setup_parser()
+    if command == 'run':
+        sys.exit(run_script())
+    elif command == 'provision':
+        sys.exit(run_provisioning())
     main()
 
 
@@ -148,8 +400,9 @@ def main_menu():
             devices_list_manager.printCards()
             index = input("> ")
             try:
+                reader = devices_list_manager.getReaderFromCardIndex(int(index))
                 bytes_atr = toBytes(devices_list_manager.getAtrFromCardIndex(int(index)))
-                card_manager.connect(card_type=ATRCardType(bytes_atr), share_mode=share_mode)
+                card_manager.connect(card_type=ATRCardType(bytes_atr), share_mode=share_mode, reader=reader)
             except Exception as e:
                 menu_util.printError(e)
                 leave_card_menu = True
@@ -188,6 +441,10 @@ def card_menu():
                 leave_transmit_menu = not (transmit_menu())
         elif choice_card.lower() == 'i':
             card_manager.getCardInfo()
+        elif choice_card.lower() == 's':
+            menu_util.printStats(card_manager.stats())
+        elif choice_card.lower() == 'f':
+            dump_file_menu()
         elif choice_card.lower() == 'h':
             menu_util.printCardMenu()
         elif choice_card.lower() == 'r':
@@ -213,50 +470,71 @@ def card_menu():
         return False
 
 
+def dump_file_menu():
+    global card_manager
+    try:
+        records = input("Record file (y/N) : ").strip().lower() == 'y'
+        sfi = input("SFI (empty for the current EF) : ").strip()
+        sfi = int(sfi, 16) if sfi else None
+        size = None
+        if not records:
+            size = input("Size in bytes (empty to read up to the end of the file) : ").strip()
+            size = int(size) if size else None
+        output_path = input("Output file (empty to print the content) : ").strip()
+
+        output = open(output_path, 'wb') if output_path else None
+        try:
+            if records:
+                file_reader = card_manager.readRecords(sfi=sfi, output=output)
+            else:
+                file_reader = card_manager.readBinary(size=size, sfi=sfi, output=output)
+            for chunk in file_reader:
+                if output is None:
+                    print(toHexString(list(chunk)))
+        finally:
+            if output is not None:
+                output.close()
+        menu_util.printFileDump(file_reader)
+    except CardConnectionException:
+        raise
+    except Exception as e:
+        menu_util.printError(e)
+
+
 def transmit_menu():
     global card_manager
     try:
         card_manager.verifyCardConnected()
         menu_util.printShortTransmitMenu()
         choice_transmit = input("> ")
-        apdu_message = None
         card_manager.verifyCardConnected()
 
-        if choice_transmit.lower() == '1':
-            apdu_message = apdu_utils.VERIFY_WRONG_PIN_SIZE_CMD
-        elif choice_transmit.lower() == '2':
-            apdu_message = apdu_utils.VERIFY_WRONG_PIN_FORMAT_CMD
-        elif choice_transmit.lower() == '3':
-            apdu_message = apdu_utils.VERIFY_WRONG_PIN_CMD
-        elif choice_transmit.lower() == '4':
-            apdu_message = apdu_utils.VERIFY_PIN_1234_CMD
-        elif choice_transmit.lower() == '5':
-            apdu_message = apdu_utils.VERIFY_PIN_9876_CMD
-        elif choice_transmit.lower() == '6':
-            apdu_message = apdu_utils.MODIFY_1234to1234_CDM
-        elif choice_transmit.lower() == '7':
-            apdu_message = apdu_utils.MODIFY_1234to9876_CDM
-        elif choice_transmit.lower() == '8':
-            apdu_message = apdu_utils.MODIFY_9876to1234_CDM
+        if choice_transmit.lower() in PREDEFINED_APDUS:
+            apdu = PREDEFINED_APDUS[choice_transmit.lower()]
         elif choice_transmit.lower() == 'c':
-            apdu_message_str = input("APDU CMD : ").split(" ")
-            apdu_message_bytes = []
-            for s in apdu_message_str:
-                apdu_message_bytes.append(int(s, base=16))
+            try:
+                apdu = Apdu.fromHex(input("APDU CMD : "))
+            except Exception as e:
+                menu_util.printError(e)
+                return True
         elif choice_transmit.lower() == 'q':
             return False
         elif choice_transmit.lower() == 'h':
             menu_util.printTransmitMenu()
             return True
+        else:
+            menu_util.printWrongValue()
+            return True
 
-        response = card_manager.transmit(apdu_message)
-        message = toHexString(response[0])
-        sw1 = toHexString([response[-2]])
-        sw2 = toHexString([response[-1]])
-        if not message:
+        response = card_manager.transmitApdu(apdu)
+        sw1 = '{:02X}'.format(response.sw1)
+        sw2 = '{:02X}'.format(response.sw2)
+        if not response.data_hex:
             print(parseIsoApduResponse(sw1, sw2))
         else:
-            print(parseIsoApduResponse(sw1, sw2, message))
+            print(parseIsoApduResponse(sw1, sw2, response.data_hex))
+        if card_manager.round_trips > 1:
+            menu_util.printRoundTrips(card_manager.round_trips)
 
         return True
     except CardConnectionException as ce:
@@ -0,0 +1,227 @@
+import re
+from time import perf_counter
+
+from smartcard_control.utils import apdu_utils
+from smartcard_control.utils.apdu import Apdu
+from smartcard_control.utils.apdu_utils import parseStatusWordPattern, matchStatusWord
+
+"""
+APDU scripts, run without prompting by the run command
+
+A script is parsed and its APDUs encoded once, before any exchange with the card:
+
+    # Comments start with '#'
+    set AID = A0 00 00 00 03 10 10              variable (hexadecimal, may use other variables and macros)
+    00 A4 04 00 07 $AID expect 9000 61XX        APDU with the status words expected (X: any digit)
+    VERIFY_PIN_1234 expect 9000                 macro of a predefined command (see SCRIPT_MACROS)
+    repeat 100                                  loop, up to the matching end (loops can be nested)
+        00 B0 00 00 00 expect 9000
+    end
+
+In an APDU or a variable value, $NAME or ${NAME} (or NAME alone) is replaced by the bytes of a variable or a macro. The
+variable names must not be hexadecimal numbers.
+"""
+
+# Predefined commands and fragments of apdu_utils usable by name in the scripts
+SCRIPT_MACROS = {'VERIFY': apdu_utils.VERIFY_CMD,
+                 'MODIFY': apdu_utils.MODIFY_CMD,
+                 'PIN_1234': apdu_utils.PIN_1234,
+                 'PIN_9876': apdu_utils.PIN_9876,
+                 'PIN_PADDING_11': apdu_utils.PIN_PADDING_11,
+                 'VERIFY_WRONG_PIN_SIZE': apdu_utils.VERIFY_WRONG_PIN_SIZE_CMD,
+                 'VERIFY_WRONG_PIN_FORMAT': apdu_utils.VERIFY_WRONG_PIN_FORMAT_CMD,
+                 'VERIFY_WRONG_PIN': apdu_utils.VERIFY_WRONG_PIN_CMD,
+                 'VERIFY_PIN_1234': apdu_utils.VERIFY_PIN_1234_CMD,
+                 'VERIFY_PIN_9876': apdu_utils.VERIFY_PIN_9876_CMD,
+                 'MODIFY_1234_TO_1234': apdu_utils.MODIFY_1234to1234_CDM,
+                 'MODIFY_1234_TO_9876': apdu_utils.MODIFY_1234to9876_CDM,
+                 'MODIFY_9876_TO_1234': apdu_utils.MODIFY_9876to1234_CDM}
+
+# Largest repeat count of a loop
+MAX_REPEAT = 1000000
+
+_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_VARIABLE = re.compile(r'^\$(?:([A-Za-z_][A-Za-z0-9_]*)|\{([A-Za-z_][A-Za-z0-9_]*)\})$')
+_HEX = re.compile(r'^[0-9A-Fa-f]+$')
+_EXPECT = re.compile(r'\s+expect\s+', re.IGNORECASE)
+
+
+class ScriptStep(object):
+    """An APDU of a script with the status word patterns expected (None if any is accepted)."""
+
+    __slots__ = ('apdu', 'expected', 'patterns', 'line')
+
+    def __init__(self, apdu, patterns, line):
+        self.apdu = apdu
+        self.patterns = patterns
+        self.expected = None if not patterns else tuple(parseStatusWordPattern(pattern) for pattern in patterns)
+        self.line = line
+
+
+class ScriptLoop(object):
+    """Steps of a script repeated count times."""
+
+    __slots__ = ('count', 'steps', 'line')
+
+    def __init__(self, count, line):
+        self.count = count
+        self.steps = []
+        self.line = line
+
+
+class ApduScript(object):
+    """Parsed APDU script: tree of ScriptStep and ScriptLoop."""
+
+    def __init__(self, steps, name='<script>'):
+        self.steps = steps
+        self.name = name
+        self.apdu_count = ApduScript.__count(steps)
+
+    @staticmethod
+    def __count(steps):
+        return sum(ApduScript.__count(step.steps) * step.count if isinstance(step, ScriptLoop) else 1 for step in steps)
+
+    @staticmethod
+    def fromFile(path, variables=None):
+        with open(path, encoding='utf-8') as script_file:
+            return ApduScript.parse(script_file.read(), variables, path)
+
+    @staticmethod
+    def parse(text, variables=None, name='<script>'):
+        """Parse a script.
+
+        @param text: script source
+        @param variables: dict of name: hexadecimal value of variables defined before the script ones
+        @param name: name of the script in the error messages
+        @raise Exception: on a syntax error, with the name and line of the error
+        """
+        values = dict((key, list(value)) for key, value in SCRIPT_MACROS.items())
+        blocks = [ScriptLoop(1, 0)]
+        line_number = 0
+        try:
+            for name_value in (variables or {}).items():
+                ApduScript.__setVariable(values, *name_value)
+
+            for line_number, line in enumerate(text.splitlines(), 1):
+                line = line.split('#', 1)[0].strip()
+                if not line:
+                    continue
+                keyword = line.split(None, 1)[0].lower()
+
+                if keyword == 'set':
+                    variable, separator, value = line[3:].partition('=')
+                    if not separator:
+                        raise Exception("expected: set NAME = VALUE")
+                    ApduScript.__setVariable(values, variable.strip(), value)
+                elif keyword == 'repeat':
+                    try:
+                        count = int(line[6:].strip())
+                    except ValueError:
+                        raise Exception("expected: repeat COUNT")
+                    if not 0 <= count <= MAX_REPEAT:
+                        raise Exception("repeat count out of range 0-{}".format(MAX_REPEAT))
+                    blocks.append(ScriptLoop(count, line_number))
+                elif keyword == 'end':
+                    if len(blocks) == 1:
+                        raise Exception("end without repeat")
+                    loop = blocks.pop()
+                    blocks[-1].steps.append(loop)
+                else:
+                    parts = _EXPECT.split(line, maxsplit=1)
+                    patterns = tuple(parts[1].replace(',', ' ').split()) if len(parts) > 1 else ()
+                    blocks[-1].steps.append(ScriptStep(Apdu(ApduScript.__encode(parts[0], values)), patterns, line_number))
+            if len(blocks) > 1:
+                line_number = blocks[-1].line
+                raise Exception("repeat without end")
+        except Exception as e:
+            raise Exception("{}:{}: {}".format(name, line_number, e))
+        return ApduScript(blocks[0].steps, name)
+
+    @staticmethod
+    def __setVariable(values, variable, value):
+        if not _NAME.match(variable) or _HEX.match(variable):
+            raise Exception("invalid variable name (letters, digits and '_', not hexadecimal): " + variable)
+        values[variable] = ApduScript.__encode(value, values)
+
+    @staticmethod
+    def __encode(text, values):
+        encoded = []
+        for token in text.split():
+            if token[0] == '$':
+                match = _VARIABLE.match(token)
+                variable = None if match is None else match.group(1) or match.group(2)
+                if variable not in values:
+                    raise Exception("unknown variable: " + token)
+                encoded += values[variable]
+            elif token in values:
+                encoded += values[token]
+            elif _HEX.match(token) and len(token) % 2 == 0:
+                encoded += bytes.fromhex(token)
+            else:
+                raise Exception("invalid hexadecimal bytes: " + token)
+        return encoded
+
+
+class ScriptResult(object):
+    """Outcome of a script run: APDUs sent, exchanges, time taken and failed expectations."""
+
+    def __init__(self, script):
+        self.script = script
+        self.apdus = 0
+        self.round_trips = 0
+        self.duration = 0.0
+        # (line, APDU hexadecimal string, status word, expected patterns)
+        self.failures = []
+        self.stopped = False
+
+    def getThroughput(self):
+        """@return: APDUs sent per second"""
+        return self.apdus / self.duration if self.duration else 0.0
+
+
+class ScriptRunner(object):
+    """Run an ApduScript on the card of a connected CardManager."""
+
+    def __init__(self, card_manager, auto_response=None, stop_on_failure=False, transaction=False):
+        """
+        @param auto_response: GET RESPONSE / Le correction mode of the APDUs (see CardManager.transmit)
+        @param stop_on_failure: stop at the first unexpected status word
+        @param transaction: run the whole script in one PC/SC transaction (see CardManager.transaction)
+        """
+        self.card_manager = card_manager
+        self.auto_response = auto_response
+        self.stop_on_failure = stop_on_failure
+        self.transaction = transaction
+
+    def run(self, script):
+        """@return: ScriptResult"""
+        result = ScriptResult(script)
+        start = perf_counter()
+        try:
+            if self.transaction:
+                with self.card_manager.transaction():
+                    self.__runSteps(script.steps, result)
+            else:
+                self.__runSteps(script.steps, result)
+        finally:
+            result.duration = perf_counter() - start
+        return result
+
+    def __runSteps(self, steps, result):
+        card_manager = self.card_manager
+        for step in steps:
+            if isinstance(step, ScriptLoop):
+                for _ in range(step.count):
+                    if not self.__runSteps(step.steps, result):
+                        return False
+                continue
+
+            response = card_manager.transmitApdu(step.apdu, self.auto_response)
+            result.apdus += 1
+            result.round_trips += card_manager.round_trips
+            if step.expected is not None and not matchStatusWord(step.expected, response.sw1, response.sw2):
+                result.failures.append((step.line, step.apdu.hex, '{:04X}'.format(response.sw), step.patterns))
+                if self.stop_on_failure:
+                    result.stopped = True
+                    return False
+        return True
@@ -0,0 +1,279 @@
+import asyncio
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+
+from smartcard.CardType import AnyCardType
+from smartcard.Exceptions import CardRequestTimeoutException
+from smartcard.scard import SCARD_LEAVE_CARD, SCARD_SHARE_SHARED
+
+from smartcard_control.model.card_manager import CardManager
+from smartcard_control.model.monitoring.card_monitoring import CardObserver, CardMonitor
+from smartcard_control.model.monitoring.reader_monitoring import ReaderObserver, ReaderMonitor
+
+"""
+asyncio interface of the card manager and of the card and reader monitors
+
+The blocking PC/SC calls (connect, transmit...) are run in a bounded thread pool shared by all the AsyncCardManager,
+so one event loop can drive many readers without a thread per caller. Waiting for a card does not hold any thread:
+it is done on the card events of the monitoring dispatcher thread.
+"""
+
+DEFAULT_MAX_WORKERS = 8
+
+CARD_ADDED = 'card_added'
+CARD_REMOVED = 'card_removed'
+READER_ADDED = 'reader_added'
+READER_REMOVED = 'reader_removed'
+
+# type: one of CARD_ADDED, CARD_REMOVED, READER_ADDED, READER_REMOVED
+# atr: list of bytes for card events, None for reader events
+DeviceEvent = namedtuple('DeviceEvent', ['type', 'reader', 'atr'])
+
+_executor = None
+_executor_lock = Lock()
+
+
+def getExecutor():
+    """Return the executor running the blocking PC/SC calls, a DEFAULT_MAX_WORKERS threads pool if none was set."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS, thread_name_prefix='pcsc')
+        return _executor
+
+
+def setExecutor(executor):
+    """Select the executor running the blocking PC/SC calls of the AsyncCardManager created afterwards.
+
+    @param executor: a concurrent.futures.Executor, or the maximum number of threads of a new thread pool
+    """
+    global _executor
+    if isinstance(executor, int):
+        executor = ThreadPoolExecutor(max_workers=executor, thread_name_prefix='pcsc')
+    with _executor_lock:
+        _executor = executor
+    return _executor
+
+
+class DeviceEventStream(object):
+    """Asynchronous iterator over the card and reader events (DeviceEvent) of the monitors.
+
+    The events are pushed by the monitoring dispatcher thread into a bounded queue of the event loop. When the consumer
+    is too slow and the queue is full, the oldest events are dropped (and counted in dropped_events).
+    The devices already present are reported as added when the stream is opened.
+
+    usage:
+        async with DeviceEventStream() as events:
+            async for event in events:
+                ...
+    """
+
+    __END = object()
+
+    class StreamCardObserver(CardObserver):
+
+        def __init__(self, stream):
+            super().__init__()
+            self.stream = stream
+
+        def update(self, handlers):
+            (added_cards, removed_cards) = handlers
+            events = [DeviceEvent(CARD_REMOVED, card.reader, card.atr) for card in removed_cards]
+            events += [DeviceEvent(CARD_ADDED, card.reader, card.atr) for card in added_cards]
+            self.stream.push(events)
+
+    class StreamReaderObserver(ReaderObserver):
+
+        def __init__(self, stream):
+            super().__init__()
+            self.stream = stream
+
+        def update(self, handlers):
+            (added_readers, removed_readers) = handlers
+            events = [DeviceEvent(READER_REMOVED, str(reader), None) for reader in removed_readers]
+            events += [DeviceEvent(READER_ADDED, str(reader), None) for reader in added_readers]
+            self.stream.push(events)
+
+    def __init__(self, cards=True, readers=True, maxsize=1024):
+        """
+        @param cards: stream the card insertions/removals
+        @param readers: stream the reader additions/removals
+        @param maxsize: maximum number of events waiting to be consumed
+        """
+        self.dropped_events = 0
+
+        self.__cards = cards
+        self.__readers = readers
+        self.__queue = None
+        self.__loop = None
+        self.__card_observer = None
+        self.__reader_observer = None
+        self.__closed = False
+        self.__maxsize = maxsize
+        # Serializes the subscription (run in the executor) and close
+        self.__mutex = Lock()
+
+    async def open(self):
+        """Start receiving the events.
+
+        The observers are added in the default executor: it starts the monitoring dispatcher, whose PC/SC calls report
+        the devices already present, without blocking the event loop.
+        """
+        if self.__loop is not None:
+            return
+        self.__loop = asyncio.get_running_loop()
+        self.__queue = asyncio.Queue(maxsize=self.__maxsize)
+        await self.__loop.run_in_executor(None, self.__subscribe)
+
+    def __subscribe(self):
+        with self.__mutex:
+            if self.__closed:
+                return
+            if self.__readers:
+                self.__reader_observer = DeviceEventStream.StreamReaderObserver(self)
+                ReaderMonitor().addObserver(self.__reader_observer)
+            if self.__cards:
+                self.__card_observer = DeviceEventStream.StreamCardObserver(self)
+                CardMonitor().addObserver(self.__card_observer)
+
+    def close(self):
+        """Stop receiving the events, the ones already received can still be consumed."""
+        with self.__mutex:
+            if self.__closed:
+                return
+            self.__closed = True
+            if self.__card_observer is not None:
+                CardMonitor().deleteObserver(self.__card_observer)
+            if self.__reader_observer is not None:
+                ReaderMonitor().deleteObserver(self.__reader_observer)
+        if self.__loop is not None:
+            self.push([DeviceEventStream.__END])
+
+    def push(self, events):
+        """Thread safe, called by the observers to queue events."""
+        if not events:
+            return
+        try:
+            self.__loop.call_soon_threadsafe(self.__put, events)
+        except RuntimeError:
+            # The event loop is closed
+            pass
+
+    def __put(self, events):
+        for event in events:
+            if self.__queue.full():
+                self.__queue.get_nowait()
+                self.dropped_events += 1
+            self.__queue.put_nowait(event)
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        # Deleting the last observer joins the monitoring dispatcher thread
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self.open()
+        if self.__closed and self.__queue.empty():
+            raise StopAsyncIteration
+        event = await self.__queue.get()
+        if event is DeviceEventStream.__END:
+            raise StopAsyncIteration
+        return event
+
+
+class AsyncCardManager(object):
+    """
+    asyncio version of CardManager, with awaitable connect, transmit, reconnect...
+
+    The calls of one manager are serialized, the blocking PC/SC calls are run in the executor (getExecutor if None).
+
+        param: request_timeout=10, card_type=AnyCardType(), disposition=SCARD_LEAVE_CARD, share_mode=SCARD_SHARE_SHARED, backend=None
+            see CardManager
+
+        param: executor=None
+            concurrent.futures.Executor running the blocking calls, the shared one (getExecutor) if None
+    """
+
+    def __init__(self, request_timeout=10, card_type=AnyCardType(), disposition=SCARD_LEAVE_CARD, share_mode=SCARD_SHARE_SHARED, backend=None, executor=None):
+        self.card_manager = CardManager(request_timeout, card_type, disposition, share_mode, backend)
+
+        self.__card_type = card_type
+        self.__executor = executor
+        self.__lock = None
+
+    @property
+    def executor(self):
+        if self.__executor is None:
+            return getExecutor()
+        return self.__executor
+
+    async def __run(self, function, *args, **kwargs):
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+        async with self.__lock:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, partial(function, *args, **kwargs))
+
+    async def waitForCard(self, card_type=None):
+        """Wait for a card matching card_type (the manager one if None) to be present, without holding any thread.
+
+        @return: (reader, atr) of the card
+        @raise CardRequestTimeoutException: if no card was found before request_timeout
+        """
+        if card_type is None:
+            card_type = self.__card_type
+
+        async def waitForMatchingCard(events):
+            async for event in events:
+                if event.type == CARD_ADDED and card_type.matches(event.atr, event.reader):
+                    return event.reader, event.atr
+
+        async with DeviceEventStream(readers=False) as events:
+            try:
+                return await asyncio.wait_for(waitForMatchingCard(events), self.card_manager.request_timeout)
+            except asyncio.TimeoutError:
+                raise CardRequestTimeoutException()
+
+    async def connect(self, card_type=None, share_mode=None, reader=None):
+        """Connect to a card matching card_type, waiting for it if reader is None.
+
+        @param reader: name of the reader of the card, to connect straight to it (see CardManager.connect)
+        """
+        if card_type is not None:
+            self.__card_type = card_type
+        if reader is None:
+            reader, atr = await self.waitForCard()
+            logging.debug("connecting to card with atr: %s on reader: %s", atr, reader)
+        await self.__run(self.card_manager.connect, self.__card_type, share_mode, reader)
+
+    async def reconnect(self, disposition=None):
+        await self.__run(self.card_manager.reconnect, disposition)
+
+    async def disconnect(self, disposition=None):
+        await self.__run(self.card_manager.disconnect, disposition)
+
+    async def warm_reset(self):
+        await self.__run(self.card_manager.warm_reset)
+
+    async def cold_reset(self):
+        await self.__run(self.card_manager.cold_reset)
+
+    async def eject(self):
+        await self.__run(self.card_manager.eject)
+
+    async def transmit(self, apdu_message, auto_response=None):
+        return await self.__run(self.card_manager.transmit, apdu_message, auto_response)
+
+    async def transmitCommand(self, cla, ins, p1, p2, data=b'', le=None):
+        return await self.__run(self.card_manager.transmitCommand, cla, ins, p1, p2, data, le)
+
+    async def batch(self, apdus, stop_on=None, continue_on=None, auto_response=None):
+        return await self.__run(self.card_manager.batch, apdus, stop_on, continue_on, auto_response)
@@ -0,0 +1,108 @@
+class Backend(object):
+    """Backend is a base abstract class for the PC/SC layers used by the monitors and the card manager.
+
+    Its SCard* methods mirror the smartcard.scard functions of the same name (same parameters and return values),
+    so a backend can be swapped for pcsc-lite/winscard without changing the calling code.
+    """
+
+    name = None
+
+    def SCardEstablishContext(self, scope):
+        """@return: (hresult, hcontext)"""
+        raise NotImplementedError
+
+    def SCardReleaseContext(self, hcontext):
+        """@return: hresult"""
+        raise NotImplementedError
+
+    def SCardListReaders(self, hcontext, groups):
+        """@return: (hresult, readers_list)"""
+        raise NotImplementedError
+
+    def SCardGetStatusChange(self, hcontext, timeout, readers_state):
+        """@param timeout: timeout in milliseconds (or INFINITE)
+        @param readers_state: list of (reader, current_state, atr)
+        @return: (hresult, new_readers_state)"""
+        raise NotImplementedError
+
+    def SCardCancel(self, hcontext):
+        """@return: hresult"""
+        raise NotImplementedError
+
+    def SCardGetErrorMessage(self, hresult):
+        raise NotImplementedError
+
+    def createConnection(self, reader):
+        """Return a card connection (smartcard.CardConnection) to the card inserted in the given reader, not connected yet.
+
+        @param reader: name of the reader
+        """
+        raise NotImplementedError
+
+    def beginTransaction(self, connection):
+        """Start a transaction on a connected card connection (SCardBeginTransaction): the other connections to the card
+        wait for its end to exchange APDUs.
+
+        @param connection: card connection, possibly decorated
+        @raise CardConnectionException: if the transaction cannot be started
+        """
+        raise NotImplementedError
+
+    def endTransaction(self, connection):
+        """End the transaction of a card connection (SCardEndTransaction), leaving the card as is.
+
+        @raise CardConnectionException: if the transaction cannot be ended
+        """
+        raise NotImplementedError
+
+    def waitForCard(self, timeout, card_type):
+        """Wait for a card matching card_type and return a card service bound to it (the connection is not connected yet).
+
+        @param timeout: timeout in seconds
+        @param card_type: smartcard.CardType of the card to wait for
+        @raise CardRequestTimeoutException: if no card was found before the timeout
+        """
+        raise NotImplementedError
+
+
+BACKEND_NAMES = ('pcsc', 'virtual')
+
+_backend = None
+
+
+def createBackend(name, **kwargs):
+    """Create a backend from its name.
+
+    @param name: 'pcsc' or 'virtual'
+    @param kwargs: parameters of the backend constructor
+    """
+    if name == 'pcsc':
+        from smartcard_control.model.backend.pcsc_backend import PcscBackend
+        return PcscBackend(**kwargs)
+    elif name == 'virtual':
+        from smartcard_control.model.backend.virtual_backend import VirtualBackend
+        return VirtualBackend(**kwargs)
+    else:
+        raise Exception("Unknown backend: " + str(name))
+
+
+def getBackend():
+    """Return the backend in use, the PC/SC one if none was selected."""
+    global _backend
+    if _backend is None:
+        _backend = createBackend('pcsc')
+    return _backend
+
+
+def setBackend(backend):
+    """Select the backend used by the monitors and the card managers created afterwards.
+
+    It must be called before starting any monitor, as monitoring contexts are bound to the backend that established them.
+
+    @param backend: a Backend instance or the name of a backend
+    """
+    global _backend
+    if isinstance(backend, str):
+        backend = createBackend(backend)
+    _backend = backend
+    return _backend
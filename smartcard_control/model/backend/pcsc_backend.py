@@ -0,0 +1,56 @@
+from smartcard import scard
+from smartcard.CardRequest import CardRequest
+from smartcard.Exceptions import CardConnectionException
+from smartcard.pcsc.PCSCReader import PCSCReader
+
+from smartcard_control.model.backend.backend import Backend
+
+
+class PcscBackend(Backend):
+    """Backend using the system PC/SC layer (pcsc-lite or winscard) through pyscard.
+    """
+
+    name = 'pcsc'
+
+    def SCardEstablishContext(self, scope):
+        return scard.SCardEstablishContext(scope)
+
+    def SCardReleaseContext(self, hcontext):
+        return scard.SCardReleaseContext(hcontext)
+
+    def SCardListReaders(self, hcontext, groups):
+        return scard.SCardListReaders(hcontext, groups)
+
+    def SCardGetStatusChange(self, hcontext, timeout, readers_state):
+        return scard.SCardGetStatusChange(hcontext, timeout, readers_state)
+
+    def SCardCancel(self, hcontext):
+        return scard.SCardCancel(hcontext)
+
+    def SCardGetErrorMessage(self, hresult):
+        return scard.SCardGetErrorMessage(hresult)
+
+    def createConnection(self, reader):
+        return PCSCReader(reader).createConnection()
+
+    def beginTransaction(self, connection):
+        hresult = scard.SCardBeginTransaction(self.__getHandle(connection))
+        if hresult != scard.SCARD_S_SUCCESS:
+            raise CardConnectionException('Failed to begin the transaction: ' + scard.SCardGetErrorMessage(hresult), hresult=hresult)
+
+    def endTransaction(self, connection):
+        hresult = scard.SCardEndTransaction(self.__getHandle(connection), scard.SCARD_LEAVE_CARD)
+        if hresult != scard.SCARD_S_SUCCESS:
+            raise CardConnectionException('Failed to end the transaction: ' + scard.SCardGetErrorMessage(hresult), hresult=hresult)
+
+    def waitForCard(self, timeout, card_type):
+        return CardRequest(timeout=timeout, cardType=card_type).waitforcard()
+
+    @staticmethod
+    def __getHandle(connection):
+        # Card handle of the PCSCCardConnection under the connection decorators
+        while connection is not None and not hasattr(connection, 'hcard'):
+            connection = getattr(connection, 'component', None)
+        if connection is None or connection.hcard is None:
+            raise CardConnectionException('Card not connected')
+        return connection.hcard
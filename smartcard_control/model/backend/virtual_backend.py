@@ -0,0 +1,548 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from threading import Condition, Event, Thread
+
+from smartcard.CardConnection import CardConnection
+from smartcard.Exceptions import CardConnectionException, CardRequestTimeoutException, NoCardException
+from smartcard.PassThruCardService import PassThruCardService
+from smartcard.scard import SCARD_S_SUCCESS, SCARD_E_CANCELLED, SCARD_E_TIMEOUT, SCARD_E_INVALID_HANDLE, SCARD_E_NO_READERS_AVAILABLE, SCARD_E_NO_SMARTCARD, \
+    SCARD_E_SHARING_VIOLATION, SCARD_W_REMOVED_CARD, SCARD_E_UNKNOWN_READER, SCARD_STATE_UNAWARE, SCARD_STATE_CHANGED, SCARD_STATE_UNKNOWN, SCARD_STATE_EMPTY, \
+    SCARD_STATE_PRESENT, SCARD_STATE_INUSE, SCARD_STATE_EXCLUSIVE, SCARD_SHARE_SHARED, SCARD_SHARE_EXCLUSIVE, SCARD_UNPOWER_CARD, SCARD_RESET_CARD, SCARD_EJECT_CARD, \
+    INFINITE
+from smartcard_control.model.backend.backend import Backend
+
+PNP_NOTIFICATION = '\\\\?PnP?\\Notification'
+
+# T=0 and T=1 card without historical bytes
+DEFAULT_ATR = [0x3B, 0x80, 0x80, 0x01, 0x01]
+# Instruction code not supported or invalid
+DEFAULT_RESPONSE = [0x6D, 0x00]
+DEFAULT_READER_NAME = 'Virtual Reader {:02d} 00'
+
+ERROR_MESSAGES = {SCARD_S_SUCCESS: 'Command successful.',
+                  SCARD_E_CANCELLED: 'Command cancelled.',
+                  SCARD_E_TIMEOUT: 'Command timeout.',
+                  SCARD_E_INVALID_HANDLE: 'Invalid handle.',
+                  SCARD_E_NO_READERS_AVAILABLE: 'Cannot find a smart card reader.',
+                  SCARD_E_NO_SMARTCARD: 'No smart card inserted.',
+                  SCARD_E_SHARING_VIOLATION: 'Sharing violation.',
+                  SCARD_W_REMOVED_CARD: 'Card was removed.',
+                  SCARD_E_UNKNOWN_READER: 'Unknown reader specified.'}
+
+
+def parseHexPattern(pattern):
+    """Parse an hexadecimal APDU pattern ('00 A4 04 00', '00A40400' or a list of bytes), 'XX' bytes are returned as None."""
+    if not isinstance(pattern, str):
+        return list(pattern)
+    pattern = ''.join(pattern.split()).upper()
+    if len(pattern) % 2:
+        raise Exception("Odd-length hexadecimal pattern: " + pattern)
+    return [None if pattern[i:i + 2] == 'XX' else int(pattern[i:i + 2], 16) for i in range(0, len(pattern), 2)]
+
+
+class VirtualApduRule(object):
+    """Scripted APDU -> response rule of the virtual cards.
+
+    The command pattern is matched against the beginning of the APDU, 'XX' bytes matching any value.
+    The response is either the response bytes (data + SW1 SW2, as a list or an hexadecimal string)
+    or a callable taking the command APDU and returning them.
+    """
+
+    def __init__(self, command, response):
+        self.command = parseHexPattern(command)
+        self.response = response if callable(response) else parseHexPattern(response)
+
+    def matches(self, apdu):
+        if len(apdu) < len(self.command):
+            return False
+        for expected, byte in zip(self.command, apdu):
+            if expected is not None and expected != byte:
+                return False
+        return True
+
+    def respond(self, apdu):
+        if callable(self.response):
+            return list(self.response(apdu))
+        return self.response
+
+
+class VirtualContext(object):
+    """State of a virtual PC/SC context.
+    """
+
+    def __init__(self):
+        # Incremented by each SCardCancel, blocked status change calls are cancelled when it changes
+        self.cancel_count = 0
+        self.waiting = 0
+        # Cancellation requested while no call was blocked, consumed by the next status change call
+        self.cancel_pending = False
+
+
+class VirtualReader(object):
+    """State of a virtual reader and of the card inserted in it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.atr = None
+        # Identifies the card currently inserted, a connection is lost when the card it was bound to is removed
+        self.card_id = None
+        # Number of card insertion/removal, reported in the upper 16 bits of the reader state like pcsc-lite does
+        self.event_count = 0
+        self.connections = 0
+        self.exclusive = False
+        # Connection holding the transaction of the card, the other connections wait for its end to transmit
+        self.transaction = None
+
+    def getState(self):
+        if self.atr is None:
+            state = SCARD_STATE_EMPTY
+        else:
+            state = SCARD_STATE_PRESENT
+            if self.exclusive:
+                state |= SCARD_STATE_EXCLUSIVE
+            elif self.connections:
+                state |= SCARD_STATE_INUSE
+        return state | (self.event_count << 16)
+
+
+class VirtualBackend(Backend):
+    """In-process simulated PC/SC layer, used to run and load test the monitors and the card manager without any hardware.
+
+    It simulates N readers, cards insertion/removal (directly or through a schedule played by a thread),
+    a configurable latency for every APDU and scripted APDU -> response rules (see VirtualApduRule).
+    APDUs not matching any rule are answered with DEFAULT_RESPONSE.
+    """
+
+    name = 'virtual'
+
+    def __init__(self, readers=1, atr=DEFAULT_ATR, latency=0.0, rules=None, reader_name=DEFAULT_READER_NAME):
+        """
+        @param readers: number of readers initially plugged
+        @param atr: ATR of the cards initially inserted in every reader, None to start with empty readers
+        @param latency: time (in seconds) taken by the virtual cards to process an APDU
+        @param rules: list of (command pattern, response) scripted rules
+        @param reader_name: format of the readers name, taking the reader index
+        """
+        self.condition = Condition()
+        self.latency = latency
+        self.rules = []
+        self.reader_name = reader_name
+
+        self.__readers = OrderedDict()
+        self.__readers_event_count = 0
+        self.__contexts = {}
+        self.__last_context = 0
+        self.__last_card_id = 0
+        self.__last_reader_index = -1
+
+        for command, response in rules or []:
+            self.addRule(command, response)
+        for i in range(readers):
+            reader = self.addReader()
+            if atr is not None:
+                self.insertCard(reader, atr)
+
+    @staticmethod
+    def fromConfig(config):
+        """Create a virtual backend from a configuration dictionary (as loaded from a json file), for example:
+
+        {"readers": 4, "atr": "3B 80 80 01 01", "latency": 0.002,
+         "rules": [{"command": "00 A4 04 00", "response": "90 00"}, {"command": "00 B0", "response": "01 02 03 90 00"}],
+         "schedule": [{"time": 0.5, "action": "remove", "reader": 0}, {"time": 1.0, "action": "insert", "reader": 0}],
+         "repeat": 0}
+
+        If a schedule is given, it is played in background right away (see playSchedule).
+        """
+        atr = config.get('atr', DEFAULT_ATR)
+        backend = VirtualBackend(readers=config.get('readers', 1),
+                                 atr=None if atr is None else parseHexPattern(atr),
+                                 latency=config.get('latency', 0.0),
+                                 rules=[(rule['command'], rule['response']) for rule in config.get('rules', [])],
+                                 reader_name=config.get('reader_name', DEFAULT_READER_NAME))
+        if config.get('schedule'):
+            schedule = [(event['time'], event['action'], event['reader'], event.get('atr')) for event in config['schedule']]
+            backend.playSchedule(schedule, repeat=config.get('repeat', 1))
+        return backend
+
+    @staticmethod
+    def fromConfigFile(config_file):
+        with open(config_file, encoding='utf-8') as f:
+            return VirtualBackend.fromConfig(json.load(f))
+
+    """Simulation control
+    """
+
+    def addRule(self, command, response):
+        rule = VirtualApduRule(command, response)
+        self.rules = self.rules + [rule]
+        return rule
+
+    def addReader(self, name=None):
+        with self.condition:
+            self.__last_reader_index += 1
+            if name is None:
+                name = self.reader_name.format(self.__last_reader_index)
+            if name not in self.__readers:
+                self.__readers[name] = VirtualReader(name)
+                self.__readers_event_count = (self.__readers_event_count + 1) & 0xFFFF
+                self.condition.notify_all()
+        return name
+
+    def removeReader(self, reader):
+        with self.condition:
+            reader = self.__getReader(reader)
+            if reader is not None:
+                del self.__readers[reader.name]
+                self.__readers_event_count = (self.__readers_event_count + 1) & 0xFFFF
+                self.condition.notify_all()
+
+    def insertCard(self, reader, atr=DEFAULT_ATR):
+        with self.condition:
+            virtual_reader = self.__getReader(reader)
+            if virtual_reader is None:
+                raise CardConnectionException('Unknown reader: ' + str(reader))
+            reader = virtual_reader
+            self.__last_card_id += 1
+            reader.atr = list(atr)
+            reader.card_id = self.__last_card_id
+            reader.connections = 0
+            reader.exclusive = False
+            reader.transaction = None
+            reader.event_count = (reader.event_count + 1) & 0xFFFF
+            self.condition.notify_all()
+
+    def removeCard(self, reader):
+        with self.condition:
+            reader = self.__getReader(reader)
+            if reader is not None and reader.atr is not None:
+                reader.atr = None
+                reader.card_id = None
+                reader.connections = 0
+                reader.exclusive = False
+                reader.transaction = None
+                reader.event_count = (reader.event_count + 1) & 0xFFFF
+                self.condition.notify_all()
+
+    def applyEvent(self, action, reader, atr=None):
+        """Apply a schedule event: 'insert', 'remove', 'add_reader' or 'remove_reader'."""
+        if action == 'insert':
+            self.insertCard(reader, DEFAULT_ATR if atr is None else parseHexPattern(atr))
+        elif action == 'remove':
+            self.removeCard(reader)
+        elif action == 'add_reader':
+            self.addReader(reader if isinstance(reader, str) else None)
+        elif action == 'remove_reader':
+            self.removeReader(reader)
+        else:
+            raise Exception("Unknown virtual backend event: " + str(action))
+
+    def playSchedule(self, schedule, repeat=1):
+        """Play a schedule of events in a background thread.
+
+        @param schedule: list of (time, action, reader, atr) where time is the offset (in seconds) from the beginning of the schedule,
+          action one of the applyEvent actions, reader a reader index or name and atr the inserted card one (None for the default)
+        @param repeat: number of times the schedule is played, 0 to play it until the thread is stopped
+        @return: the VirtualScheduleThread playing the schedule
+        """
+        thread = VirtualScheduleThread(self, schedule, repeat)
+        thread.start()
+        return thread
+
+    def getReaders(self):
+        with self.condition:
+            return list(self.__readers.keys())
+
+    def __getReader(self, reader):
+        if isinstance(reader, int):
+            readers = list(self.__readers.values())
+            return readers[reader] if reader < len(readers) else None
+        return self.__readers.get(str(reader))
+
+    """PC/SC layer
+    """
+
+    def SCardEstablishContext(self, scope):
+        with self.condition:
+            self.__last_context += 1
+            self.__contexts[self.__last_context] = VirtualContext()
+            return SCARD_S_SUCCESS, self.__last_context
+
+    def SCardReleaseContext(self, hcontext):
+        with self.condition:
+            if self.__contexts.pop(hcontext, None) is None:
+                return SCARD_E_INVALID_HANDLE
+            self.condition.notify_all()
+            return SCARD_S_SUCCESS
+
+    def SCardListReaders(self, hcontext, groups):
+        with self.condition:
+            if hcontext not in self.__contexts:
+                return SCARD_E_INVALID_HANDLE, []
+            if not self.__readers:
+                return SCARD_E_NO_READERS_AVAILABLE, []
+            return SCARD_S_SUCCESS, list(self.__readers.keys())
+
+    def SCardGetStatusChange(self, hcontext, timeout, readers_state):
+        deadline = None if timeout == INFINITE else time.monotonic() + timeout / 1000
+        with self.condition:
+            context = self.__contexts.get(hcontext)
+            if context is None:
+                return SCARD_E_INVALID_HANDLE, readers_state
+            cancel_count = context.cancel_count
+            context.waiting += 1
+            try:
+                return self.__waitStatusChange(hcontext, context, cancel_count, deadline, readers_state)
+            finally:
+                context.waiting -= 1
+
+    def __waitStatusChange(self, hcontext, context, cancel_count, deadline, readers_state):
+        while True:
+            if hcontext not in self.__contexts:
+                return SCARD_E_INVALID_HANDLE, readers_state
+            # Like pcsc-lite a cancellation ends all the calls blocked on the context,
+            # but one requested between two calls is kept for the next one so a monitoring thread cannot miss it
+            if context.cancel_count != cancel_count or context.cancel_pending:
+                context.cancel_pending = False
+                return SCARD_E_CANCELLED, readers_state
+
+            changed = False
+            new_readers_state = []
+            for state in readers_state:
+                reader, current_state = state[0], state[1]
+                if reader == PNP_NOTIFICATION:
+                    event_state, atr = self.__readers_event_count << 16, []
+                elif reader in self.__readers:
+                    event_state, atr = self.__readers[reader].getState(), list(self.__readers[reader].atr or [])
+                else:
+                    event_state, atr = SCARD_STATE_UNKNOWN, []
+
+                if current_state == SCARD_STATE_UNAWARE or current_state & ~SCARD_STATE_CHANGED != event_state:
+                    event_state |= SCARD_STATE_CHANGED
+                    changed = True
+                new_readers_state.append((reader, event_state, atr))
+
+            if changed:
+                return SCARD_S_SUCCESS, new_readers_state
+            if deadline is None:
+                self.condition.wait()
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return SCARD_E_TIMEOUT, new_readers_state
+                self.condition.wait(remaining)
+
+    def SCardCancel(self, hcontext):
+        with self.condition:
+            context = self.__contexts.get(hcontext)
+            if context is None:
+                return SCARD_E_INVALID_HANDLE
+            if context.waiting:
+                context.cancel_count += 1
+            else:
+                context.cancel_pending = True
+            self.condition.notify_all()
+            return SCARD_S_SUCCESS
+
+    def SCardGetErrorMessage(self, hresult):
+        return ERROR_MESSAGES.get(hresult, 'Unknown error: 0x{:08X}'.format(hresult & 0xFFFFFFFF))
+
+    def createConnection(self, reader):
+        return VirtualCardConnection(self, str(reader))
+
+    def beginTransaction(self, connection):
+        connection = self.__getVirtualConnection(connection)
+        with self.condition:
+            while True:
+                virtual_reader = self.__getConnectedReader(connection.reader, connection.card_id, 'Failed to begin the transaction')
+                if virtual_reader.transaction is None or virtual_reader.transaction is connection:
+                    virtual_reader.transaction = connection
+                    return
+                self.condition.wait()
+
+    def endTransaction(self, connection):
+        connection = self.__getVirtualConnection(connection)
+        with self.condition:
+            virtual_reader = self.__getConnectedReader(connection.reader, connection.card_id, 'Failed to end the transaction')
+            if virtual_reader.transaction is connection:
+                virtual_reader.transaction = None
+                self.condition.notify_all()
+
+    @staticmethod
+    def __getVirtualConnection(connection):
+        # VirtualCardConnection under the connection decorators
+        while not isinstance(connection, VirtualCardConnection):
+            connection = connection.component
+        if connection.card_id is None:
+            raise CardConnectionException('Card not connected')
+        return connection
+
+    def waitForCard(self, timeout, card_type):
+        deadline = None if timeout is None or timeout == INFINITE else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                for reader in self.__readers.values():
+                    if reader.atr is not None and card_type.matches(reader.atr, reader.name):
+                        return PassThruCardService(self.createConnection(reader.name))
+                if deadline is None:
+                    self.condition.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise CardRequestTimeoutException()
+                    self.condition.wait(remaining)
+
+    """Virtual cards, used by VirtualCardConnection
+    """
+
+    def connectCard(self, reader, mode):
+        with self.condition:
+            virtual_reader = self.__readers.get(reader)
+            if virtual_reader is None:
+                raise CardConnectionException('Unable to connect: ' + self.SCardGetErrorMessage(SCARD_E_UNKNOWN_READER), hresult=SCARD_E_UNKNOWN_READER)
+            if virtual_reader.atr is None:
+                raise NoCardException('Unable to connect', hresult=SCARD_E_NO_SMARTCARD)
+            if virtual_reader.exclusive or (mode == SCARD_SHARE_EXCLUSIVE and virtual_reader.connections):
+                raise CardConnectionException('Unable to connect: ' + self.SCardGetErrorMessage(SCARD_E_SHARING_VIOLATION), hresult=SCARD_E_SHARING_VIOLATION)
+            virtual_reader.connections += 1
+            virtual_reader.exclusive = mode == SCARD_SHARE_EXCLUSIVE
+            self.condition.notify_all()
+            return virtual_reader.card_id, list(virtual_reader.atr)
+
+    def reconnectCard(self, reader, card_id):
+        with self.condition:
+            self.__getConnectedReader(reader, card_id, 'Unable to reconnect')
+
+    def disconnectCard(self, reader, card_id, disposition, connection=None):
+        with self.condition:
+            virtual_reader = self.__readers.get(reader)
+            if virtual_reader is None or virtual_reader.card_id != card_id:
+                return
+            virtual_reader.connections = max(virtual_reader.connections - 1, 0)
+            virtual_reader.exclusive = virtual_reader.exclusive and virtual_reader.connections > 0
+            if connection is not None and virtual_reader.transaction is connection:
+                # A disconnection ends the transaction
+                virtual_reader.transaction = None
+            self.condition.notify_all()
+        if disposition == SCARD_EJECT_CARD:
+            self.removeCard(reader)
+
+    def transmitCard(self, reader, card_id, apdu, connection=None):
+        with self.condition:
+            while True:
+                virtual_reader = self.__getConnectedReader(reader, card_id, 'Failed to transmit')
+                # Wait for the end of the transaction of another connection
+                if virtual_reader.transaction is None or virtual_reader.transaction is connection:
+                    break
+                self.condition.wait()
+        if self.latency:
+            time.sleep(self.latency)
+
+        response = DEFAULT_RESPONSE
+        for rule in self.rules:
+            if rule.matches(apdu):
+                response = rule.respond(apdu)
+                break
+        return list(response[:-2]), response[-2], response[-1]
+
+    def __getConnectedReader(self, reader, card_id, message):
+        virtual_reader = self.__readers.get(reader)
+        if virtual_reader is None or virtual_reader.card_id != card_id:
+            raise NoCardException(message, hresult=SCARD_W_REMOVED_CARD)
+        return virtual_reader
+
+
+class VirtualCardConnection(CardConnection):
+    """Card connection to a card of a VirtualBackend.
+    """
+
+    def __init__(self, backend, reader):
+        CardConnection.__init__(self, reader)
+        self.backend = backend
+        self.disposition = SCARD_UNPOWER_CARD
+        self.card_id = None
+        self.atr = None
+
+    @property
+    def component(self):
+        # Same access to the connection as through a pyscard CardConnectionDecorator
+        return self
+
+    def connect(self, protocol=None, mode=None, disposition=None):
+        CardConnection.connect(self, protocol)
+        if mode is None:
+            mode = SCARD_SHARE_SHARED
+        if disposition is None:
+            disposition = SCARD_UNPOWER_CARD
+        self.disposition = disposition
+        self.card_id, self.atr = self.backend.connectCard(self.reader, mode)
+        if protocol is None:
+            protocol = self.getProtocol()
+        self.setProtocol(CardConnection.T1_protocol if protocol & CardConnection.T1_protocol else CardConnection.T0_protocol)
+
+    def reconnect(self, protocol=None, mode=None, disposition=None):
+        CardConnection.reconnect(self, protocol)
+        if self.card_id is None:
+            raise CardConnectionException('Card not connected')
+        if disposition is None:
+            disposition = SCARD_RESET_CARD
+        self.disposition = disposition
+        try:
+            self.backend.reconnectCard(self.reader, self.card_id)
+        except NoCardException:
+            self.card_id = None
+            raise
+
+    def disconnect(self):
+        CardConnection.disconnect(self)
+        if self.card_id is not None:
+            self.backend.disconnectCard(self.reader, self.card_id, self.disposition, self)
+            self.card_id = None
+
+    def getATR(self):
+        if self.card_id is None:
+            raise CardConnectionException('Card not connected')
+        return self.atr
+
+    def doTransmit(self, bytes, protocol=None):
+        if self.card_id is None:
+            raise CardConnectionException('Card not connected')
+        try:
+            return self.backend.transmitCard(self.reader, self.card_id, list(bytes), self)
+        except NoCardException as e:
+            raise CardConnectionException('Failed to transmit: ' + str(e), hresult=SCARD_W_REMOVED_CARD)
+
+
+class VirtualScheduleThread(Thread):
+    """Thread playing a schedule of events on a VirtualBackend.
+    """
+
+    def __init__(self, backend, schedule, repeat=1):
+        Thread.__init__(self)
+        self.daemon = True
+        self.stopEvent = Event()
+        self.backend = backend
+        self.schedule = sorted(schedule, key=lambda event: event[0])
+        self.repeat = repeat
+        self.events_count = 0
+
+    def run(self):
+        iteration = 0
+        while not self.stopEvent.is_set() and (self.repeat == 0 or iteration < self.repeat):
+            start = time.monotonic()
+            for event in self.schedule:
+                delay = event[0] - (time.monotonic() - start)
+                if delay > 0 and self.stopEvent.wait(delay):
+                    return
+                try:
+                    self.backend.applyEvent(*event[1:])
+                    self.events_count += 1
+                except Exception as e:
+                    logging.error("unable to play virtual event %s: %s", event, e)
+            iteration += 1
+
+    def stop(self):
+        self.stopEvent.set()
+        self.join()
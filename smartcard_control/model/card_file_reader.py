@@ -0,0 +1,189 @@
+import logging
+from time import perf_counter
+
+from smartcard_control.utils.apdu_utils import buildApdu, SHORT_MAX_LE, EXTENDED_MAX_LE
+
+"""
+Streaming readers of elementary files: transparent files (READ BINARY) and record files (READ RECORD)
+
+The readers are iterables of chunks, created by CardManager.readBinary and CardManager.readRecords:
+
+    reader = card_manager.readBinary(size=32768, sfi=0x01)
+    for chunk in reader:
+        ...
+    print(reader.bytes_read, reader.getThroughput())
+"""
+
+READ_BINARY_INS = 0xB0
+READ_RECORD_INS = 0xB2
+
+# Highest offset of a READ BINARY with an even INS (15 bits in P1 P2)
+MAX_BINARY_OFFSET = 0x7FFF
+
+
+class CardFileReader(object):
+    """Iterable over the chunks read from a card file, counting the bytes read, the exchanges and the time taken.
+
+    The chunks are written in the output file if any, and in the buffer if any (the chunks yielded being then views of
+    the buffer, valid until it is modified).
+    """
+
+    def __init__(self, card_manager, buffer=None, output=None):
+        """
+        @param card_manager: connected CardManager
+        @param buffer: writable bytes-like object (bytearray, memoryview...) receiving the data
+        @param output: binary file object receiving the data
+        """
+        self.card_manager = card_manager
+        self.buffer = None if buffer is None else memoryview(buffer).cast('B')
+        self.output = output
+        self.bytes_read = 0
+        self.round_trips = 0
+        self.duration = 0.0
+
+    def __iter__(self):
+        start = perf_counter()
+        try:
+            for chunk in self._readChunks():
+                if self.buffer is not None:
+                    if self.bytes_read + len(chunk) > len(self.buffer):
+                        raise Exception("Buffer too small for the file ({} bytes)".format(len(self.buffer)))
+                    self.buffer[self.bytes_read:self.bytes_read + len(chunk)] = chunk
+                    chunk = self.buffer[self.bytes_read:self.bytes_read + len(chunk)]
+                if self.output is not None:
+                    self.output.write(chunk)
+                self.bytes_read += len(chunk)
+                self.duration = perf_counter() - start
+                yield chunk
+        finally:
+            self.duration = perf_counter() - start
+
+    def read(self):
+        """Read the whole file.
+
+        @return: the data read (a view of the buffer if any)
+        """
+        if self.buffer is not None:
+            for _ in self:
+                pass
+            return self.buffer[:self.bytes_read]
+        return b''.join(bytes(chunk) for chunk in self)
+
+    def getThroughput(self):
+        """@return: bytes read per second"""
+        return self.bytes_read / self.duration if self.duration else 0.0
+
+    def _transmit(self, apdu_message):
+        data, sw1, sw2 = self.card_manager.transmit(apdu_message, auto_response=True)
+        self.round_trips += self.card_manager.round_trips
+        return bytes(data), sw1, sw2
+
+    def _readChunks(self):
+        raise NotImplementedError
+
+
+class BinaryFileReader(CardFileReader):
+    """READ BINARY of a transparent file, with the largest Le accepted by the card.
+
+    The first Le is the largest allowed by the APDU encoding (65536 with extended length, else 256), bounded by the bytes
+    left when the size is known. A shorter answer (6CXX corrected Le, or a card limit) lowers Le for the next chunks,
+    6700 (wrong length) halves it. The file ends at the given size, or else on 6282 (end of file reached), 6B00 or an
+    empty answer.
+    """
+
+    def __init__(self, card_manager, size=None, offset=0, sfi=None, max_le=None, buffer=None, output=None):
+        """
+        @param size: number of bytes to read, up to the end of the file if None
+        @param offset: offset of the first byte to read
+        @param sfi: short file identifier of the file, the current EF if None
+        @param max_le: maximum Le, the largest allowed by the encoding if None
+        """
+        if buffer is None and size is not None and output is None:
+            buffer = bytearray(size)
+        super().__init__(card_manager, buffer, output)
+        self.size = size
+        self.offset = offset
+        self.sfi = sfi
+        if max_le is None:
+            max_le = EXTENDED_MAX_LE if card_manager.supportsExtendedLength() else SHORT_MAX_LE
+        self.max_le = max_le
+
+    def _readChunks(self):
+        offset = self.offset
+        sfi = self.sfi
+        le = self.max_le
+        while self.size is None or offset < self.offset + self.size:
+            if self.size is not None:
+                le = min(le, self.offset + self.size - offset)
+            if sfi is not None:
+                if offset > 0xFF:
+                    raise Exception("Offset {} too large to be read with a short file identifier".format(offset))
+                p1, p2 = 0x80 | sfi, offset
+            else:
+                if offset > MAX_BINARY_OFFSET:
+                    if self.size is None:
+                        # End of the space addressable by READ BINARY
+                        return
+                    raise Exception("Offset {} too large for READ BINARY".format(offset))
+                p1, p2 = offset >> 8, offset & 0xFF
+
+            data, sw1, sw2 = self._transmit(buildApdu(0x00, READ_BINARY_INS, p1, p2, le=le))
+            if sw1 == 0x67 and sw2 == 0x00 and le > 1:
+                le //= 2
+                logging.debug("READ BINARY wrong length, Le lowered to %d", le)
+                continue
+            if sw1 == 0x62 and sw2 == 0x82:
+                # End of file reached before reading Le bytes
+                if data:
+                    yield data
+                return
+            if (sw1 == 0x6B and sw2 == 0x00) and self.size is None:
+                return
+            if sw1 != 0x90 or sw2 != 0x00:
+                raise Exception("READ BINARY failed at offset {} : {:02X}{:02X}".format(offset, sw1, sw2))
+            if not data:
+                return
+
+            # The EF is selected by the first read with a short file identifier
+            sfi = None
+            offset += len(data)
+            if len(data) < le:
+                le = len(data)
+            yield data
+
+
+class RecordFileReader(CardFileReader):
+    """READ RECORD of the records of a linear or cyclic file, one chunk per record.
+
+    The records are read with the largest Le allowed by the APDU encoding (a 6CXX status word being corrected), until
+    6A83 (record not found) or the given count.
+    """
+
+    def __init__(self, card_manager, sfi=None, first=1, count=None, max_le=None, buffer=None, output=None):
+        """
+        @param sfi: short file identifier of the file, the current EF if None
+        @param first: number of the first record
+        @param count: number of records to read, up to the last one if None
+        @param max_le: maximum Le, the largest allowed by the encoding if None
+        """
+        super().__init__(card_manager, buffer, output)
+        self.sfi = sfi
+        self.first = first
+        self.count = count
+        if max_le is None:
+            max_le = EXTENDED_MAX_LE if card_manager.supportsExtendedLength() else SHORT_MAX_LE
+        self.max_le = max_le
+        self.records = 0
+
+    def _readChunks(self):
+        p2 = 0x04 if self.sfi is None else (self.sfi << 3) | 0x04
+        record = self.first
+        while record <= 0xFE and (self.count is None or record < self.first + self.count):
+            data, sw1, sw2 = self._transmit(buildApdu(0x00, READ_RECORD_INS, record, p2, le=self.max_le))
+            if sw1 == 0x6A and sw2 == 0x83:
+                return
+            if (sw1 != 0x90 or sw2 != 0x00) and (sw1 != 0x62 or sw2 != 0x82):
+                raise Exception("READ RECORD failed on record {} : {:02X}{:02X}".format(record, sw1, sw2))
+            self.records += 1
+            record += 1
+            yield data
@@ -1,44 +1,66 @@
 import logging
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter_ns
 
 from smartcard.CardConnectionObserver import CardConnectionObserver
-from smartcard.CardRequest import CardRequest
 from smartcard.CardType import AnyCardType
-from smartcard.Exceptions import CardConnectionException
-from smartcard.scard import SCARD_LEAVE_CARD, SCARD_SHARE_SHARED, SCARD_RESET_CARD, SCARD_UNPOWER_CARD
+from smartcard.Exceptions import CardConnectionException, NoCardException
+from smartcard.PassThruCardService import PassThruCardService
+from smartcard.scard import SCARD_LEAVE_CARD, SCARD_SHARE_SHARED, SCARD_RESET_CARD, SCARD_UNPOWER_CARD, SCARD_EJECT_CARD
 from smartcard.util import toHexString
+from smartcard_control.model.backend.backend import getBackend
+from smartcard_control.model.card_file_reader import BinaryFileReader, RecordFileReader
+from smartcard_control.model.card_stats import CardStats
+from smartcard_control.model.monitoring.devices_monitoring import Observable
 from smartcard_control.model.monitoring.reader_monitoring import ReaderObserver, ReaderMonitor
 from smartcard_control.model.monitoring.card_monitoring import CardObserver, CardMonitor
 
-from smartcard_control.utils.apdu_utils import parseIsoApduResponse
+from smartcard_control.utils.apdu import Apdu, Response
+from smartcard_control.utils.apdu_utils import parseIsoApduResponse, getResponseCommand, setApduLe, needsExtendedLength, buildApdu, buildChainedApdus, \
+    parseStatusWordPattern, matchStatusWord
+from smartcard_control.utils.atr_utils import getAtrInfo, getAtrProtocol
+
+# Maximum number of exchanges of an automatic transmit (GET RESPONSE chaining and Le correction)
+MAX_ROUND_TRIPS = 256
+
+# Status words ending a batch by default: any one but a success
+BATCH_SUCCESS_STATUS_WORDS = ('9000',)
 
 
 class ConsoleCardConnectionObserver(CardConnectionObserver):
-    def update(self, cardconnection, ccevent):
-        if 'connect' == ccevent.type:
-            logging.info('connect event on reader %s', cardconnection.getReader())
-            pass
+    """Log the connection events and the APDUs exchanged with the card.
 
-        elif 'reconnect' == ccevent.type:
-            logging.info('reconnect event on reader %s', cardconnection.getReader())
-            pass
+    The APDUs are only formatted when the INFO level is enabled, so the observer costs a level check when logging is off.
+    """
 
-        elif 'disconnect' == ccevent.type:
-            logging.info('disconnect event on reader %s', cardconnection.getReader())
-            pass
+    def update(self, cardconnection, ccevent):
+        if not logging.root.isEnabledFor(logging.INFO):
+            return
 
-        elif 'command' == ccevent.type:
+        if 'command' == ccevent.type:
             logging.info('command > %s ', toHexString(ccevent.args[0]))
 
         elif 'response' == ccevent.type:
+            sw1 = '{:02X}'.format(ccevent.args[-2])
+            sw2 = '{:02X}'.format(ccevent.args[-1])
             message = toHexString(ccevent.args[0])
-            sw1 = toHexString([ccevent.args[-2]])
-            sw2 = toHexString([ccevent.args[-1]])
-            logging.debug('response : %s %s %s', toHexString([ccevent.args[-2]]), toHexString([ccevent.args[-1]]), toHexString(ccevent.args[0]))
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug('response : %s %s %s', sw1, sw2, message)
             if not message:
                 logging.info(parseIsoApduResponse(sw1, sw2))
             else:
                 logging.info(parseIsoApduResponse(sw1, sw2, message))
 
+        elif 'connect' == ccevent.type:
+            logging.info('connect event on reader %s', cardconnection.getReader())
+
+        elif 'reconnect' == ccevent.type:
+            logging.info('reconnect event on reader %s', cardconnection.getReader())
+
+        elif 'disconnect' == ccevent.type:
+            logging.info('disconnect event on reader %s', cardconnection.getReader())
+
 
 class CardManager(object):
     """
@@ -49,60 +71,367 @@ class CardManager(object):
             SCARD_RESET_CARD        Reset the card (warm reset)
             SCARD_UNPOWER_CARD      Unpower the card (cold reset)
             SCARD_EJECT_CARD        Eject the card
+
+        param: backend=None
+            PC/SC backend used to wait for and connect to cards (see model.backend), the selected one (getBackend) if None
+
+        param: card_stats=None
+            CardStats recording the latencies and errors of the operations (see stats), a new one if None
+
+        param: auto_response=False
+            default transmit mode: chain GET RESPONSE commands on 61XX and re-issue the command with the corrected Le on 6CXX
+            (see transmit), the number of exchanges of the last transmit being in round_trips
+
+        param: extended_length=None
+            use the extended length encoding for the commands of transmitCommand too long for short APDUs, or else command
+            chaining. Taken from the ATR card capabilities (see utils.atr_utils) on each connection if None
         """
 
-    def __init__(self, request_timeout=10, card_type=AnyCardType(), disposition=SCARD_LEAVE_CARD, share_mode=SCARD_SHARE_SHARED):
+    def __init__(self, request_timeout=10, card_type=AnyCardType(), disposition=SCARD_LEAVE_CARD, share_mode=SCARD_SHARE_SHARED, backend=None, card_stats=None,
+                 auto_response=False, extended_length=None):
         self.request_timeout = request_timeout
 
         self.__card_type = card_type
         self.__disposition = disposition
         self.__share_mode = share_mode
+        self.__backend = backend
 
         self.__card_service = None
-        self.__card_request = None
-
-    def connect(self, card_type=None, share_mode=None):
+        self.__reader = None
+        self.__connection_observers = [ConsoleCardConnectionObserver()]
+        self.card_stats = CardStats() if card_stats is None else card_stats
+        self.auto_response = auto_response
+        self.round_trips = 0
+        self.extended_length = extended_length
+        self.__extended_length = extended_length
+        self.__transaction_depth = 0
+
+    @property
+    def backend(self):
+        if self.__backend is None:
+            return getBackend()
+        return self.__backend
+
+    def connect(self, card_type=None, share_mode=None, reader=None, wait=False):
+        """Connect to a card matching card_type.
+
+        @param reader: name of the reader of the card, to connect straight to it instead of waiting for any matching card
+        @param wait: if the card of reader cannot be connected or does not match card_type,
+          fall back to waiting for any matching card (up to request_timeout) instead of raising the error
+        @raise NoCardException, CardConnectionException: if the card of reader cannot be connected or does not match card_type
+        @raise CardRequestTimeoutException: if no matching card was found while waiting
+        """
         if card_type is not None:
             self.__card_type = card_type
         if share_mode is not None:
             self.__share_mode = share_mode
 
-        self.__card_request = CardRequest(timeout=self.request_timeout, cardType=self.__card_type)
-        self.__card_service = self.__card_request.waitforcard()
-        # APDU message observer
-        observer = ConsoleCardConnectionObserver()
-        self.__card_service.connection.addObserver(observer)
+        start = perf_counter_ns()
+        try:
+            self.__connect(reader, wait)
+        except Exception:
+            self.card_stats.addError('connect', reader)
+            raise
+        self.card_stats.addLatency('connect', self.__reader, perf_counter_ns() - start)
+
+    def __connect(self, reader, wait):
+        if reader is not None:
+            try:
+                self.connectCardService(PassThruCardService(self.backend.createConnection(reader)), protocol=self.__getProtocol(reader))
+                if self.__card_type.matches(self.__card_service.connection.getATR(), reader):
+                    return
+                self.__card_service.connection.disconnect()
+                raise CardConnectionException("The card of reader {} does not match the card type".format(reader))
+            except (CardConnectionException, NoCardException) as ce:
+                if not wait:
+                    raise
+                logging.info("unable to connect to the card of reader %s, waiting for a matching card: %s", reader, ce)
+
+        self.connectCardService(self.backend.waitForCard(self.request_timeout, self.__card_type))
+
+    def __getProtocol(self, reader):
+        # Protocol of the card of reader from its (cached) ATR capabilities, when the devices list manager knows its ATR
+        atr = DevicesListManager.snapshot.getAtr(reader)
+        if atr is None:
+            return None
+        try:
+            return getAtrProtocol(getAtrInfo(atr))
+        except Exception as e:
+            logging.warning("unable to parse the ATR %s of reader %s: %s", atr, reader, e)
+            return None
+
+    def connectCardService(self, card_service, share_mode=None, protocol=None):
+        """Connect to the card bound to a card service, as returned by the backend waitForCard method.
+
+        @param card_service: card service whose connection is not connected yet
+        @param share_mode: share mode of the connection, the current one if None
+        @param protocol: SCARD_PROTOCOL_T0 and/or SCARD_PROTOCOL_T1, negotiated by the reader if None
+        """
+        if share_mode is not None:
+            self.__share_mode = share_mode
+
+        self.__card_service = card_service
+        self.__reader = str(card_service.connection.getReader())
+        self.__extended_length = self.extended_length
+        self.__transaction_depth = 0
+        # APDU message observers
+        for observer in self.__connection_observers:
+            self.__card_service.connection.addObserver(observer)
+
+        self.__card_service.connection.connect(protocol=protocol, disposition=self.__disposition, mode=self.__share_mode)
+
+    def addConnectionObserver(self, observer):
+        """Add a CardConnectionObserver to the current card connection and to the following ones.
+        """
+        if observer in self.__connection_observers:
+            return
+        self.__connection_observers.append(observer)
+        if self.__card_service is not None:
+            self.__card_service.connection.addObserver(observer)
 
-        self.__card_service.connection.connect(disposition=self.__disposition, mode=self.__share_mode)
+    def deleteConnectionObserver(self, observer):
+        self.__connection_observers.remove(observer)
+        if self.__card_service is not None:
+            self.__card_service.connection.deleteObserver(observer)
 
     def reconnect(self, disposition=None):
         if disposition is not None:
             self.__disposition = disposition
-        self.__card_service.connection.reconnect(disposition=self.__disposition, mode=self.__share_mode)
+        self.__measure('reconnect', self.__card_service.connection.reconnect, disposition=self.__disposition, mode=self.__share_mode)
 
     def disconnect(self, disposition=None):
         if disposition is not None:
             self.__disposition = disposition
-        self.__card_service.connection.component.__disposition = SCARD_LEAVE_CARD
+        # Disposition applied by the connection on SCardDisconnect (a reconnection overwrites the one given to connect)
+        self.__card_service.connection.component.disposition = self.__disposition
         self.__card_service.connection.disconnect()
 
     def warm_reset(self):
-        self.__card_service.connection.reconnect(disposition=SCARD_RESET_CARD, mode=self.__share_mode)
+        self.__measure('warm_reset', self.__card_service.connection.reconnect, disposition=SCARD_RESET_CARD, mode=self.__share_mode)
 
     def cold_reset(self):
-        self.__card_service.connection.reconnect(disposition=SCARD_UNPOWER_CARD, mode=self.__share_mode)
+        self.__measure('cold_reset', self.__card_service.connection.reconnect, disposition=SCARD_UNPOWER_CARD, mode=self.__share_mode)
 
     def eject(self):
-        self.__card_service.connection.component.__disposition = SCARD_LEAVE_CARD
-        self.__card_service.connection.disconnect()
+        self.__card_service.connection.component.disposition = SCARD_EJECT_CARD
+        self.__measure('eject', self.__card_service.connection.disconnect)
+
+    def transmit(self, apdu_message, auto_response=None):
+        """Send an APDU to the card.
+
+        In automatic mode, a 61XX status word is followed by GET RESPONSE commands until all the response is read, and a
+        6CXX status word by the same command with Le set to XX. The data of all the exchanges is returned as one response,
+        with the status word of the last one, and the number of exchanges is set in round_trips.
+
+        @param apdu_message: APDU as a list of int or an Apdu
+        @param auto_response: automatic mode for this APDU, the auto_response of the manager if None
+        @return: (data, sw1, sw2)
+        """
+        self.round_trips = 1
+        data, sw1, sw2 = self.__transmit(apdu_message)
+        if not (self.auto_response if auto_response is None else auto_response) or (sw1 != 0x61 and sw1 != 0x6C):
+            return data, sw1, sw2
+
+        buffer = bytearray()
+        command = apdu_message
+        while self.round_trips < MAX_ROUND_TRIPS:
+            if sw1 == 0x61:
+                buffer += bytes(data)
+                command = getResponseCommand(apdu_message[0], sw2)
+            elif sw1 == 0x6C:
+                corrected_command = setApduLe(command, sw2)
+                # 6CXX answered to a command already having Le = XX: resending it would get the same status
+                if corrected_command is None or corrected_command == list(command):
+                    break
+                command = corrected_command
+            else:
+                buffer += bytes(data)
+                return list(buffer), sw1, sw2
+            self.round_trips += 1
+            data, sw1, sw2 = self.__transmit(command)
+        return list(buffer + bytes(data)), sw1, sw2
+
+    def transmitApdu(self, apdu, auto_response=None):
+        """Send an APDU to the card (see transmit).
+
+        @param apdu: Apdu, bytes or list of int
+        @return: Response
+        """
+        if not isinstance(apdu, Apdu):
+            apdu = Apdu(apdu)
+        return Response(*self.transmit(apdu, auto_response))
+
+    def transmitCommand(self, cla, ins, p1, p2, data=b'', le=None):
+        """Build and send a command of any size (up to 65535 data bytes and 65536 expected bytes).
+
+        A command fitting in a short APDU is sent as is. A longer one is sent as an extended length APDU if the card supports
+        it, else split with command chaining (the response of the last APDU being read with GET RESPONSE).
+        The extended length support is taken from the ATR unless set by extended_length. A card answering 6700 (wrong length)
+        to an extended length APDU is considered as not supporting it for the rest of the connection.
+        The response data is always gathered with GET RESPONSE / Le correction (see transmit) and round_trips counts all
+        the exchanges.
+
+        @param data: command data (bytes or list of int)
+        @param le: number of bytes expected in the response, None if no response data is expected
+        @return: (data, sw1, sw2)
+        """
+        data = bytes(data)
+        if not needsExtendedLength(len(data), le):
+            return self.transmit(buildApdu(cla, ins, p1, p2, data, le), auto_response=True)
+
+        round_trips = 0
+        if self.supportsExtendedLength():
+            response = self.transmit(buildApdu(cla, ins, p1, p2, data, le, extended=True), auto_response=True)
+            if response[1] != 0x67 or response[2] != 0x00:
+                return response
+            logging.info("extended length APDU refused by the card of reader %s, using command chaining", self.__reader)
+            self.__extended_length = False
+            round_trips = self.round_trips
+
+        apdus = buildChainedApdus(cla, ins, p1, p2, data, le)
+        for apdu in apdus[:-1]:
+            response = self.transmit(apdu, auto_response=False)
+            round_trips += 1
+            if response[1] != 0x90 or response[2] != 0x00:
+                self.round_trips = round_trips
+                return response
+        response = self.transmit(apdus[-1], auto_response=True)
+        self.round_trips += round_trips
+        return response
+
+    @contextmanager
+    def transaction(self):
+        """Context in which the APDUs are exchanged in one PC/SC transaction (SCardBeginTransaction/SCardEndTransaction):
+        the card is locked once for all of them, instead of once per APDU, and the other connections to the card (of
+        this process or others) cannot send commands between them. Nested contexts share the outer transaction.
+
+            with card_manager.transaction():
+                card_manager.transmit(select_apdu)
+                card_manager.transmit(verify_apdu)
+        """
+        if not self.__transaction_depth:
+            self.__measure('begin_transaction', self.backend.beginTransaction, connection=self.__card_service.connection)
+        self.__transaction_depth += 1
+        try:
+            yield self
+        finally:
+            self.__transaction_depth -= 1
+            if not self.__transaction_depth:
+                try:
+                    self.backend.endTransaction(self.__card_service.connection)
+                except (CardConnectionException, NoCardException) as ce:
+                    # The card has been removed or reset, which ends the transaction
+                    logging.warning("unable to end the transaction on reader %s: %s", self.__reader, ce)
+
+    def batch(self, apdus, stop_on=None, continue_on=None, auto_response=None):
+        """Send a sequence of APDUs in one transaction (see transaction), stopping at the first unexpected status word.
+
+        @param apdus: APDUs (Apdu, bytes or lists of int)
+        @param stop_on: status word patterns ('6A82', '6XXX'...) ending the batch
+        @param continue_on: status word patterns continuing the batch, any other one ending it.
+          '9000' if neither stop_on nor continue_on is given
+        @param auto_response: GET RESPONSE / Le correction mode of the APDUs (see transmit)
+        @return: list of the Response of the APDUs sent, the last one being the one which stopped the batch if any
+        """
+        apdus = list(apdus)
+        stop_patterns = [parseStatusWordPattern(pattern) for pattern in stop_on or ()]
+        if continue_on is None and stop_on is None:
+            continue_on = BATCH_SUCCESS_STATUS_WORDS
+        continue_patterns = None if continue_on is None else [parseStatusWordPattern(pattern) for pattern in continue_on]
+
+        responses = []
+        round_trips = 0
+        with self.transaction():
+            for apdu in apdus:
+                response = self.transmitApdu(apdu, auto_response)
+                responses.append(response)
+                round_trips += self.round_trips
+                sw1, sw2 = response.sw1, response.sw2
+                if matchStatusWord(stop_patterns, sw1, sw2) or (continue_patterns is not None and not matchStatusWord(continue_patterns, sw1, sw2)):
+                    logging.info("batch stopped on reader %s by %02X%02X after %d of %d APDUs", self.__reader, sw1, sw2, len(responses), len(apdus))
+                    break
+        self.round_trips = round_trips
+        return responses
+
+    def supportsExtendedLength(self):
+        """@return: True if extended length APDUs are used with the connected card (see extended_length)"""
+        if self.__extended_length is None:
+            try:
+                self.__extended_length = getAtrInfo(self.__card_service.connection.getATR()).extended_length
+            except CardConnectionException:
+                raise
+            except Exception as e:
+                logging.warning("unable to parse the ATR of reader %s: %s", self.__reader, e)
+                self.__extended_length = False
+        return self.__extended_length
+
+    def readBinary(self, size=None, offset=0, sfi=None, max_le=None, buffer=None, output=None):
+        """Read a transparent file with READ BINARY commands of the largest Le accepted by the card.
+
+        Nothing is read until the returned reader is iterated (chunk by chunk) or read (whole file). Without buffer nor
+        output, a buffer of size bytes is allocated when the size is known.
+
+        @param size: number of bytes to read, up to the end of the file if None
+        @param offset: offset of the first byte to read
+        @param sfi: short file identifier of the file, the current EF if None
+        @param max_le: maximum Le, 65536 with extended length else 256 if None
+        @param buffer: writable bytes-like object receiving the data
+        @param output: binary file object receiving the data
+        @return: BinaryFileReader, iterable of the chunks read, with bytes_read, round_trips and getThroughput
+        """
+        return BinaryFileReader(self, size, offset, sfi, max_le, buffer, output)
+
+    def readRecords(self, sfi=None, first=1, count=None, max_le=None, buffer=None, output=None):
+        """Read the records of a record file with READ RECORD commands, up to the last record or count records.
 
-    def transmit(self, apdu_message):
-        return self.__card_service.connection.transmit(apdu_message)
+        @return: RecordFileReader, iterable of the records read, with bytes_read, round_trips and getThroughput
+        """
+        return RecordFileReader(self, sfi, first, count, max_le, buffer, output)
+
+    def __transmit(self, apdu_message):
+        start = perf_counter_ns()
+        try:
+            response = self.__card_service.connection.transmit(apdu_message.toList() if isinstance(apdu_message, Apdu) else apdu_message)
+        except Exception:
+            self.card_stats.addError('transmit', self.__reader)
+            raise
+        self.card_stats.addLatency('transmit', self.__reader, perf_counter_ns() - start, apdu_message[1] if len(apdu_message) > 1 else None, response[-2], response[-1])
+        return response
+
+    def stats(self):
+        """Latency percentiles and error/reconnection counters of the operations of the manager (see CardStats.stats)."""
+        return self.card_stats.stats()
+
+    def __measure(self, operation, function, **kwargs):
+        start = perf_counter_ns()
+        try:
+            function(**kwargs)
+        except Exception:
+            self.card_stats.addError(operation, self.__reader)
+            raise
+        self.card_stats.addLatency(operation, self.__reader, perf_counter_ns() - start)
 
     def getCardInfo(self):
         print("-------- CARD INFO --------")
-        print("\tATR : {}".format(toHexString(self.__card_service.connection.getATR())))
+        atr = self.__card_service.connection.getATR()
+        print("\tATR : {}".format(toHexString(atr)))
         print("\tReader : {}".format(self.__card_service.connection.getReader()))
+        try:
+            atr_info = getAtrInfo(atr)
+        except Exception as e:
+            print("\tInvalid ATR : {}".format(e))
+        else:
+            print("\tConvention : {}".format(atr_info.convention))
+            print("\tProtocols : {}{}".format(', '.join('T={}'.format(protocol) for protocol in atr_info.protocols),
+                                              '' if atr_info.specific_protocol is None else " (specific mode T={})".format(atr_info.specific_protocol)))
+            print("\tFi/Di : {}/{} (f max : {} MHz)".format(atr_info.fi, atr_info.di, atr_info.f_max))
+            print("\tExtra guard time : {}".format(atr_info.extra_guard_time))
+            if atr_info.ifsc is not None:
+                print("\tT=1 : IFSC {}, BWI {}, CWI {}, {}".format(atr_info.ifsc, atr_info.bwi, atr_info.cwi, 'CRC' if atr_info.crc else 'LRC'))
+            print("\tHistorical bytes : {}".format(toHexString(list(atr_info.historical_bytes))))
+            print("\tCommand chaining : {}, extended length : {}".format(atr_info.command_chaining, atr_info.extended_length))
+            if atr_info.tck is not None:
+                print("\tTCK : {:02X} ({})".format(atr_info.tck, 'valid' if atr_info.tck_valid else 'INVALID'))
         print("---------------------------")
 
     def verifyCardConnected(self):
@@ -113,6 +442,66 @@ class CardManager(object):
             raise CardConnectionException
 
 
+class DevicesSnapshot(object):
+    """Immutable state of the readers and cards known by the DevicesListManager.
+
+    A snapshot is never modified: each change of the devices creates a new snapshot (copy on write) with the next version,
+    so the snapshots can be read from any thread without lock. Cards are indexed by position (detection order), reader
+    name and ATR (hexadecimal string).
+    """
+
+    def __init__(self, version=0, readers=(), cards=()):
+        """
+        @param readers: reader names
+        @param cards: (reader, atr) pairs, atr being an hexadecimal string
+        """
+        self.version = version
+        self.readers = tuple(readers)
+        self.cards = tuple(cards)
+        self.__card_indexes = {reader: index for index, (reader, atr) in enumerate(self.cards)}
+        self.__atr_readers = {}
+        for reader, atr in self.cards:
+            self.__atr_readers.setdefault(atr, []).append(reader)
+
+    def withCards(self, added_cards, removed_cards):
+        """@return: new snapshot with the cards (reader, atr) removed then added"""
+        removed_readers = set(reader for reader, atr in removed_cards) | set(reader for reader, atr in added_cards)
+        cards = [card for card in self.cards if card[0] not in removed_readers] + list(added_cards)
+        return DevicesSnapshot(self.version + 1, self.readers, cards)
+
+    def withReaders(self, added_readers, removed_readers):
+        """@return: new snapshot with the readers removed then added"""
+        removed_readers = set(removed_readers)
+        readers = [reader for reader in self.readers if reader not in removed_readers]
+        readers += [reader for reader in added_readers if reader not in readers]
+        return DevicesSnapshot(self.version + 1, readers, self.cards)
+
+    def getCard(self, index):
+        """@return: (reader, atr) of the card at index
+        @raise Exception: if there is no card at index
+        """
+        if not 0 <= index < len(self.cards):
+            raise Exception("Unknown card (wrong index)")
+        return self.cards[index]
+
+    def getCardIndex(self, reader):
+        """@return: index of the card of reader, None if there is none"""
+        return self.__card_indexes.get(reader)
+
+    def getAtr(self, reader):
+        """@return: ATR (hexadecimal string) of the card of reader, None if there is none"""
+        index = self.__card_indexes.get(reader)
+        return None if index is None else self.cards[index][1]
+
+    def getReadersFromAtr(self, atr):
+        """@param atr: hexadecimal string or list of bytes
+        @return: tuple of the readers holding a card with this ATR
+        """
+        if not isinstance(atr, str):
+            atr = toHexString(list(atr))
+        return tuple(self.__atr_readers.get(atr, ()))
+
+
 class DevicesListManager(object):
     """
     Singleton class to manage connection to a smartcard reader and a smartcard
@@ -125,25 +514,39 @@ class DevicesListManager(object):
     __card_observer = None
     __card_monitor = None
 
-    readers_list = []
-    cards_list = {}
+    # Current DevicesSnapshot, replaced (under snapshot_mutex) by the observers on each change and read without lock
+    snapshot = DevicesSnapshot()
+    snapshot_mutex = Lock()
+    card_observable = Observable()
 
     class ManagerCardObserver(CardObserver):
 
         def update(self, actions):
             (added_cards, removed_cards) = actions
 
+            added = []
             for card in added_cards:
                 card_atr = toHexString(card.atr)
-                card_reader = card.reader
-                DevicesListManager.cards_list[card_reader] = card_atr
-                logging.info("detected new card added with atr: %s on reader: %s", card_atr, card_reader)
-
+                added.append((card.reader, card_atr))
+                logging.info("detected new card added with atr: %s on reader: %s", card_atr, card.reader)
+                # Parse the ATR once, before any connection to the card
+                try:
+                    getAtrInfo(card.atr)
+                except Exception as e:
+                    logging.warning("invalid atr: %s on reader %s: %s", card_atr, card.reader, e)
+
+            removed = []
             for card in removed_cards:
                 card_atr = toHexString(card.atr)
-                card_reader = card.reader
-                DevicesListManager.cards_list.pop(card_reader)
-                logging.info("removed card with atr: %s from reader %s", card_atr, card_reader)
+                removed.append((card.reader, card_atr))
+                logging.info("removed card with atr: %s from reader %s", card_atr, card.reader)
+
+            with DevicesListManager.snapshot_mutex:
+                DevicesListManager.snapshot = DevicesListManager.snapshot.withCards(added, removed)
+
+            # Forward the card events to the observers of the devices list manager
+            DevicesListManager.card_observable.setChanged()
+            DevicesListManager.card_observable.notifyObservers(actions)
 
     class ManagerReaderObserver(ReaderObserver):
 
@@ -151,14 +554,13 @@ class DevicesListManager(object):
             (added_readers, removed_readers) = actions
 
             for reader in added_readers:
-                if str(reader) not in DevicesListManager.readers_list:
-                    DevicesListManager.readers_list.append(str(reader))
-                    logging.info("detected new reader: %s", reader)
-
+                logging.info("detected new reader: %s", reader)
             for reader in removed_readers:
-                if str(reader) in DevicesListManager.readers_list:
-                    DevicesListManager.readers_list.remove(str(reader))
-                    logging.info("removed reader: %s", reader)
+                logging.info("removed reader: %s", reader)
+
+            with DevicesListManager.snapshot_mutex:
+                DevicesListManager.snapshot = DevicesListManager.snapshot.withReaders([str(reader) for reader in added_readers],
+                                                                                      [str(reader) for reader in removed_readers])
 
     @staticmethod
     def getInstance():
@@ -174,15 +576,16 @@ class DevicesListManager(object):
             DevicesListManager.__instance = self
 
     def start(self):
+        # Observers are queued: logging and the card observers of the manager must not delay the monitoring thread
         # Readers observer
         DevicesListManager.__reader_observer = DevicesListManager.ManagerReaderObserver()
         DevicesListManager.__reader_monitor = ReaderMonitor()
-        DevicesListManager.__reader_monitor.addObserver(DevicesListManager.__reader_observer)
+        DevicesListManager.__reader_monitor.addObserver(DevicesListManager.__reader_observer, queued=True)
 
         # Cards observer
         DevicesListManager.__card_observer = DevicesListManager.ManagerCardObserver()
         DevicesListManager.__card_monitor = CardMonitor()
-        DevicesListManager.__card_monitor.addObserver(DevicesListManager.__card_observer)
+        DevicesListManager.__card_monitor.addObserver(DevicesListManager.__card_observer, queued=True)
 
     def stop(self):
         # Readers observer
@@ -191,27 +594,38 @@ class DevicesListManager(object):
         # Cards observer
         DevicesListManager.__card_monitor.deleteObservers()
 
+    def addCardObserver(self, observer):
+        """Add a CardObserver notified of the card insertions/removals, after the snapshot is updated."""
+        DevicesListManager.card_observable.addObserver(observer)
+
+    def deleteCardObserver(self, observer):
+        DevicesListManager.card_observable.deleteObserver(observer)
+
+    @staticmethod
+    def getSnapshot():
+        """@return: the current DevicesSnapshot, to read several values from the same state"""
+        return DevicesListManager.snapshot
+
     def noReaderAvailable(self):
-        return not DevicesListManager.readers_list
+        return not DevicesListManager.snapshot.readers
 
     def noCardAvailable(self):
-        return not DevicesListManager.cards_list
+        return not DevicesListManager.snapshot.cards
+
+    def getReaderFromCardIndex(self, index):
+        return DevicesListManager.snapshot.getCard(index)[0]
 
     def getAtrFromCardIndex(self, index):
-        if index >= len(DevicesListManager.cards_list):
-            raise Exception("Unknown card (wrong index)")
-        for i, v in enumerate(DevicesListManager.cards_list.keys()):
-            if i == index:
-                return DevicesListManager.cards_list[v]
+        return DevicesListManager.snapshot.getCard(index)[1]
 
     def printReaders(self):
         print("--------- READERS ---------")
-        for i, r in enumerate(DevicesListManager.readers_list):
+        for i, r in enumerate(DevicesListManager.snapshot.readers):
             print("({}) : {}".format(i, r))
         print("---------------------------")
 
     def printCards(self):
         print("---------- CARDS ----------")
-        for i, (r, c) in enumerate(DevicesListManager.cards_list.items()):
-            print("({}) : ATR = {}, Reader = {}".format(i, r, c))
+        for i, (r, c) in enumerate(DevicesListManager.snapshot.cards):
+            print("({}) : ATR = {}, Reader = {}".format(i, c, r))
         print("---------------------------")
@@ -0,0 +1,155 @@
+from collections import deque, OrderedDict
+from time import monotonic
+
+"""
+Scheduling of the tasks queued on one reader (see CardSession)
+
+The tasks are taken by priority class first (a high priority health check never waits behind a bulk job), then in
+round-robin between the clients of the class (one task of each client in turn), and in FIFO order for a client.
+A task may have a deadline: when it is reached before the task starts, the task is dropped and its future fails.
+"""
+
+HIGH_PRIORITY = 0
+NORMAL_PRIORITY = 1
+LOW_PRIORITY = 2
+
+PRIORITY_NAMES = ('high', 'normal', 'low')
+
+# Number of the last wait times kept per priority class for the percentiles
+WAIT_TIME_SAMPLES = 1024
+
+
+def getPriority(priority):
+    """@param priority: priority class (HIGH_PRIORITY, NORMAL_PRIORITY, LOW_PRIORITY) or its name ('high', 'normal', 'low')
+    @return: the priority class
+    @raise Exception: if the priority is unknown
+    """
+    if priority is None:
+        return NORMAL_PRIORITY
+    if isinstance(priority, str):
+        if priority not in PRIORITY_NAMES:
+            raise Exception("Unknown priority: {}, expected one of {}".format(priority, ', '.join(PRIORITY_NAMES)))
+        return PRIORITY_NAMES.index(priority)
+    if priority not in range(len(PRIORITY_NAMES)):
+        raise Exception("Unknown priority: {}".format(priority))
+    return priority
+
+
+class ScheduledTask(object):
+    """A call to function(*args) with the future of its result."""
+
+    __slots__ = ('future', 'function', 'args', 'priority', 'client', 'deadline', 'queued')
+
+    def __init__(self, future, function, args, priority=NORMAL_PRIORITY, client=None, deadline=None):
+        """
+        @param deadline: maximum time to wait in the queue before starting, in seconds (None: no deadline)
+        """
+        self.future = future
+        self.function = function
+        self.args = args
+        self.priority = priority
+        self.client = client
+        self.queued = monotonic()
+        self.deadline = None if deadline is None else self.queued + deadline
+
+
+class PriorityStats(object):
+    """Queue depth and wait time statistics of a priority class."""
+
+    def __init__(self):
+        self.depth = 0
+        self.max_depth = 0
+        self.submitted = 0
+        self.started = 0
+        self.expired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.waits = deque(maxlen=WAIT_TIME_SAMPLES)
+
+    def toDict(self):
+        waits = sorted(self.waits)
+        return {'depth': self.depth,
+                'max_depth': self.max_depth,
+                'submitted': self.submitted,
+                'started': self.started,
+                'expired': self.expired,
+                'mean_wait': self.total_wait / self.started if self.started else 0.0,
+                'p50_wait': waits[len(waits) // 2] if waits else 0.0,
+                'p99_wait': waits[min(len(waits) * 99 // 100, len(waits) - 1)] if waits else 0.0,
+                'max_wait': self.max_wait}
+
+
+class CardScheduler(object):
+    """Queues of the tasks of one reader: priority classes, round-robin between the clients of a class, FIFO per client.
+
+    It is not thread safe, the caller (CardSession) serializes the calls.
+    """
+
+    def __init__(self):
+        # One OrderedDict client: deque of tasks per priority class, the client in front being the next one served
+        self.__queues = [OrderedDict() for _ in PRIORITY_NAMES]
+        self.__stats = [PriorityStats() for _ in PRIORITY_NAMES]
+        self.__length = 0
+
+    def __len__(self):
+        return self.__length
+
+    def push(self, task):
+        queue = self.__queues[task.priority]
+        tasks = queue.get(task.client)
+        if tasks is None:
+            tasks = queue[task.client] = deque()
+        tasks.append(task)
+        self.__length += 1
+
+        stats = self.__stats[task.priority]
+        stats.submitted += 1
+        stats.depth += 1
+        stats.max_depth = max(stats.max_depth, stats.depth)
+
+    def pop(self):
+        """Take the next task to run, the tasks having reached their deadline being dropped.
+
+        @return: (task, expired tasks), task being None if there is no task left
+        """
+        expired = []
+        now = monotonic()
+        for priority, queue in enumerate(self.__queues):
+            stats = self.__stats[priority]
+            while queue:
+                client, tasks = next(iter(queue.items()))
+                task = tasks.popleft()
+                if tasks:
+                    # Next turn to the next client
+                    queue.move_to_end(client)
+                else:
+                    del queue[client]
+                self.__length -= 1
+                stats.depth -= 1
+
+                if task.deadline is not None and now > task.deadline:
+                    stats.expired += 1
+                    expired.append(task)
+                    continue
+
+                wait = now - task.queued
+                stats.started += 1
+                stats.total_wait += wait
+                stats.max_wait = max(stats.max_wait, wait)
+                stats.waits.append(wait)
+                return task, expired
+        return None, expired
+
+    def getDepth(self, priority=None):
+        """@return: number of queued tasks of a priority class, of every class if None"""
+        if priority is None:
+            return self.__length
+        return self.__stats[priority].depth
+
+    def getClients(self, priority):
+        """@return: clients having tasks queued in a priority class, in their serving order"""
+        return list(self.__queues[priority])
+
+    def getMetrics(self):
+        """@return: dict of priority name: queue depth and wait time (seconds) statistics"""
+        return {name: stats.toDict() for name, stats in zip(PRIORITY_NAMES, self.__stats)}
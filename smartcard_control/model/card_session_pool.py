@@ -0,0 +1,262 @@
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import RLock, Lock
+
+from smartcard.CardType import AnyCardType
+from smartcard.Exceptions import CardConnectionException
+from smartcard.scard import SCARD_LEAVE_CARD, SCARD_SHARE_SHARED
+from smartcard.util import toBytes
+
+from smartcard_control.model.card_manager import CardManager, DevicesListManager
+from smartcard_control.model.card_scheduler import CardScheduler, ScheduledTask, getPriority, HIGH_PRIORITY, NORMAL_PRIORITY
+from smartcard_control.model.monitoring.card_monitoring import CardObserver
+
+
+class CardSession(object):
+    """Connection to the card of one reader.
+
+    The tasks of a session (connect, transmit, disconnect...) are queued and run one at a time on the worker pool of the
+    CardSessionPool, so the sessions of different readers run concurrently. The tasks are scheduled by priority class,
+    in round-robin between the clients of a class and in order for a client (see CardScheduler).
+    """
+
+    # Maximum number of tasks run in a row before giving the worker back, for fairness between readers
+    MAX_TASKS_PER_RUN = 16
+
+    def __init__(self, reader, card_manager, executor):
+        self.reader = reader
+        self.card_manager = card_manager
+        self.closed = False
+        # Future of the connection to the card (see open)
+        self.opened = None
+
+        self.__executor = executor
+        self.__scheduler = CardScheduler()
+        # Disconnection task, run once the queued tasks are done
+        self.__closing = None
+        self.__scheduled = False
+        self.__mutex = Lock()
+
+    def submit(self, function, *args, priority=NORMAL_PRIORITY, client=None, deadline=None):
+        """Queue a call to function(*args) and return its concurrent.futures.Future.
+
+        @param priority: priority class, HIGH_PRIORITY, NORMAL_PRIORITY, LOW_PRIORITY or their names
+        @param client: identifier of the submitter, the clients of a priority class being served in turn
+        @param deadline: maximum time to wait in the queue, in seconds, the future failing once reached
+        """
+        future = Future()
+        task = ScheduledTask(future, function, args, getPriority(priority), client, deadline)
+        with self.__mutex:
+            if self.closed:
+                future.set_exception(CardConnectionException("Session closed on reader: " + self.reader))
+                return future
+            self.__scheduler.push(task)
+            self.__schedule()
+        return future
+
+    def transmit(self, apdu_message, priority=NORMAL_PRIORITY, client=None, deadline=None):
+        return self.submit(self.card_manager.transmit, apdu_message, priority=priority, client=client, deadline=deadline)
+
+    def open(self, share_mode):
+        self.opened = self.submit(self.card_manager.connect, None, share_mode, self.reader, priority=HIGH_PRIORITY)
+        return self.opened
+
+    def close(self, disposition=None):
+        """Queue the disconnection of the card after the queued tasks, the tasks submitted afterwards fail."""
+        future = Future()
+        with self.__mutex:
+            if self.closed:
+                future.set_exception(CardConnectionException("Session closed on reader: " + self.reader))
+                return future
+            self.closed = True
+            self.__closing = ScheduledTask(future, self.__disconnect, (disposition,))
+            self.__schedule()
+        return future
+
+    def getMetrics(self):
+        """@return: queue depth and wait time statistics per priority class (see CardScheduler.getMetrics)"""
+        with self.__mutex:
+            return self.__scheduler.getMetrics()
+
+    def __disconnect(self, disposition):
+        try:
+            self.card_manager.disconnect(disposition)
+        except CardConnectionException as ce:
+            # The card has been removed
+            logging.debug("session on reader %s closed without disconnection: %s", self.reader, ce)
+
+    def __schedule(self):
+        if not self.__scheduled:
+            self.__scheduled = True
+            self.__executor.submit(self.__run)
+
+    def __run(self):
+        for _ in range(CardSession.MAX_TASKS_PER_RUN):
+            with self.__mutex:
+                task, expired = self.__scheduler.pop()
+                if task is None and self.__closing is not None:
+                    task, self.__closing = self.__closing, None
+                if task is None and not expired:
+                    self.__scheduled = False
+                    return
+
+            for expired_task in expired:
+                expired_task.future.set_exception(Exception("Deadline of {:.3f} s expired in the queue of reader {}".format(
+                    expired_task.deadline - expired_task.queued, self.reader)))
+            if task is None or not task.future.set_running_or_notify_cancel():
+                continue
+            try:
+                task.future.set_result(task.function(*task.args))
+            except Exception as e:
+                task.future.set_exception(e)
+
+        with self.__mutex:
+            if len(self.__scheduler) or self.__closing is not None:
+                self.__executor.submit(self.__run)
+            else:
+                self.__scheduled = False
+
+
+class CardSessionPool(object):
+    """
+    Pool of connections to every present card, keyed by reader name.
+
+    Sessions are opened and closed automatically on the card events of the DevicesListManager, which must be started.
+    APDUs are sent with transmit (one reader) or broadcast (every reader) and return concurrent.futures.Future, run on a
+    worker pool with one serialized queue per reader.
+
+        param: max_workers=32
+            number of worker threads, the APDU throughput scales with the reader count up to it
+
+        param: card_type=AnyCardType(), share_mode=SCARD_SHARE_SHARED, disposition=SCARD_LEAVE_CARD, backend=None
+            see CardManager, only the cards matching card_type get a session
+
+        param: auto_response=False
+            transmit mode of the card managers of the sessions (see CardManager)
+    """
+
+    class PoolCardObserver(CardObserver):
+
+        def __init__(self, pool):
+            super().__init__()
+            self.pool = pool
+
+        def update(self, handlers):
+            (added_cards, removed_cards) = handlers
+
+            for card in removed_cards:
+                self.pool.closeSession(card.reader)
+
+            for card in added_cards:
+                self.pool.openSession(card.reader, card.atr)
+
+    def __init__(self, max_workers=32, card_type=AnyCardType(), share_mode=SCARD_SHARE_SHARED, disposition=SCARD_LEAVE_CARD, backend=None, auto_response=False):
+        self.max_workers = max_workers
+        self.auto_response = auto_response
+
+        self.__card_type = card_type
+        self.__share_mode = share_mode
+        self.__disposition = disposition
+        self.__backend = backend
+
+        self.__executor = None
+        self.__observer = None
+        self.__sessions = {}
+        self.__mutex = RLock()
+
+    def start(self):
+        """Open a session on every present card and follow the card insertions/removals."""
+        with self.__mutex:
+            if self.__executor is not None:
+                return
+            self.__executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='session')
+            devices_list_manager = DevicesListManager.getInstance()
+            self.__observer = CardSessionPool.PoolCardObserver(self)
+            devices_list_manager.addCardObserver(self.__observer)
+            for reader, atr in DevicesListManager.getSnapshot().cards:
+                self.openSession(reader, toBytes(atr))
+
+    def stop(self):
+        """Close every session and wait for their queued tasks."""
+        with self.__mutex:
+            if self.__executor is None:
+                return
+            DevicesListManager.getInstance().deleteCardObserver(self.__observer)
+            for reader in list(self.__sessions):
+                self.closeSession(reader)
+            executor = self.__executor
+            self.__executor = None
+        executor.shutdown(wait=True)
+
+    def openSession(self, reader, atr=None):
+        """Open a session on the card of a reader (if it matches the card type), the connection is made on the worker pool.
+
+        @return: the session, None if the card does not match the card type or the pool is stopped
+        """
+        with self.__mutex:
+            if self.__executor is None:
+                return None
+            session = self.__sessions.get(reader)
+            if session is not None:
+                return session
+            if atr is not None and not self.__card_type.matches(atr, reader):
+                return None
+
+            card_manager = CardManager(card_type=self.__card_type, disposition=self.__disposition, share_mode=self.__share_mode, backend=self.__backend,
+                                       auto_response=self.auto_response)
+            session = CardSession(reader, card_manager, self.__executor)
+            self.__sessions[reader] = session
+            session.open(self.__share_mode).add_done_callback(lambda future: self.__onSessionOpened(session, future))
+            logging.debug("session opened on reader %s", reader)
+            return session
+
+    def __onSessionOpened(self, session, future):
+        # A session whose card cannot be connected is closed, so the next openSession of its reader connects again
+        if future.cancelled() or future.exception() is None:
+            return
+        with self.__mutex:
+            if self.__sessions.get(session.reader) is session:
+                del self.__sessions[session.reader]
+        session.close()
+        logging.debug("session on reader %s closed, connection failed: %s", session.reader, future.exception())
+
+    def closeSession(self, reader):
+        with self.__mutex:
+            session = self.__sessions.pop(reader, None)
+        if session is not None:
+            session.close()
+            logging.debug("session closed on reader %s", reader)
+
+    def getSession(self, reader):
+        with self.__mutex:
+            session = self.__sessions.get(reader)
+        if session is None:
+            raise Exception("No session on reader: " + str(reader))
+        return session
+
+    def getReaders(self):
+        with self.__mutex:
+            return list(self.__sessions)
+
+    def transmit(self, reader, apdu_message, priority=NORMAL_PRIORITY, client=None, deadline=None):
+        """Queue an APDU to the card of a reader.
+
+        @param priority, client, deadline: scheduling of the APDU (see CardSession.submit)
+        @return: Future of the (data, sw1, sw2) response
+        """
+        return self.getSession(reader).transmit(apdu_message, priority, client, deadline)
+
+    def broadcast(self, apdu_message, priority=NORMAL_PRIORITY, client=None, deadline=None):
+        """Queue an APDU to every card.
+
+        @return: dict of reader name: Future of the (data, sw1, sw2) response
+        """
+        with self.__mutex:
+            sessions = list(self.__sessions.values())
+        return {session.reader: session.transmit(apdu_message, priority, client, deadline) for session in sessions}
+
+    def getMetrics(self):
+        """@return: dict of reader name: queue depth and wait time statistics per priority class"""
+        with self.__mutex:
+            sessions = list(self.__sessions.values())
+        return {session.reader: session.getMetrics() for session in sessions}
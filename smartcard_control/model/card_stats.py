@@ -0,0 +1,121 @@
+from bisect import bisect_left
+from threading import Lock
+
+"""
+Latency histograms and counters of the card managers operations
+"""
+
+# Upper bounds (in ns) of the histogram buckets: 4 buckets per octave from 1 us to about 100 s (a percentile is known
+# within 19 %), plus an overflow bucket
+BUCKET_BOUNDS = [int(1000 * 2 ** (i / 4)) for i in range(108)]
+
+
+def swClass(sw1, sw2):
+    """Status word class of a response: '9000' for a success, 'XXXX' when unknown, else SW1 followed by 'XX' ('61XX'...)."""
+    if sw1 is None:
+        return 'XXXX'
+    if sw1 == 0x90 and sw2 == 0x00:
+        return '9000'
+    return '{:02X}XX'.format(sw1)
+
+
+class LatencyHistogram(object):
+    """Fixed buckets latency histogram, recording a latency costs a bisection in BUCKET_BOUNDS.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, latency):
+        """@param latency: latency in ns"""
+        self.buckets[bisect_left(BUCKET_BOUNDS, latency)] += 1
+        self.count += 1
+        self.total += latency
+        if self.min is None or latency < self.min:
+            self.min = latency
+        if self.max is None or latency > self.max:
+            self.max = latency
+
+    def percentile(self, percent):
+        """Upper bound (in ns) of the bucket holding the given percentile, bounded by the maximum latency recorded.
+
+        @param percent: 0 to 100
+        """
+        if not self.count:
+            return None
+        rank = max(self.count * percent / 100.0, 1)
+        cumulated = 0
+        for index, bucket in enumerate(self.buckets):
+            cumulated += bucket
+            if cumulated >= rank:
+                if index < len(BUCKET_BOUNDS):
+                    return max(min(BUCKET_BOUNDS[index], self.max), self.min)
+                return self.max
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+class CardStats(object):
+    """Latency histograms of the card operations keyed by (operation, reader, INS, status word class), and error and
+    reconnection counters.
+
+    INS and status word class are only set for transmit, 'connect', 'reconnect', 'warm_reset', 'cold_reset'... having
+    None for both.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.errors = {}
+        self.reconnects = 0
+        self.__mutex = Lock()
+
+    def addLatency(self, operation, reader, latency, ins=None, sw1=None, sw2=None):
+        """@param latency: latency in ns"""
+        key = (operation, reader, ins, None if operation != 'transmit' else swClass(sw1, sw2))
+        with self.__mutex:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.add(latency)
+            if operation in ('reconnect', 'warm_reset', 'cold_reset'):
+                self.reconnects += 1
+
+    def addError(self, operation, reader):
+        with self.__mutex:
+            self.errors[(operation, reader)] = self.errors.get((operation, reader), 0) + 1
+
+    def reset(self):
+        with self.__mutex:
+            self.histograms = {}
+            self.errors = {}
+            self.reconnects = 0
+
+    def stats(self):
+        """Snapshot of the statistics, latencies being in seconds:
+
+        {'operations': [{'operation', 'reader', 'ins', 'sw_class', 'count', 'mean', 'min', 'p50', 'p95', 'p99', 'max'}...],
+         'errors': [{'operation', 'reader', 'count'}...],
+         'reconnects': number of reconnections and resets}
+        """
+        with self.__mutex:
+            operations = []
+            for (operation, reader, ins, sw_class), histogram in sorted(self.histograms.items(), key=lambda item: tuple('' if v is None else str(v) for v in item[0])):
+                operations.append({'operation': operation,
+                                   'reader': reader,
+                                   'ins': ins,
+                                   'sw_class': sw_class,
+                                   'count': histogram.count,
+                                   'mean': histogram.mean() / 1e9,
+                                   'min': histogram.min / 1e9,
+                                   'p50': histogram.percentile(50) / 1e9,
+                                   'p95': histogram.percentile(95) / 1e9,
+                                   'p99': histogram.percentile(99) / 1e9,
+                                   'max': histogram.max / 1e9})
+            errors = [{'operation': operation, 'reader': reader, 'count': count} for (operation, reader), count in sorted(self.errors.items(), key=str)]
+            return {'operations': operations, 'errors': errors, 'reconnects': self.reconnects}
@@ -1,9 +1,16 @@
 import logging
-from threading import RLock, Thread, Event
+import time
+import traceback
+from collections import deque, OrderedDict
+from threading import RLock, Thread, Event, Condition, current_thread
 
 from smartcard.Exceptions import CardConnectionException
-from smartcard.scard import SCardEstablishContext, SCARD_SCOPE_USER, SCardGetErrorMessage, SCardReleaseContext, SCARD_S_SUCCESS, SCARD_STATE_UNAWARE, INFINITE, SCardGetStatusChange, \
-    SCARD_STATE_UNKNOWN, SCardListReaders
+from smartcard.scard import SCARD_SCOPE_USER, SCARD_S_SUCCESS, SCARD_STATE_UNAWARE, INFINITE, SCARD_STATE_UNKNOWN, SCARD_STATE_CHANGED, SCARD_E_UNKNOWN_READER, \
+    SCARD_E_TIMEOUT, SCARD_E_CANCELLED, SCARD_E_NO_READERS_AVAILABLE
+
+from smartcard_control.model.backend.backend import getBackend
+
+PNP_NOTIFICATION = '\\\\?PnP?\\Notification'
 
 
 class Observer(object):
@@ -41,8 +48,8 @@ class Observable(object):
         if not self.changed:
             return
 
-        # Update observers
-        for observer in self.obs:
+        # Update observers (on a copy, observers can be added or deleted by another thread meanwhile)
+        for observer in list(self.obs):
             observer.update(args)
         self.clearChanged()
 
@@ -62,38 +69,337 @@ class Observable(object):
         return len(self.obs)
 
 
+class QueuedObserver(Observer):
+    """Observer delivering the notifications of a device observable to another observer on its own worker thread.
+
+    update only queues the (added devices, removed devices) notification, so a slow observer does not delay the monitoring
+    dispatcher thread. The queue is bounded: when it is full the oldest notification is dropped.
+
+    With a coalescing window, a notification is held during the window and merged with the following ones: a device
+    added then removed (or removed then added back) within the window is not notified at all.
+    """
+
+    DEFAULT_QUEUE_SIZE = 1024
+
+    def __init__(self, observer, queue_size=DEFAULT_QUEUE_SIZE, coalescing_window=0):
+        """
+        @param observer: the observer notified by the worker thread
+        @param queue_size: maximum number of notifications waiting to be delivered
+        @param coalescing_window: time (in seconds) a notification is held to be merged with the following ones, 0 to disable
+        """
+        self.observer = observer
+        self.queue_size = queue_size
+        self.coalescing_window = coalescing_window
+
+        # Counters of device (added or removed) events
+        self.delivered_events = 0
+        self.dropped_events = 0
+        self.coalesced_events = 0
+
+        self.__queue = deque()
+        self.__condition = Condition()
+        self.__stopped = False
+        self.__thread = Thread(target=self.__run, name='QueuedObserver', daemon=True)
+        self.__thread.start()
+
+    def update(self, handlers):
+        added_devices, removed_devices = handlers
+        with self.__condition:
+            if self.__stopped:
+                return
+            if len(self.__queue) >= self.queue_size:
+                _, dropped_added, dropped_removed = self.__queue.popleft()
+                self.dropped_events += len(dropped_added) + len(dropped_removed)
+            self.__queue.append((time.monotonic(), list(added_devices), list(removed_devices)))
+            self.__condition.notify()
+
+    def stop(self):
+        """Stop the worker thread, the notifications not delivered yet are discarded."""
+        with self.__condition:
+            self.__stopped = True
+            self.__queue.clear()
+            self.__condition.notify()
+        if self.__thread is not current_thread():
+            self.__thread.join()
+
+    def getQueueSize(self):
+        return len(self.__queue)
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__queue and not self.__stopped:
+                    self.__condition.wait()
+                if not self.__queue:
+                    return
+
+                if self.coalescing_window:
+                    deadline = self.__queue[0][0] + self.coalescing_window
+                    remaining = deadline - time.monotonic()
+                    while remaining > 0 and not self.__stopped:
+                        self.__condition.wait(remaining)
+                        remaining = deadline - time.monotonic()
+                    batch = []
+                    while self.__queue and self.__queue[0][0] <= deadline:
+                        batch.append(self.__queue.popleft())
+                    if not batch:
+                        return
+                else:
+                    batch = [self.__queue.popleft()]
+
+            added_devices, removed_devices = self.__coalesce(batch)
+            if not added_devices and not removed_devices:
+                continue
+            self.delivered_events += len(added_devices) + len(removed_devices)
+            try:
+                self.observer.update((added_devices, removed_devices))
+            except Exception:
+                logging.error("observer %s failed to process a notification: %s", self.observer, traceback.format_exc())
+
+    def __coalesce(self, batch):
+        if len(batch) == 1:
+            return batch[0][1], batch[0][2]
+
+        added_devices = OrderedDict()
+        removed_devices = OrderedDict()
+        for _, added, removed in batch:
+            for device in removed:
+                key = QueuedObserver.__deviceKey(device)
+                if added_devices.pop(key, None) is not None:
+                    self.coalesced_events += 2
+                else:
+                    removed_devices[key] = device
+            for device in added:
+                key = QueuedObserver.__deviceKey(device)
+                if removed_devices.pop(key, None) is not None:
+                    self.coalesced_events += 2
+                else:
+                    added_devices[key] = device
+        return list(added_devices.values()), list(removed_devices.values())
+
+    @staticmethod
+    def __deviceKey(device):
+        # Cards are identified by their reader and ATR, readers by their name
+        if hasattr(device, 'atr'):
+            return str(device.reader), tuple(device.atr)
+        return str(device)
+
+
 class DeviceObservable(Observable):
     """DeviceObservable is a base abstract class for ReaderMonitor and CardMonitor.
-       """
+
+    Device observables do not run any thread: once they have an observer, they are subscribed to the process wide
+    MonitoringDispatcher which calls their processReadersState method after every readers status change.
+    """
 
     def __init__(self):
         super().__init__()
-        self.pnp = None
-        self.hcontext = None
-        self.threads_obs_list = []
-        self.readers_state_list = []
         self.mutex = RLock()
 
-        self.__NO_PNP_TIMEOUT = 5000
-        self.__PNP_TIMEOUT = INFINITE
+    def isPnpSupported(self):
+        return MonitoringDispatcher().isPnpSupported()
+
+    def getReaders(self):
+        return MonitoringDispatcher().getReaders()
+
+    def addObserver(self, observer, polling_timeout=None, queued=False, queue_size=QueuedObserver.DEFAULT_QUEUE_SIZE, coalescing_window=0):
+        """Method used to add an observer
+        When the first observer is added, the observable is subscribed to the monitoring dispatcher.
+        Following observers are notified right away of the devices already known.
+
+        @param observer: the observer to add
+        @param polling_timeout: timeout (in milliseconds) for every SCardGetStatusChange call
+        @param queued: notify the observer on its own worker thread instead of the monitoring thread (see QueuedObserver)
+        @param queue_size: maximum number of notifications waiting to be delivered to a queued observer
+        @param coalescing_window: time (in seconds) during which the added/removed flaps of a device are merged, for a queued observer
+        @return: the observer registered, a QueuedObserver for a queued observer
+        """
+        self.mutex.acquire()
+        registered_observer = self.__getRegisteredObserver(observer)
+        if registered_observer is not None:
+            self.mutex.release()
+            return registered_observer
+        if queued:
+            registered_observer = QueuedObserver(observer, queue_size, coalescing_window)
+        else:
+            registered_observer = observer
+        first_observer = not self.obs
+        if first_observer:
+            # Devices known from a previous subscription may be outdated, they will be notified again by the dispatcher
+            self.clearDevices()
+        super().addObserver(registered_observer)
+        self.mutex.release()
+
+        if first_observer:
+            MonitoringDispatcher().subscribe(self, polling_timeout)
+        else:
+            self.notifyKnownDevices(registered_observer)
+        return registered_observer
+
+    def deleteObserver(self, observer):
+        """Method used to remove an observer
+        When the last observer is removed, the observable is unsubscribed from the monitoring dispatcher.
+
+        @param observer: the observer to remove (the observer given to addObserver or the QueuedObserver it returned)
+        """
+        self.mutex.acquire()
+        registered_observer = self.__getRegisteredObserver(observer)
+        if registered_observer is None:
+            self.mutex.release()
+            return
+        super().deleteObserver(registered_observer)
+        last_observer = not self.obs
+        self.mutex.release()
+
+        if last_observer:
+            MonitoringDispatcher().unsubscribe(self)
+        if isinstance(registered_observer, QueuedObserver):
+            registered_observer.stop()
+
+    def __getRegisteredObserver(self, observer):
+        for registered_observer in self.obs:
+            if registered_observer is observer or (isinstance(registered_observer, QueuedObserver) and registered_observer.observer is observer):
+                return registered_observer
+        return None
+
+    def deleteObservers(self):
+        for obs in list(self.obs):
+            self.deleteObserver(obs)
+
+    def countObservers(self):
+        return super().countObservers()
+
+    """Methods bellow are meant to be overridden by ReaderMonitor and CardMonitor 
+    """
+
+    def processReadersState(self, readers_state):
+        """Called by the monitoring thread with the readers state returned by SCardGetStatusChange, to notify observers of the changes.
+
+        @param readers_state: list of (reader, event state, atr)
+        """
+        pass
+
+    def notifyKnownDevices(self, observer):
+        """Notify a new observer of the devices already known."""
+        pass
+
+    def clearDevices(self):
+        """Forget the devices already known."""
+        pass
+
+
+class ReadersStateList(object):
+    """Readers state list given to SCardGetStatusChange, indexed by reader name.
+
+    The (reader, state, atr) entries are kept in the list SCardGetStatusChange takes and returns, in the same order,
+    so the returned list replaces the current one as is. A reader name -> position index gives O(1) lookup, add and remove
+    (the last entry takes the place of the removed one).
+    """
+
+    def __init__(self):
+        self.__states = []
+        self.__index = {}
+
+    def __contains__(self, reader):
+        return reader in self.__index
+
+    def __len__(self):
+        return len(self.__states)
+
+    def get(self, reader):
+        position = self.__index.get(reader)
+        return None if position is None else self.__states[position]
+
+    def readers(self):
+        return self.__index.keys()
+
+    def add(self, reader):
+        if reader not in self.__index:
+            self.__index[reader] = len(self.__states)
+            self.__states.append((reader, SCARD_STATE_UNAWARE, []))
+
+    def remove(self, reader):
+        position = self.__index.pop(reader, None)
+        if position is None:
+            return
+        last = self.__states.pop()
+        if position < len(self.__states):
+            self.__states[position] = last
+            self.__index[last[0]] = position
+
+    def getList(self):
+        return self.__states
+
+    def setList(self, new_states):
+        """Replace the states by the ones returned by SCardGetStatusChange (same readers in the same order)."""
+        if len(new_states) != len(self.__states):
+            raise CardConnectionException('Unexpected readers state list size: {} instead of {}'.format(len(new_states), len(self.__states)))
+        self.__states = list(new_states)
+
+    def rearm(self):
+        """Set all the readers back to the unaware state, so their current state is reported again."""
+        self.__states = [(state[0], SCARD_STATE_UNAWARE, []) for state in self.__states]
+
+
+class MonitoringDispatcher(object):
+    """Process wide monitoring loop serving both ReaderMonitor and CardMonitor.
+
+    A single thread and PC/SC context wait for the status changes of all the readers with one SCardGetStatusChange call,
+    then hand the new readers state to every subscribed device observable, which notifies its own observers.
+    The number of threads and of PC/SC calls thus does not depend on the number of observers.
+
+    If pnp notifications are supported, they will be used.
+    If they are not, a call to get the status of cards/readers will be done using polling_timeout as timeout.
+
+    note: the monitoring thread will be running as long as a device observable has observers.
+
+    It implements the shared state design pattern, where objects of the same type all share the same state.
+    """
+
+    __shared_state = {}
+
+    def __init__(self):
+        self.__dict__ = self.__shared_state
+
+        # Check if the borg singleton already has it's parameters initialized
+        if not self.__dict__:
+            self.pnp = None
+            self.backend = None
+            self.hcontext = None
+            self.thread = None
+            # List of (device observable, polling timeout), replaced (never modified) so the thread can iterate it without lock
+            self.subscriptions = []
+            self.readers_state_list = ReadersStateList()
+            # Set when the readers list has to be reconciled with SCardListReaders (at start, on PnP notification or without PnP)
+            self.readers_changed = True
+            # Readers removed by the last reconciliation, reported as unknown to the subscribers after the next status change
+            self.removed_readers = []
+            # Set when all readers have to be reported again to a new subscriber
+            self.rearm = False
+            self.mutex = RLock()
+
+            self.__NO_PNP_TIMEOUT = 5000
+            self.__PNP_TIMEOUT = INFINITE
 
     def __establishContext(self):
-        hresult, self.hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
+        # The context is bound to the backend selected when establishing it
+        self.backend = getBackend()
+        hresult, self.hcontext = self.backend.SCardEstablishContext(SCARD_SCOPE_USER)
         if hresult != SCARD_S_SUCCESS:
-            raise CardConnectionException('Failed to establish context: ' + SCardGetErrorMessage(hresult))
+            raise CardConnectionException('Failed to establish context: ' + self.backend.SCardGetErrorMessage(hresult))
 
     def __releaseContext(self):
-        hresult = SCardReleaseContext(self.hcontext)
+        hresult = self.backend.SCardReleaseContext(self.hcontext)
         if hresult != SCARD_S_SUCCESS:
-            raise CardConnectionException('Failed to release context: ' + SCardGetErrorMessage(hresult))
+            raise CardConnectionException('Failed to release context: ' + self.backend.SCardGetErrorMessage(hresult))
         self.hcontext = None
 
     def __checkPnpSupport(self):
         if self.hcontext is None:
             self.__establishContext()
 
-        readers_state = [('\\\\?PnP?\\Notification', SCARD_STATE_UNAWARE, [])]
-        hresult, readers_state = SCardGetStatusChange(self.hcontext, 0, readers_state)
+        readers_state = [(PNP_NOTIFICATION, SCARD_STATE_UNAWARE, [])]
+        hresult, readers_state = self.backend.SCardGetStatusChange(self.hcontext, 0, readers_state)
         reader, event, atr = readers_state[0]
         if event & SCARD_STATE_UNKNOWN:
             logging.debug("Plug'n play reader name not supported.")
@@ -108,94 +414,168 @@ class DeviceObservable(Observable):
         return self.pnp
 
     def getReaders(self):
+        self.mutex.acquire()
         if self.hcontext is None:
             self.__establishContext()
-        hresult, readers_list = SCardListReaders(self.hcontext, [])
+        hresult, readers_list = self.backend.SCardListReaders(self.hcontext, [])
+        self.mutex.release()
         if hresult != SCARD_S_SUCCESS:
-            raise CardConnectionException('Unable to list readers: ' + SCardGetErrorMessage(hresult))
+            raise CardConnectionException('Unable to list readers: ' + self.backend.SCardGetErrorMessage(hresult))
+        return readers_list
 
-    def addObserver(self, observer, polling_timeout=None):
-        """Method used to add an observer
-        When an observer is added, a specific monitoring thread is created and started
+    def subscribe(self, observable, polling_timeout=None):
+        """Subscribe a device observable to the readers status changes, starting the monitoring thread if needed
 
-        @param observer: the observer to add
-        @param polling_timeout: timeout (in milliseconds) for every SCardGetStatusChange call
+        @param observable: the device observable to subscribe
+        @param polling_timeout: timeout (in milliseconds) for every SCardGetStatusChange call,
+          the shortest one of all the subscriptions is used
         """
-        # If there is no given polling timeout, use the default ones according to pnp availability
-        if polling_timeout is None:
-            if self.isPnpSupported():
-                polling_timeout = self.__PNP_TIMEOUT
+        self.mutex.acquire()
+        try:
+            if self.hcontext is None:
+                self.__establishContext()
+
+            # If there is no given polling timeout, use the default ones according to pnp availability
+            if polling_timeout is None:
+                if self.isPnpSupported():
+                    polling_timeout = self.__PNP_TIMEOUT
+                else:
+                    polling_timeout = self.__NO_PNP_TIMEOUT
+
+            self.subscriptions = self.__otherSubscriptions(observable) + [(observable, polling_timeout)]
+
+            if self.thread is None or not self.thread.is_alive():
+                # Not started yet, or stopped by an error of the PC/SC calls
+                self.readers_state_list = ReadersStateList()
+                self.readers_changed = True
+                self.removed_readers = []
+                self.thread = MonitoringDispatcherThread(polling_timeout)
+                self.thread.start()
             else:
-                polling_timeout = self.__NO_PNP_TIMEOUT
+                # The new subscriber has to learn the current devices: readers are reported again from the next status change
+                self.thread.polling_timeout = min(timeout for _, timeout in self.subscriptions)
+                self.rearm = True
+                self.backend.SCardCancel(self.hcontext)
+        finally:
+            self.mutex.release()
 
-        # If there is no observer, establish context with the PC/SC application
-        if not self.obs:
-            self.__establishContext()
-
-        # Add the observer
-        super().addObserver(observer)
-
-        # Create the thread linked to the observer
-        from smartcard_control.model.monitoring.reader_monitoring import ReaderMonitor
-        from smartcard_control.model.monitoring.card_monitoring import CardMonitor
-        if isinstance(self, CardMonitor):
-            from smartcard_control.model.monitoring.card_monitoring import CardMonitorThread
-            thread = CardMonitorThread(polling_timeout)
-        elif isinstance(self, ReaderMonitor):
-            from smartcard_control.model.monitoring.reader_monitoring import ReaderMonitorThread
-            thread = ReaderMonitorThread(polling_timeout)
-        else:
-            thread = None
-            raise Exception('Unauthorized instance for' + self.__class__.__name__)
-        self.threads_obs_list.append((thread, observer))
-
-        thread.start()
+    def unsubscribe(self, observable):
+        """Unsubscribe a device observable, stopping the monitoring thread if it was the last one
 
-    def deleteObserver(self, observer):
-        """Method used to remove an observer
-        When an observer is removed, it's specific monitoring thread is stopped and removed as well
-
-        @param observer: the observer to remove
+        @param observable: the device observable to unsubscribe
         """
-        # Remove the observer
-        super().deleteObserver(observer)
-
-        # Stop and remove the thread linked to the observer
-        for (thread, observer) in self.threads_obs_list:
+        self.mutex.acquire()
+        try:
+            self.subscriptions = self.__otherSubscriptions(observable)
+            if self.subscriptions:
+                self.thread.polling_timeout = min(timeout for _, timeout in self.subscriptions)
+                return
+            thread = self.thread
+            self.thread = None
+        finally:
+            self.mutex.release()
+
+        if thread is not None:
+            if thread is current_thread():
+                # Unsubscribed from an observer notified by the monitoring thread: it will stop once the notification is
+                # done, and release the context
+                thread.release_context = True
+                thread.stopEvent.set()
+                return
             thread.stop()
-            self.threads_obs_list.remove((thread, observer))
+        self.releaseUnusedContext()
 
-        # if no observer remains, release the context with the PC/SC application
-        if not self.obs:
-            self.__releaseContext()
+    def releaseUnusedContext(self):
+        """Release the context with the PC/SC application if no subscription remains."""
+        self.mutex.acquire()
+        try:
+            if not self.subscriptions and self.thread is None and self.hcontext is not None:
+                self.__releaseContext()
+        finally:
+            self.mutex.release()
 
-    def deleteObservers(self):
-        for obs in self.obs:
-            self.deleteObserver(obs)
+    def __otherSubscriptions(self, observable):
+        # Device observables are borg singletons: their instances share the same state, not the same identity
+        return [s for s in self.subscriptions if s[0].__dict__ is not observable.__dict__]
 
-    def countObservers(self):
-        return super().countObservers()
+    def getSubscriptions(self):
+        return self.subscriptions
 
     """Methods bellow are meant to be used by a thread so they are synchronized with a mutex 
-        """
+    """
 
     def setReadersStateList(self, new_readers_state_list):
+        """Store the readers state returned by SCardGetStatusChange.
+
+        @return: the states to hand to the subscribers, with the readers removed since the last call reported as unknown
+        """
         self.mutex.acquire()
-        self.readers_state_list = new_readers_state_list
+        self.readers_state_list.setList(new_readers_state_list)
+
+        # The readers list changed, it will be reconciled before the next status change
+        if not self.isPnpSupported():
+            self.readers_changed = True
+        else:
+            pnp_state = self.readers_state_list.get(PNP_NOTIFICATION)
+            if pnp_state is not None and pnp_state[1] & SCARD_STATE_CHANGED:
+                self.readers_changed = True
+
+        if self.removed_readers:
+            new_readers_state_list = list(new_readers_state_list) + [(reader, SCARD_STATE_UNKNOWN | SCARD_STATE_CHANGED, []) for reader in self.removed_readers]
+            self.removed_readers = []
         self.mutex.release()
+        return new_readers_state_list
 
     def getReadersStateList(self):
         self.mutex.acquire()
-        rsl = self.readers_state_list
+        rsl = self.readers_state_list.getList()
         self.mutex.release()
         return rsl
 
+    def setReadersChanged(self):
+        self.mutex.acquire()
+        self.readers_changed = True
+        self.mutex.release()
+
     def updateReadersStateList(self):
-        pass
+        # If there is no subscription remaining, there is no need to update the readers states list
+        if not self.subscriptions:
+            return
+
+        self.mutex.acquire()
+        try:
+            # Report again all readers and cards states if a new subscriber needs them
+            if self.rearm:
+                self.readers_state_list.rearm()
+                self.rearm = False
+
+            # Use Pnp Notification only if supported
+            if self.isPnpSupported():
+                self.readers_state_list.add(PNP_NOTIFICATION)
+
+            # Reconcile the readers only when they may have changed, not on every status change
+            if not self.readers_changed:
+                return
+            hresult, readers_list = self.backend.SCardListReaders(self.hcontext, [])
+            if hresult == SCARD_E_NO_READERS_AVAILABLE:
+                readers_list = []
+            elif hresult != SCARD_S_SUCCESS:
+                raise CardConnectionException('Unable to list readers: ' + self.backend.SCardGetErrorMessage(hresult))
+            self.readers_changed = False
+
+            # Add the new readers in the readers state list and remove the ones which are not present anymore
+            readers = set(readers_list)
+            for reader in readers_list:
+                self.readers_state_list.add(reader)
+            for reader in [r for r in self.readers_state_list.readers() if r not in readers and r != PNP_NOTIFICATION]:
+                self.readers_state_list.remove(reader)
+                self.removed_readers.append(reader)
+        finally:
+            self.mutex.release()
 
 
 class DeviceMonitorThread(Thread):
-    """DeviceMonitorThread is a base abstract class for CardMonitorThread and ReaderMonitorThread.
+    """DeviceMonitorThread is a base abstract class for device monitoring threads.
     """
 
     def __init__(self, polling_timeout):
@@ -207,3 +587,61 @@ class DeviceMonitorThread(Thread):
     def stop(self):
         self.stopEvent.set()
         self.join()
+
+
+class MonitoringDispatcherThread(DeviceMonitorThread):
+    """Monitoring thread of the MonitoringDispatcher.
+    """
+
+    def __init__(self, polling_timeout):
+        super().__init__(polling_timeout)
+        self.dispatcher = MonitoringDispatcher()
+        # Set when the last subscription is removed from a notification of this thread
+        self.release_context = False
+
+    def run(self):
+        """Runs until stopEvent is notified, and hand every readers status change to the subscribed device observables.
+        """
+        logging.debug("thread running: %d", len(self.dispatcher.getSubscriptions()))
+        while not self.stopEvent.isSet():
+            try:
+                # Update the readers state list to add potentially new found readers and delete removed ones
+                self.dispatcher.updateReadersStateList()
+
+                logging.debug("listening for changes...")
+                hresult, new_readers_state = self.dispatcher.backend.SCardGetStatusChange(self.dispatcher.hcontext, self.polling_timeout, self.dispatcher.getReadersStateList())
+                logging.debug("changes acquired!")
+                logging.debug("states: %s", new_readers_state)
+
+                # Listen only to others result errors
+                if hresult == SCARD_E_UNKNOWN_READER:
+                    # A reader was removed meanwhile
+                    self.dispatcher.setReadersChanged()
+                elif hresult != SCARD_S_SUCCESS and hresult != SCARD_E_TIMEOUT:
+                    if hresult == SCARD_E_CANCELLED:
+                        # Cancelled to stop the thread, or to take a new subscription into account
+                        continue
+                    else:
+                        raise CardConnectionException('Unable to get status change: ' + self.dispatcher.backend.SCardGetErrorMessage(hresult))
+
+                # Update the readers state list and let the device observables search for added or removed devices
+                new_readers_state = self.dispatcher.setReadersStateList(new_readers_state)
+                for observable, _ in self.dispatcher.getSubscriptions():
+                    # An observer failing must not stop the monitoring of the other subscribers
+                    try:
+                        observable.processReadersState(new_readers_state)
+                    except Exception:
+                        logging.error("device observable %s failed to process a status change: %s", observable, traceback.format_exc())
+
+            except Exception:
+                # FIXME Tighten the exceptions caught by this block
+                logging.error("monitoring thread stopped: %s", traceback.format_exc())
+                self.stopEvent.set()
+
+        if self.release_context:
+            self.dispatcher.releaseUnusedContext()
+
+    def stop(self):
+        self.stopEvent.set()
+        self.dispatcher.backend.SCardCancel(self.dispatcher.hcontext)
+        super().stop()
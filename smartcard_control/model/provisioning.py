@@ -0,0 +1,234 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition
+from time import perf_counter, perf_counter_ns
+
+from smartcard.CardType import AnyCardType
+from smartcard.Exceptions import NoCardException
+from smartcard.scard import SCARD_SHARE_SHARED, SCARD_LEAVE_CARD, SCARD_RESET_CARD
+
+from smartcard_control.model.apdu_script import ScriptRunner
+from smartcard_control.model.card_manager import CardManager
+from smartcard_control.model.card_stats import LatencyHistogram
+from smartcard_control.model.monitoring.card_monitoring import CardObserver, CardMonitor
+
+"""
+Provisioning of the cards inserted in a reader farm
+
+Each card inserted (CardMonitor event) gets a job on a worker pool, its stages being: connect, run the provisioning
+script, verify (the verification script if any) and eject (SCARD_EJECT_CARD). The cards of different readers are
+provisioned concurrently, so the throughput scales with the reader count up to the number of workers.
+"""
+
+STAGES = ('connect', 'script', 'verify', 'eject')
+
+
+class ProvisioningPipeline(object):
+    """Provision every card inserted while it is started.
+
+    A card failing (error or unexpected status word) is reset and provisioned again up to retries times. The cards
+    failing every attempt are left in their reader, disconnected, and listed in failed_cards.
+
+        param: script, verify_script=None
+            ApduScript run on each card, and ApduScript checking the result (no verification if None)
+
+        param: max_workers=64, retries=2
+            number of cards provisioned at the same time, and of new attempts after a failure
+
+        param: card_type=AnyCardType(), share_mode=SCARD_SHARE_SHARED, transaction=False, eject=True, backend=None
+            cards to provision, connection share mode, run the scripts in one PC/SC transaction, eject the provisioned
+            cards (else they are left in their reader), PC/SC backend (see CardManager)
+    """
+
+    class PipelineCardObserver(CardObserver):
+
+        def __init__(self, pipeline):
+            super().__init__()
+            self.pipeline = pipeline
+
+        def update(self, handlers):
+            (added_cards, removed_cards) = handlers
+
+            for card in added_cards:
+                self.pipeline.submit(card.reader, card.atr)
+
+    def __init__(self, script, verify_script=None, max_workers=64, retries=2, card_type=AnyCardType(), share_mode=SCARD_SHARE_SHARED, transaction=False,
+                 eject=True, backend=None):
+        self.script = script
+        self.verify_script = verify_script
+        self.max_workers = max_workers
+        self.retries = retries
+        self.transaction = transaction
+        self.eject = eject
+
+        self.__card_type = card_type
+        self.__share_mode = share_mode
+        self.__backend = backend
+
+        self.__executor = None
+        self.__observer = None
+        self.__condition = Condition()
+        # Readers whose card is being provisioned
+        self.__busy = set()
+        self.__start_time = None
+
+        self.provisioned = 0
+        self.failed = 0
+        self.retried = 0
+        # (reader, ATR, error message) of the cards failing every attempt
+        self.failed_cards = []
+        self.stage_latencies = {stage: LatencyHistogram() for stage in STAGES}
+        self.stage_errors = {stage: 0 for stage in STAGES}
+
+    def start(self):
+        """Provision the cards already inserted and the ones inserted from now on."""
+        with self.__condition:
+            if self.__executor is not None:
+                return
+            self.__executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='provisioning')
+            self.__start_time = perf_counter()
+        self.__observer = ProvisioningPipeline.PipelineCardObserver(self)
+        CardMonitor().addObserver(self.__observer, queued=True)
+
+    def stop(self, wait=True):
+        """Stop following the card insertions, the jobs in progress being completed if wait."""
+        if self.__observer is not None:
+            CardMonitor().deleteObserver(self.__observer)
+            self.__observer = None
+        with self.__condition:
+            executor = self.__executor
+            self.__executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def submit(self, reader, atr=None):
+        """Queue the provisioning of the card of a reader (ignored if it does not match the card type or is in progress).
+
+        @return: True if the card is queued
+        """
+        with self.__condition:
+            if self.__executor is None or reader in self.__busy:
+                return False
+            if atr is not None and not self.__card_type.matches(atr, reader):
+                logging.info("card of reader %s not provisioned: it does not match the card type", reader)
+                return False
+            self.__busy.add(reader)
+            self.__executor.submit(self.__provision, reader, atr)
+        return True
+
+    def wait(self, count, timeout=None):
+        """Wait until count cards are provisioned or failed.
+
+        @return: True if count cards were done before the timeout
+        """
+        with self.__condition:
+            return self.__condition.wait_for(lambda: self.provisioned + self.failed >= count, timeout)
+
+    def getInProgress(self):
+        with self.__condition:
+            return len(self.__busy)
+
+    def getCardsPerMinute(self):
+        """@return: cards provisioned per minute since the start"""
+        if self.__start_time is None:
+            return 0.0
+        elapsed = perf_counter() - self.__start_time
+        return self.provisioned * 60.0 / elapsed if elapsed else 0.0
+
+    def stats(self):
+        """Counters and per-stage latencies (in seconds) of the pipeline.
+
+        @return: {'provisioned', 'failed', 'retried', 'in_progress', 'cards_per_minute',
+                  'stages': [{'stage', 'count', 'errors', 'mean', 'p50', 'p95', 'max'}...]}
+        """
+        with self.__condition:
+            stages = []
+            for stage in STAGES:
+                histogram = self.stage_latencies[stage]
+                stages.append({'stage': stage,
+                               'count': histogram.count,
+                               'errors': self.stage_errors[stage],
+                               'mean': histogram.mean() / 1e9 if histogram.count else 0.0,
+                               'p50': (histogram.percentile(50) or 0) / 1e9,
+                               'p95': (histogram.percentile(95) or 0) / 1e9,
+                               'max': (histogram.max or 0) / 1e9})
+            return {'provisioned': self.provisioned,
+                    'failed': self.failed,
+                    'retried': self.retried,
+                    'in_progress': len(self.__busy),
+                    'cards_per_minute': self.getCardsPerMinute(),
+                    'stages': stages}
+
+    def __provision(self, reader, atr):
+        card_manager = CardManager(card_type=self.__card_type, share_mode=self.__share_mode, disposition=SCARD_LEAVE_CARD, backend=self.__backend)
+        error = None
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    with self.__condition:
+                        self.retried += 1
+                    logging.info("provisioning of the card of reader %s failed (%s), attempt %d", reader, error, attempt + 1)
+                try:
+                    self.__runStage('connect', card_manager.connect, None, self.__share_mode, reader)
+                except NoCardException as e:
+                    # The card has been removed
+                    error = str(e)
+                    break
+                except Exception as e:
+                    error = str(e)
+                    continue
+
+                try:
+                    self.__runStage('script', self.__runScript, card_manager, self.script)
+                    if self.verify_script is not None:
+                        self.__runStage('verify', self.__runScript, card_manager, self.verify_script)
+                except Exception as e:
+                    error = str(e)
+                    self.__disconnect(card_manager, SCARD_RESET_CARD)
+                    continue
+
+                if self.eject:
+                    try:
+                        self.__runStage('eject', card_manager.eject)
+                    except Exception as e:
+                        logging.warning("unable to eject the card of reader %s: %s", reader, e)
+                else:
+                    self.__disconnect(card_manager, SCARD_LEAVE_CARD)
+                with self.__condition:
+                    self.provisioned += 1
+                logging.info("card of reader %s provisioned", reader)
+                return
+
+            with self.__condition:
+                self.failed += 1
+                self.failed_cards.append((reader, atr, error))
+            logging.error("provisioning of the card of reader %s failed: %s", reader, error)
+        finally:
+            with self.__condition:
+                self.__busy.discard(reader)
+                self.__condition.notify_all()
+
+    def __runScript(self, card_manager, script):
+        result = ScriptRunner(card_manager, stop_on_failure=True, transaction=self.transaction).run(script)
+        if result.failures:
+            line, apdu, sw, expected = result.failures[0]
+            raise Exception("{}:{}: {} answered {} (expected {})".format(script.name, line, apdu, sw, ' or '.join(expected)))
+
+    def __runStage(self, stage, function, *args):
+        start = perf_counter_ns()
+        try:
+            function(*args)
+        except Exception:
+            with self.__condition:
+                self.stage_errors[stage] += 1
+            raise
+        latency = perf_counter_ns() - start
+        with self.__condition:
+            self.stage_latencies[stage].add(latency)
+
+    @staticmethod
+    def __disconnect(card_manager, disposition):
+        try:
+            card_manager.disconnect(disposition)
+        except Exception as e:
+            logging.debug("unable to disconnect the card: %s", e)
@@ -0,0 +1,250 @@
+import logging
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+from threading import Lock
+
+from smartcard.CardConnection import CardConnection
+from smartcard.CardConnectionObserver import CardConnectionObserver
+
+"""
+Binary APDU trace, recorded in a fixed size memory mapped ring file
+
+File layout:
+    header (HEADER_SIZE bytes): magic, version, header size, capacity of the ring, absolute offsets of the oldest record
+      (head) and of the end of the newest one (tail), number of records written, wall clock and monotonic clock (ns) at
+      the creation of the trace
+    ring (capacity bytes): records, the oldest ones being overwritten when the ring is full
+
+Record layout (little endian):
+    length (uint32, whole record), event (uint8), reader name length (uint8), monotonic timestamp (uint64, ns),
+    field (uint16: protocol flags for a command, see packProtocol, SW1 << 8 | SW2 for a response, 0 otherwise),
+    reader name, APDU data
+
+A record never wraps around the end of the ring: the bytes left at the end are skipped (PADDING record, or nothing when
+less than a record header is left).
+"""
+
+MAGIC = b'SCTRACE1'
+VERSION = 1
+
+HEADER_STRUCT = struct.Struct('<8sHHIQQQQQQ')
+HEADER_SIZE = 64
+RECORD_STRUCT = struct.Struct('<IBBQH')
+
+DEFAULT_CAPACITY = 16 * 1024 * 1024
+
+PADDING = 0
+CONNECT = 1
+RECONNECT = 2
+DISCONNECT = 3
+COMMAND = 4
+RESPONSE = 5
+
+EVENTS = {'connect': CONNECT, 'reconnect': RECONNECT, 'disconnect': DISCONNECT, 'command': COMMAND, 'response': RESPONSE}
+EVENT_NAMES = {value: name for name, value in EVENTS.items()}
+
+# timestamp: monotonic clock in ns, event: name of the event (see EVENTS), data: bytes of the APDU (b'' if none)
+# sw1/sw2: status word of a response (None otherwise), protocol: protocol of a command (None otherwise)
+TraceRecord = namedtuple('TraceRecord', ['timestamp', 'event', 'reader', 'data', 'sw1', 'sw2', 'protocol'])
+
+# Bit of the RAW protocol (CardConnection.RAW_protocol, 0x10000) in the protocol field of the commands
+RAW_PROTOCOL_FLAG = 0x8000
+
+
+def packProtocol(protocol):
+    """@return: the protocol flags of a command (CardConnection T0/T1/T15/RAW_protocol) in 16 bits"""
+    if not protocol:
+        return 0
+    return (protocol & 0x7FFF) | (RAW_PROTOCOL_FLAG if protocol & CardConnection.RAW_protocol else 0)
+
+
+def unpackProtocol(field):
+    """@return: the CardConnection protocol flags packed by packProtocol"""
+    return (field & 0x7FFF) | (CardConnection.RAW_protocol if field & RAW_PROTOCOL_FLAG else 0)
+
+
+TraceInfo = namedtuple('TraceInfo', ['capacity', 'head', 'tail', 'records', 'created_wall_ns', 'created_monotonic_ns'])
+
+
+class ApduTraceRecorder(CardConnectionObserver):
+    """Card connection observer recording the connect/reconnect/disconnect events and the APDUs in a binary ring file.
+
+    Add it to card connections (CardManager.addConnectionObserver) and read the file back with readTrace.
+    The file size is fixed (HEADER_SIZE + capacity), the oldest records are overwritten when the ring is full.
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, append=False):
+        """
+        @param path: path of the trace file
+        @param capacity: size of the ring in bytes (ignored when appending to an existing trace)
+        @param append: keep the records of an existing trace file instead of starting a new one
+        """
+        self.path = path
+        self.__mutex = Lock()
+        self.__readers = {}
+        # Records larger than the ring, not written
+        self.dropped = 0
+
+        if append and os.path.exists(path):
+            self.__file = open(path, 'r+b')
+            self.__mmap = mmap.mmap(self.__file.fileno(), 0)
+            info = readTraceInfo(self.__mmap)
+            self.capacity = info.capacity
+            self.__head = info.head
+            self.__tail = info.tail
+            self.__records = info.records
+            self.__created = (info.created_wall_ns, info.created_monotonic_ns)
+        else:
+            self.__file = open(path, 'w+b')
+            self.__file.truncate(HEADER_SIZE + capacity)
+            self.__mmap = mmap.mmap(self.__file.fileno(), 0)
+            self.capacity = capacity
+            self.__head = 0
+            self.__tail = 0
+            self.__records = 0
+            self.__created = (time.time_ns(), time.monotonic_ns())
+            self.__writeHeader()
+
+    def update(self, cardconnection, ccevent):
+        event = EVENTS.get(ccevent.type)
+        if event is None:
+            return
+        if event == COMMAND:
+            self.record(COMMAND, cardconnection.getReader(), ccevent.args[0], packProtocol(ccevent.args[1]))
+        elif event == RESPONSE:
+            self.record(RESPONSE, cardconnection.getReader(), ccevent.args[0], (ccevent.args[-2] << 8) | ccevent.args[-1])
+        else:
+            self.record(event, cardconnection.getReader())
+
+    def record(self, event, reader, data=b'', field=0, timestamp=None):
+        """Write a record in the ring.
+
+        @param event: CONNECT, RECONNECT, DISCONNECT, COMMAND or RESPONSE
+        @param reader: name of the reader
+        @param data: bytes (or list of bytes) of the APDU
+        @param field: protocol of a command (see packProtocol), SW1 << 8 | SW2 of a response
+        @param timestamp: monotonic clock in ns, now if None
+        Records of a closed recorder are ignored, the ones larger than the ring or not fitting the record layout are dropped
+        (counted in dropped): the recorder never fails the transmit it observes.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic_ns()
+        reader_bytes = self.__readers.get(reader)
+        if reader_bytes is None:
+            reader_bytes = self.__readers[reader] = str(reader).encode('utf-8')[:255]
+        length = RECORD_STRUCT.size + len(reader_bytes) + len(data)
+        if length > self.capacity:
+            with self.__mutex:
+                self.dropped += 1
+            logging.warning("trace record of %d bytes dropped: larger than the ring (%d bytes)", length, self.capacity)
+            return
+        try:
+            record_header = RECORD_STRUCT.pack(length, event, len(reader_bytes), timestamp, field)
+        except struct.error as e:
+            with self.__mutex:
+                self.dropped += 1
+            logging.warning("trace record dropped: %s", e)
+            return
+
+        with self.__mutex:
+            if self.__mmap.closed:
+                return
+            position = self.__tail % self.capacity
+            if position + length > self.capacity:
+                # Skip the end of the ring
+                self.__reserve(self.capacity - position)
+                if self.capacity - position >= RECORD_STRUCT.size:
+                    RECORD_STRUCT.pack_into(self.__mmap, HEADER_SIZE + position, self.capacity - position, PADDING, 0, 0, 0)
+                self.__tail += self.capacity - position
+                position = 0
+            self.__reserve(length)
+
+            offset = HEADER_SIZE + position
+            self.__mmap[offset:offset + RECORD_STRUCT.size] = record_header
+            offset += RECORD_STRUCT.size
+            self.__mmap[offset:offset + len(reader_bytes)] = reader_bytes
+            offset += len(reader_bytes)
+            self.__mmap[offset:offset + len(data)] = bytes(data)
+
+            self.__tail += length
+            self.__records += 1
+            self.__writeHeader()
+
+    def getInfo(self):
+        with self.__mutex:
+            return TraceInfo(self.capacity, self.__head, self.__tail, self.__records, self.__created[0], self.__created[1])
+
+    def flush(self):
+        with self.__mutex:
+            self.__mmap.flush()
+
+    def close(self):
+        with self.__mutex:
+            if self.__mmap.closed:
+                return
+            self.__mmap.flush()
+            self.__mmap.close()
+            self.__file.close()
+
+    def __reserve(self, length):
+        # Drop the oldest records until length bytes are free after the tail
+        while self.__tail + length - self.__head > self.capacity:
+            position = self.__head % self.capacity
+            if self.capacity - position < RECORD_STRUCT.size:
+                self.__head += self.capacity - position
+            else:
+                self.__head += struct.unpack_from('<I', self.__mmap, HEADER_SIZE + position)[0]
+
+    def __writeHeader(self):
+        HEADER_STRUCT.pack_into(self.__mmap, 0, MAGIC, VERSION, HEADER_SIZE, 0, self.capacity, self.__head, self.__tail, self.__records,
+                                self.__created[0], self.__created[1])
+
+
+def readTraceInfo(buffer):
+    """Read the header of a trace.
+
+    @param buffer: content of the trace file (bytes, mmap...)
+    @return: TraceInfo
+    """
+    magic, version, header_size, _, capacity, head, tail, records, created_wall_ns, created_monotonic_ns = HEADER_STRUCT.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not an APDU trace file")
+    return TraceInfo(capacity, head, tail, records, created_wall_ns, created_monotonic_ns)
+
+
+def readTrace(path):
+    """Stream the records of a trace file, from the oldest to the newest.
+
+    The file is memory mapped and read one record at a time. Records written while reading are not returned.
+
+    @return: generator of TraceRecord
+    """
+    with open(path, 'rb') as trace_file:
+        with mmap.mmap(trace_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            info = readTraceInfo(buffer)
+            capacity = info.capacity
+            absolute = info.head
+            while absolute < info.tail:
+                position = absolute % capacity
+                if capacity - position < RECORD_STRUCT.size:
+                    absolute += capacity - position
+                    continue
+                offset = HEADER_SIZE + position
+                length, event, reader_length, timestamp, field = RECORD_STRUCT.unpack_from(buffer, offset)
+                if length < RECORD_STRUCT.size:
+                    raise ValueError("Corrupted APDU trace file")
+                absolute += length
+                if event == PADDING:
+                    continue
+                offset += RECORD_STRUCT.size
+                reader = buffer[offset:offset + reader_length].decode('utf-8', 'replace')
+                data = buffer[offset + reader_length:HEADER_SIZE + position + length]
+                if event == RESPONSE:
+                    yield TraceRecord(timestamp, EVENT_NAMES[event], reader, data, field >> 8, field & 0xFF, None)
+                elif event == COMMAND:
+                    yield TraceRecord(timestamp, EVENT_NAMES[event], reader, data, None, None, unpackProtocol(field))
+                else:
+                    yield TraceRecord(timestamp, EVENT_NAMES[event], reader, data, None, None, None)
@@ -0,0 +1,296 @@
+import argparse
+import json
+import re
+import sys
+import time
+from collections import namedtuple, OrderedDict
+from datetime import datetime
+
+from smartcard.util import toHexString
+
+from smartcard_control.model.backend.backend import BACKEND_NAMES, setBackend
+from smartcard_control.model.backend.virtual_backend import VirtualBackend, DEFAULT_RESPONSE
+from smartcard_control.model.card_manager import CardManager
+from smartcard_control.model.trace.trace_recorder import readTrace
+
+"""
+Replay of recorded APDU sessions
+
+Session file format: a json object per line (lines starting with '#' are comments), one line per command/response pair:
+    {"time": 0.0125, "reader": "...", "command": "00A40400", "response": "6F109000", "latency": 0.0031}
+  time: time of the command in seconds since the start of the session
+  response: response data followed by SW1 SW2 (null if unknown), latency: response time in seconds (null if unknown)
+
+Sessions are imported from binary traces (--trace) or from text logs (--logfile, at least -vvv), then replayed through
+CardManager.transmit with their original timing or as fast as possible.
+
+usage:
+    python -m smartcard_control.model.trace.trace_replay import-trace TRACE SESSION
+    python -m smartcard_control.model.trace.trace_replay import-log LOGFILE SESSION
+    python -m smartcard_control.model.trace.trace_replay replay SESSION [--asap] [--reader READER] [--backend virtual]
+"""
+
+SESSION_HEADER = '# smartcard_control session v1'
+
+SessionExchange = namedtuple('SessionExchange', ['time', 'reader', 'command', 'response', 'latency'])
+
+# index: index of the exchange in the session, response: response received (data + SW1 SW2),
+# latency: response time in seconds, latency_delta: latency - recorded latency (None if not recorded)
+ReplayResult = namedtuple('ReplayResult', ['index', 'command', 'expected', 'response', 'latency', 'latency_delta'])
+
+LOG_LINE_REGEX = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3})  \[(\w+)\] [\w.]+/\d+ - (.*)$')
+LOG_TIME_FORMAT = '%Y-%m-%d %H:%M:%S,%f'
+
+
+def writeSession(path, exchanges):
+    """Write the exchanges (iterable of SessionExchange) in a session file."""
+    with open(path, 'w', encoding='utf-8') as session_file:
+        session_file.write(SESSION_HEADER + '\n')
+        for exchange in exchanges:
+            session_file.write(json.dumps({'time': round(exchange.time, 9),
+                                           'reader': exchange.reader,
+                                           'command': bytes(exchange.command).hex().upper(),
+                                           'response': None if exchange.response is None else bytes(exchange.response).hex().upper(),
+                                           'latency': None if exchange.latency is None else round(exchange.latency, 9)}) + '\n')
+
+
+def readSession(path):
+    """Read a session file.
+
+    @return: list of SessionExchange, command and response being bytes
+    """
+    exchanges = []
+    with open(path, encoding='utf-8') as session_file:
+        for line in session_file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            exchange = json.loads(line)
+            response = exchange.get('response')
+            exchanges.append(SessionExchange(exchange.get('time', 0.0),
+                                             exchange.get('reader'),
+                                             bytes.fromhex(exchange['command']),
+                                             None if response is None else bytes.fromhex(response),
+                                             exchange.get('latency')))
+    return exchanges
+
+
+def importTrace(trace_path):
+    """Pair the commands and responses of a binary trace (see trace_recorder), reader by reader.
+
+    @return: generator of SessionExchange
+    """
+    start = None
+    commands = {}
+    for record in readTrace(trace_path):
+        if start is None:
+            start = record.timestamp
+        if record.event == 'command':
+            commands[record.reader] = record
+        elif record.event == 'response':
+            command = commands.pop(record.reader, None)
+            if command is None:
+                continue
+            yield SessionExchange((command.timestamp - start) / 1e9,
+                                  record.reader,
+                                  command.data,
+                                  record.data + bytes([record.sw1, record.sw2]),
+                                  (record.timestamp - command.timestamp) / 1e9)
+
+
+def importLogFile(log_path):
+    """Pair the commands and responses logged by ConsoleCardConnectionObserver in a text log file (--logfile).
+
+    The commands are logged at the INFO level. The response status word is taken from the DEBUG 'response :' line, or else
+    from the decoded response (sw1/sw2/message lines), an unknown status word giving a None response.
+    The log timestamps have a millisecond resolution, so are the times and latencies.
+
+    @return: generator of SessionExchange
+    """
+    start = None
+    command = None
+    response = None
+    for time_value, message, continuation in _readLogRecords(log_path):
+        if command is not None and (message.startswith('command > ') or message.startswith('disconnect event') or message.startswith('reconnect event')):
+            # Command without a logged response
+            yield SessionExchange(command[0] - start, None, command[1], None, None)
+            command = None
+
+        if message.startswith('command > '):
+            if start is None:
+                start = time_value
+            command = (time_value, bytes.fromhex(message[len('command > '):]))
+            response = None
+
+        elif command is not None and message.startswith('response : '):
+            # DEBUG line: SW1 SW2 data
+            fields = bytes.fromhex(message[len('response : '):])
+            response = (time_value, fields[2:] + fields[:2])
+
+        elif command is not None and (message.startswith('response (') or message == 'None'):
+            if response is None:
+                values = dict(line.split(' : ', 1) for line in (l.strip() for l in continuation) if ' : ' in line)
+                if 'sw1' in values and 'sw2' in values:
+                    response = (time_value, bytes.fromhex(values.get('message', '')) + bytes.fromhex(values['sw1'] + values['sw2']))
+            yield SessionExchange(command[0] - start,
+                                  None,
+                                  command[1],
+                                  None if response is None else response[1],
+                                  None if response is None else response[0] - command[0])
+            command = None
+            response = None
+
+    if command is not None:
+        yield SessionExchange(command[0] - start, None, command[1], None, None)
+
+
+def _readLogRecords(log_path):
+    """Split a log file in records: (time in seconds, message, continuation lines)."""
+    record = None
+    with open(log_path, encoding='utf-8', errors='replace') as log_file:
+        for line in log_file:
+            line = line.rstrip('\n')
+            match = LOG_LINE_REGEX.match(line)
+            if match is None:
+                if record is not None:
+                    record[2].append(line)
+                continue
+            if record is not None:
+                yield record
+            time_value = datetime.strptime(match.group(1), LOG_TIME_FORMAT).timestamp()
+            record = (time_value, match.group(3).strip(), [])
+    if record is not None:
+        yield record
+
+
+class ReplayReport(object):
+    """Results of a session replay."""
+
+    def __init__(self, results, duration):
+        self.results = results
+        self.duration = duration
+        self.mismatches = [result for result in results if result.expected is not None and result.response != result.expected]
+
+    def getThroughput(self):
+        return len(self.results) / self.duration if self.duration else 0.0
+
+    def getLatencyDeltas(self):
+        """@return: OrderedDict of command (CLA INS hexadecimal string): list of latency deltas in seconds"""
+        deltas = OrderedDict()
+        for result in self.results:
+            if result.latency_delta is not None:
+                deltas.setdefault(toHexString(list(result.command[:2])), []).append(result.latency_delta)
+        return deltas
+
+    def printReport(self, max_mismatches=10):
+        print("------- REPLAY REPORT -------")
+        print("\texchanges : {}".format(len(self.results)))
+        print("\tduration : {:.3f} s ({:.0f} APDU/s)".format(self.duration, self.getThroughput()))
+        print("\tmismatches : {}".format(len(self.mismatches)))
+        for result in self.mismatches[:max_mismatches]:
+            print("\t  ({}) {} : expected {}, got {}".format(result.index, toHexString(list(result.command)), toHexString(list(result.expected)),
+                                                          toHexString(list(result.response))))
+        deltas = self.getLatencyDeltas()
+        if deltas:
+            print("\tlatency delta (ms) : {:<14} {:>6} {:>10} {:>10} {:>10}".format("CLA INS", "count", "mean", "min", "max"))
+            for command, values in deltas.items():
+                print("\t                     {:<14} {:>6} {:>10.3f} {:>10.3f} {:>10.3f}".format(command, len(values), sum(values) / len(values) * 1e3,
+                                                                                           min(values) * 1e3, max(values) * 1e3))
+        print("-----------------------------")
+
+
+def replaySession(card_manager, exchanges, original_timing=True, stop_on_mismatch=False):
+    """Replay the commands of a session through a connected card manager.
+
+    @param card_manager: CardManager connected to the card
+    @param exchanges: list of SessionExchange
+    @param original_timing: send each command at its recorded time, else as fast as possible
+    @param stop_on_mismatch: stop at the first response differing from the recorded one
+    @return: ReplayReport
+    """
+    results = []
+    start = time.perf_counter()
+    for index, exchange in enumerate(exchanges):
+        if original_timing:
+            delay = start + exchange.time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        command_time = time.perf_counter()
+        data, sw1, sw2 = card_manager.transmit(list(exchange.command))
+        latency = time.perf_counter() - command_time
+
+        response = bytes(data) + bytes([sw1, sw2])
+        latency_delta = None if exchange.latency is None else latency - exchange.latency
+        results.append(ReplayResult(index, exchange.command, exchange.response, response, latency, latency_delta))
+        if stop_on_mismatch and exchange.response is not None and response != exchange.response:
+            break
+    return ReplayReport(results, time.perf_counter() - start)
+
+
+def createSessionBackend(exchanges, latency=0.0):
+    """Create a virtual backend answering the recorded response of each command (the first one for repeated commands).
+
+    The whole commands are looked up (the rules of the virtual backend match the beginning of the APDU), the commands not
+    recorded getting the default response of the virtual cards.
+    """
+    responses = {}
+    for exchange in exchanges:
+        if exchange.response is not None:
+            responses.setdefault(bytes(exchange.command), list(exchange.response))
+    return VirtualBackend(readers=1, latency=latency, rules=[('', lambda apdu: responses.get(bytes(apdu), DEFAULT_RESPONSE))])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import and replay APDU sessions')
+    subparsers = parser.add_subparsers(dest='action')
+    subparsers.required = True
+
+    import_trace_parser = subparsers.add_parser('import-trace', help='create a session from a binary trace (--trace)')
+    import_trace_parser.add_argument('trace')
+    import_trace_parser.add_argument('session')
+
+    import_log_parser = subparsers.add_parser('import-log', help='create a session from a text log file (--logfile)')
+    import_log_parser.add_argument('logfile')
+    import_log_parser.add_argument('session')
+
+    replay_parser = subparsers.add_parser('replay', help='replay a session against a card')
+    replay_parser.add_argument('session')
+    replay_parser.add_argument('--asap', action='store_true', help='send the commands as fast as possible instead of with their original timing')
+    replay_parser.add_argument('--reader', help='reader of the card, the first card found if not given')
+    replay_parser.add_argument('--stop-on-mismatch', action='store_true', help='stop at the first unexpected response')
+    replay_parser.add_argument('-b', '--backend', choices=BACKEND_NAMES + ('session',), default='pcsc',
+                               help="PC/SC backend, 'session' simulates a card answering the recorded responses (default: pcsc)")
+    replay_parser.add_argument('--virtual-config', help='json configuration file of the virtual backend')
+    args = parser.parse_args()
+
+    if args.action == 'import-trace':
+        writeSession(args.session, importTrace(args.trace))
+        return 0
+    if args.action == 'import-log':
+        exchanges = list(importLogFile(args.logfile))
+        if not exchanges:
+            print("no exchange found in {} (the commands are logged from -vvv)".format(args.logfile))
+            return 1
+        writeSession(args.session, exchanges)
+        print("{} exchanges imported in {}".format(len(exchanges), args.session))
+        return 0
+
+    exchanges = readSession(args.session)
+    if args.backend == 'session':
+        setBackend(createSessionBackend(exchanges))
+    elif args.backend == 'virtual' and args.virtual_config is not None:
+        setBackend(VirtualBackend.fromConfigFile(args.virtual_config))
+    else:
+        setBackend(args.backend)
+
+    card_manager = CardManager()
+    card_manager.connect(reader=args.reader)
+    report = replaySession(card_manager, exchanges, original_timing=not args.asap, stop_on_mismatch=args.stop_on_mismatch)
+    card_manager.disconnect()
+    report.printReport()
+    return 1 if report.mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+from smartcard_control.utils.apdu_utils import buildApdu
+
+"""
+Compact APDU types backed by bytes
+
+Apdu and Response hold their bytes once: the header, body, data and status word are zero-copy memoryview or int views,
+and the hexadecimal rendering is computed on the first use only.
+They are accepted (Apdu) and returned (Response, by CardManager.transmitApdu) in place of the lists of int of pyscard.
+"""
+
+
+def _toHex(data):
+    return data.hex(' ').upper()
+
+
+class Apdu(object):
+    """Command APDU: [CLA, INS, P1, P2] + [Lc + DATA] + [Le], in short or extended length encoding.
+
+    It behaves as a read-only sequence of int (len, indexing, iteration, slicing returning bytes), so it can be used
+    wherever an APDU list was.
+    """
+
+    __slots__ = ('raw', '__hex')
+
+    def __init__(self, raw):
+        """@param raw: bytes of the APDU (bytes, bytearray, memoryview or list of int)"""
+        self.raw = bytes(raw)
+        if len(self.raw) < 4:
+            raise Exception("APDU too short (less than 4 bytes): {}".format(_toHex(self.raw)))
+        self.__hex = None
+
+    @staticmethod
+    def fromHex(text):
+        """Parse an hexadecimal APDU ('00 A4 04 00', '00A40400'...).
+
+        @raise Exception: if text is not a valid hexadecimal APDU
+        """
+        try:
+            return Apdu(bytes.fromhex(text))
+        except ValueError as e:
+            raise Exception("Invalid hexadecimal APDU: {}".format(e))
+
+    @staticmethod
+    def build(cla, ins, p1, p2, data=b'', le=None, extended=None):
+        """Build an APDU (see apdu_utils.buildApdu)."""
+        return Apdu(buildApdu(cla, ins, p1, p2, data, le, extended))
+
+    @property
+    def cla(self):
+        return self.raw[0]
+
+    @property
+    def ins(self):
+        return self.raw[1]
+
+    @property
+    def p1(self):
+        return self.raw[2]
+
+    @property
+    def p2(self):
+        return self.raw[3]
+
+    @property
+    def header(self):
+        """@return: memoryview of CLA INS P1 P2"""
+        return memoryview(self.raw)[:4]
+
+    @property
+    def body(self):
+        """@return: memoryview of the bytes following the header (Lc, data and Le)"""
+        return memoryview(self.raw)[4:]
+
+    @property
+    def hex(self):
+        """@return: hexadecimal string of the APDU ('00 A4 04 00'), cached"""
+        if self.__hex is None:
+            self.__hex = _toHex(self.raw)
+        return self.__hex
+
+    def toList(self):
+        """@return: the APDU as a list of int, as taken by pyscard"""
+        return list(self.raw)
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, index):
+        return self.raw[index]
+
+    def __iter__(self):
+        return iter(self.raw)
+
+    def __bytes__(self):
+        return self.raw
+
+    def __eq__(self, other):
+        if isinstance(other, Apdu):
+            return self.raw == other.raw
+        try:
+            return self.raw == bytes(other)
+        except (TypeError, ValueError):
+            return NotImplemented
+
+    def __hash__(self):
+        return hash(self.raw)
+
+    def __repr__(self):
+        return "Apdu({})".format(self.hex)
+
+
+class Response(object):
+    """Response APDU: [DATA] + SW1 SW2.
+
+    It unpacks as the (data, sw1, sw2) tuple returned by the transmit methods, data being a memoryview.
+    """
+
+    __slots__ = ('raw', '__hex', '__data_hex')
+
+    def __init__(self, data, sw1, sw2):
+        """@param data: response data (bytes, list of int...)"""
+        self.raw = bytes(data) + bytes((sw1, sw2))
+        self.__hex = None
+        self.__data_hex = None
+
+    @staticmethod
+    def fromBytes(raw):
+        """@param raw: response data followed by SW1 SW2"""
+        if len(raw) < 2:
+            raise Exception("Response too short (less than 2 bytes)")
+        response = Response.__new__(Response)
+        response.raw = bytes(raw)
+        response.__hex = None
+        response.__data_hex = None
+        return response
+
+    @property
+    def data(self):
+        """@return: memoryview of the response data"""
+        return memoryview(self.raw)[:-2]
+
+    @property
+    def sw1(self):
+        return self.raw[-2]
+
+    @property
+    def sw2(self):
+        return self.raw[-1]
+
+    @property
+    def sw(self):
+        """@return: status word as an int (SW1 << 8 | SW2)"""
+        return (self.raw[-2] << 8) | self.raw[-1]
+
+    def isSuccess(self):
+        return self.raw[-2] == 0x90 and self.raw[-1] == 0x00
+
+    @property
+    def hex(self):
+        """@return: hexadecimal string of the response data and status word, cached"""
+        if self.__hex is None:
+            self.__hex = _toHex(self.raw)
+        return self.__hex
+
+    @property
+    def data_hex(self):
+        """@return: hexadecimal string of the response data ('' if none), cached"""
+        if self.__data_hex is None:
+            self.__data_hex = _toHex(self.raw[:-2])
+        return self.__data_hex
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, index):
+        return (self.data, self.raw[-2], self.raw[-1])[index]
+
+    def __iter__(self):
+        yield self.data
+        yield self.raw[-2]
+        yield self.raw[-1]
+
+    def __bytes__(self):
+        return self.raw
+
+    def __eq__(self, other):
+        if isinstance(other, Response):
+            return self.raw == other.raw
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.raw)
+
+    def __repr__(self):
+        return "Response({})".format(self.hex)
@@ -0,0 +1,269 @@
+"""
+ISO 7816 status word table generated from apdu_response.csv, do not edit
+Regenerate it with: python -m smartcard_control.utils.apdu_response_table_gen
+"""
+
+NO_MATCH = 0xffff
+
+HEADER = ('SW1', 'SW2', 'MESSAGETYPE', 'DESCRIPTION')
+
+# (SW1, SW2, message type, description, SW2 value mask)
+ROWS = (
+    ('6', '', 'E', 'Class not supported.', None),
+    ('61', '--', 'I', 'Response bytes still available', None),
+    ('61', 'XX', 'I', 'Command successfully executed: XX bytes of data are available and can be requested using GET RESPONSE.', 255),
+    ('62', '--', 'W', 'State of non-volatile memory unchanged', None),
+    ('62', '00', 'W', 'No information given (NV-Ram not changed)', None),
+    ('62', '01', 'W', 'NV-Ram not changed 1.', None),
+    ('62', '81', 'W', 'Part of returned data may be corrupted', None),
+    ('62', '82', 'W', 'End of file/record reached before reading Le bytes', None),
+    ('62', '83', 'W', 'Selected file invalidated', None),
+    ('62', '84', 'W', 'Selected file is not valid. FCI not formated according to ISO', None),
+    ('62', '85', 'W', 'No input data available from a sensor on the card. No Purse Engine enslaved for R3bc', None),
+    ('62', 'A2', 'W', 'Wrong R-MAC', None),
+    ('62', 'A4', 'W', 'Card locked (during reset( ))', None),
+    ('62', 'CX', 'W', 'Counter with value x (command dependent)', 15),
+    ('62', 'F1', 'W', 'Wrong C-MAC', None),
+    ('62', 'F3', 'W', 'Internal reset', None),
+    ('62', 'F5', 'W', 'Default agent locked', None),
+    ('62', 'F7', 'W', 'Cardholder locked', None),
+    ('62', 'F8', 'W', 'Basement is current agent', None),
+    ('62', 'F9', 'W', 'CALC Key Set not unblocked', None),
+    ('62', 'FX', 'W', '–', 15),
+    ('62', 'XX', 'W', 'RFU', 255),
+    ('63', '--', 'W', 'State of non-volatile memory changed', None),
+    ('63', '00', 'W', 'No information given (NV-Ram changed)', None),
+    ('63', '81', 'W', 'File filled up by the last write. Loading/updating is not allowed.', None),
+    ('63', '82', 'W', 'Card key not supported.', None),
+    ('63', '83', 'W', 'Reader key not supported.', None),
+    ('63', '84', 'W', 'Plaintext transmission not supported.', None),
+    ('63', '85', 'W', 'Secured transmission not supported.', None),
+    ('63', '86', 'W', 'Volatile memory is not available.', None),
+    ('63', '87', 'W', 'Non-volatile memory is not available.', None),
+    ('63', '88', 'W', 'Key number not valid.', None),
+    ('63', '89', 'W', 'Key length is not correct.', None),
+    ('63', 'C0', 'W', 'Verify fail, no try left.', None),
+    ('63', 'C1', 'W', 'Verify fail, 1 try left.', None),
+    ('63', 'C2', 'W', 'Verify fail, 2 tries left.', None),
+    ('63', 'C3', 'W', 'Verify fail, 3 tries left.', None),
+    ('63', 'CX', 'W', 'The counter has reached the value x (0 = x = 15) (command dependent).', 15),
+    ('63', 'F1', 'W', 'More data expected.', None),
+    ('63', 'F2', 'W', 'More data expected and proactive command pending.', None),
+    ('63', 'FX', 'W', '–', 15),
+    ('63', 'XX', 'W', 'RFU', 255),
+    ('64', '--', 'E', 'State of non-volatile memory unchanged', None),
+    ('64', '00', 'E', 'No information given (NV-Ram not changed)', None),
+    ('64', '01', 'E', 'Command timeout. Immediate response required by the card.', None),
+    ('64', 'XX', 'E', 'RFU', 255),
+    ('65', '--', 'E', 'State of non-volatile memory changed', None),
+    ('65', '00', 'E', 'No information given', None),
+    ('65', '01', 'E', 'Write error. Memory failure. There have been problems in writing or reading the EEPROM. Other hardware problems may also bring this error.', None),
+    ('65', '81', 'E', 'Memory failure', None),
+    ('65', 'FX', 'E', '–', 15),
+    ('65', 'XX', 'E', 'RFU', 255),
+    ('66', '--', 'S', '', None),
+    ('66', '00', 'S', 'Error while receiving (timeout)', None),
+    ('66', '01', 'S', 'Error while receiving (character parity error)', None),
+    ('66', '02', 'S', 'Wrong checksum', None),
+    ('66', '03', 'S', 'The current DF file without FCI', None),
+    ('66', '04', 'S', 'No SF or KF under the current DF', None),
+    ('66', '69', 'S', 'Incorrect Encryption/Decryption Padding', None),
+    ('66', 'XX', 'S', '–', 255),
+    ('67', '--', 'E', '', None),
+    ('67', '00', 'E', 'Wrong length', None),
+    ('67', 'XX', 'E', 'length incorrect (procedure)(ISO 7816-3)', 255),
+    ('68', '--', 'E', 'Functions in CLA not supported', None),
+    ('68', '00', 'E', 'No information given (The request function is not supported by the card)', None),
+    ('68', '81', 'E', 'Logical channel not supported', None),
+    ('68', '82', 'E', 'Secure messaging not supported', None),
+    ('68', '83', 'E', 'Last command of the chain expected', None),
+    ('68', '84', 'E', 'Command chaining not supported', None),
+    ('68', 'FX', 'E', '–', 15),
+    ('68', 'XX', 'E', 'RFU', 255),
+    ('69', '--', 'E', 'Command not allowed', None),
+    ('69', '00', 'E', 'No information given (Command not allowed)', None),
+    ('69', '01', 'E', 'Command not accepted (inactive state)', None),
+    ('69', '81', 'E', 'Command incompatible with file structure', None),
+    ('69', '82', 'E', 'Security condition not satisfied.', None),
+    ('69', '83', 'E', 'Authentication method blocked', None),
+    ('69', '84', 'E', 'Referenced data reversibly blocked (invalidated)', None),
+    ('69', '85', 'E', 'Conditions of use not satisfied.', None),
+    ('69', '86', 'E', 'Command not allowed (no current EF)', None),
+    ('69', '87', 'E', 'Expected secure messaging (SM) object missing', None),
+    ('69', '88', 'E', 'Incorrect secure messaging (SM) data object', None),
+    ('69', '8D', '', 'Reserved', None),
+    ('69', '96', 'E', 'Data must be updated again', None),
+    ('69', 'E1', 'E', 'POL1 of the currently Enabled Profile prevents this action.', None),
+    ('69', 'F0', 'E', 'Permission Denied', None),
+    ('69', 'F1', 'E', 'Permission Denied – Missing Privilege', None),
+    ('69', 'FX', 'E', '–', 15),
+    ('69', 'XX', 'E', 'RFU', 255),
+    ('6A', '--', 'E', 'Wrong parameter(s) P1-P2', None),
+    ('6A', '00', 'E', 'No information given (Bytes P1 and/or P2 are incorrect)', None),
+    ('6A', '80', 'E', 'The parameters in the data field are incorrect.', None),
+    ('6A', '81', 'E', 'Function not supported', None),
+    ('6A', '82', 'E', 'File not found', None),
+    ('6A', '83', 'E', 'Record not found', None),
+    ('6A', '84', 'E', 'There is insufficient memory space in record or file', None),
+    ('6A', '85', 'E', 'Lc inconsistent with TLV structure', None),
+    ('6A', '86', 'E', 'Incorrect P1 or P2 parameter.', None),
+    ('6A', '87', 'E', 'Lc inconsistent with P1-P2', None),
+    ('6A', '88', 'E', 'Referenced data not found', None),
+    ('6A', '89', 'E', 'File already exists', None),
+    ('6A', '8A', 'E', 'DF name already exists.', None),
+    ('6A', 'F0', 'E', 'Wrong parameter value', None),
+    ('6A', 'FX', 'E', '–', 15),
+    ('6A', 'XX', 'E', 'RFU', 255),
+    ('6B', '--', 'E', '', None),
+    ('6B', '00', 'E', 'Wrong parameter(s) P1-P2', None),
+    ('6B', 'XX', 'E', 'Reference incorrect (procedure byte), (ISO 7816-3)', 255),
+    ('6C', '--', 'E', 'Wrong length Le', None),
+    ('6C', '00', 'E', 'Incorrect P3 length.', None),
+    ('6C', 'XX', 'E', 'Bad length value in Le: xx is the correct exact Le', 255),
+    ('6D', '--', 'E', '', None),
+    ('6D', '00', 'E', 'Instruction code not supported or invalid', None),
+    ('6D', 'XX', 'E', 'Instruction code not programmed or invalid (procedure byte), (ISO 7816-3)', 255),
+    ('6E', '--', 'E', '', None),
+    ('6E', '00', 'E', 'Class not supported', None),
+    ('6E', 'XX', 'E', 'Instruction class not supported (procedure byte), (ISO 7816-3)', 255),
+    ('6F', '--', 'E', 'Internal exception', None),
+    ('6F', '00', 'E', 'Command aborted – more exact diagnosis not possible (e.g., operating system error).', None),
+    ('6F', 'FF', 'E', 'Card dead (overuse, …)', None),
+    ('6F', 'XX', 'E', 'No precise diagnosis (procedure byte), (ISO 7816-3)', 255),
+    ('9-', '--', '', '', None),
+    ('90', '00', 'I', 'Command successfully executed (OK).', None),
+    ('90', '04', 'W', 'PIN not succesfully verified, 3 or more PIN tries left', None),
+    ('90', '08', '', 'Key/file not found', None),
+    ('90', '80', 'W', 'Unblock Try Counter has reached zero', None),
+    ('91', '00', '', 'OK', None),
+    ('91', '01', '', 'States.activity, States.lock Status or States.lockable has wrong value', None),
+    ('91', '02', '', 'Transaction number reached its limit', None),
+    ('91', '0C', '', 'No changes', None),
+    ('91', '0E', '', 'Insufficient NV-Memory to complete command', None),
+    ('91', '1C', '', 'Command code not supported', None),
+    ('91', '1E', '', 'CRC or MAC does not match data', None),
+    ('91', '40', '', 'Invalid key number specified', None),
+    ('91', '7E', '', 'Length of command string invalid', None),
+    ('91', '9D', '', 'Not allow the requested command', None),
+    ('91', '9E', '', 'Value of the parameter invalid', None),
+    ('91', 'A0', '', 'Requested AID not present on PICC', None),
+    ('91', 'A1', '', 'Unrecoverable error within application', None),
+    ('91', 'AE', '', 'Authentication status does not allow the requested command', None),
+    ('91', 'AF', '', 'Additional data frame is expected to be sent', None),
+    ('91', 'BE', '', 'Out of boundary', None),
+    ('91', 'C1', '', 'Unrecoverable error within PICC', None),
+    ('91', 'CA', '', 'Previous Command was not fully completed', None),
+    ('91', 'CD', '', 'PICC was disabled by an unrecoverable error', None),
+    ('91', 'CE', '', 'Number of Applications limited to 28', None),
+    ('91', 'DE', '', 'File or application already exists', None),
+    ('91', 'EE', '', 'Could not complete NV-write operation due to loss of power', None),
+    ('91', 'F0', '', 'Specified file number does not exist', None),
+    ('91', 'F1', '', 'Unrecoverable error within file', None),
+    ('92', '0x', 'I', 'Writing to EEPROM successful after x attempts.', 15),
+    ('92', '10', 'E', 'Insufficient memory. No more storage available.', None),
+    ('92', '40', 'E', 'Writing to EEPROM not successful.', None),
+    ('93', '01', '', 'Integrity error', None),
+    ('93', '02', '', 'Candidate S2 invalid', None),
+    ('93', '03', 'E', 'Application is permanently locked', None),
+    ('94', '00', 'E', 'No EF selected.', None),
+    ('94', '01', '', 'Candidate currency code does not match purse currency', None),
+    ('94', '02', '', 'Candidate amount too high', None),
+    ('94', '02', 'E', 'Address range exceeded.', None),
+    ('94', '03', '', 'Candidate amount too low', None),
+    ('94', '04', 'E', 'FID not found, record not found or comparison pattern not found.', None),
+    ('94', '05', '', 'Problems in the data field', None),
+    ('94', '06', 'E', 'Required MAC unavailable', None),
+    ('94', '07', '', 'Bad currency : purse engine has no slot with R3bc currency', None),
+    ('94', '08', '', 'R3bc currency not supported in purse engine', None),
+    ('94', '08', 'E', 'Selected file type does not match command.', None),
+    ('95', '80', '', 'Bad sequence', None),
+    ('96', '81', '', 'Slave not found', None),
+    ('97', '00', '', 'PIN blocked and Unblock Try Counter is 1 or 2', None),
+    ('97', '02', '', 'Main keys are blocked', None),
+    ('97', '04', '', 'PIN not succesfully verified, 3 or more PIN tries left', None),
+    ('97', '84', '', 'Base key', None),
+    ('97', '85', '', 'Limit exceeded – C-MAC key', None),
+    ('97', '86', '', 'SM error – Limit exceeded – R-MAC key', None),
+    ('97', '87', '', 'Limit exceeded – sequence counter', None),
+    ('97', '88', '', 'Limit exceeded – R-MAC length', None),
+    ('97', '89', '', 'Service not available', None),
+    ('98', '02', 'E', 'No PIN defined.', None),
+    ('98', '04', 'E', 'Access conditions not satisfied, authentication failed.', None),
+    ('98', '35', 'E', 'ASK RANDOM or GIVE RANDOM not executed.', None),
+    ('98', '40', 'E', 'PIN verification not successful.', None),
+    ('98', '50', 'E', 'INCREASE or DECREASE could not be executed because a limit has been reached.', None),
+    ('98', '62', 'E', 'Authentication Error, application specific (incorrect MAC)', None),
+    ('99', '00', '', '1 PIN try left', None),
+    ('99', '04', '', 'PIN not succesfully verified, 1 PIN try left', None),
+    ('99', '85', '', 'Wrong status – Cardholder lock', None),
+    ('99', '86', 'E', 'Missing privilege', None),
+    ('99', '87', '', 'PIN is not installed', None),
+    ('99', '88', '', 'Wrong status – R-MAC state', None),
+    ('9A', '00', '', '2 PIN try left', None),
+    ('9A', '04', '', 'PIN not succesfully verified, 2 PIN try left', None),
+    ('9A', '71', '', 'Wrong parameter value – Double agent AID', None),
+    ('9A', '72', '', 'Wrong parameter value – Double agent Type', None),
+    ('9D', '05', 'E', 'Incorrect certificate type', None),
+    ('9D', '07', 'E', 'Incorrect session data size', None),
+    ('9D', '08', 'E', 'Incorrect DIR file record size', None),
+    ('9D', '09', 'E', 'Incorrect FCI record size', None),
+    ('9D', '0A', 'E', 'Incorrect code size', None),
+    ('9D', '10', 'E', 'Insufficient memory to load application', None),
+    ('9D', '11', 'E', 'Invalid AID', None),
+    ('9D', '12', 'E', 'Duplicate AID', None),
+    ('9D', '13', 'E', 'Application previously loaded', None),
+    ('9D', '14', 'E', 'Application history list full', None),
+    ('9D', '15', 'E', 'Application not open', None),
+    ('9D', '17', 'E', 'Invalid offset', None),
+    ('9D', '18', 'E', 'Application already loaded', None),
+    ('9D', '19', 'E', 'Invalid certificate', None),
+    ('9D', '1A', 'E', 'Invalid signature', None),
+    ('9D', '1B', 'E', 'Invalid KTU', None),
+    ('9D', '1D', 'E', 'MSM controls not set', None),
+    ('9D', '1E', 'E', 'Application signature does not exist', None),
+    ('9D', '1F', 'E', 'KTU does not exist', None),
+    ('9D', '20', 'E', 'Application not loaded', None),
+    ('9D', '21', 'E', 'Invalid Open command data length', None),
+    ('9D', '30', 'E', 'Check data parameter is incorrect (invalid start address)', None),
+    ('9D', '31', 'E', 'Check data parameter is incorrect (invalid length)', None),
+    ('9D', '32', 'E', 'Check data parameter is incorrect (illegal memory check area)', None),
+    ('9D', '40', 'E', 'Invalid MSM Controls ciphertext', None),
+    ('9D', '41', 'E', 'MSM controls already set', None),
+    ('9D', '42', 'E', 'Set MSM Controls data length less than 2 bytes', None),
+    ('9D', '43', 'E', 'Invalid MSM Controls data length', None),
+    ('9D', '44', 'E', 'Excess MSM Controls ciphertext', None),
+    ('9D', '45', 'E', 'Verification of MSM Controls data failed', None),
+    ('9D', '50', 'E', 'Invalid MCD Issuer production ID', None),
+    ('9D', '51', 'E', 'Invalid MCD Issuer ID', None),
+    ('9D', '52', 'E', 'Invalid set MSM controls data date', None),
+    ('9D', '53', 'E', 'Invalid MCD number', None),
+    ('9D', '54', 'E', 'Reserved field error', None),
+    ('9D', '55', 'E', 'Reserved field error', None),
+    ('9D', '56', 'E', 'Reserved field error', None),
+    ('9D', '57', 'E', 'Reserved field error', None),
+    ('9D', '60', 'E', 'MAC verification failed', None),
+    ('9D', '61', 'E', 'Maximum number of unblocks reached', None),
+    ('9D', '62', 'E', 'Card was not blocked', None),
+    ('9D', '63', 'E', 'Crypto functions not available', None),
+    ('9D', '64', 'E', 'No application loaded', None),
+    ('9E', '00', '', 'PIN not installed', None),
+    ('9E', '04', '', 'PIN not succesfully verified, PIN not installed', None),
+    ('9F', '00', '', 'PIN blocked and Unblock Try Counter is 3', None),
+    ('9F', '04', '', 'PIN not succesfully verified, PIN blocked and Unblock Try Counter is 3', None),
+    ('9F', 'XX', '', 'Command successfully executed: xx bytes of data are available and can be requested using GET RESPONSE.', 255),
+    ('9x', 'XX', '', 'Application related status, (ISO 7816-3)', 255),
+)
+
+# Index in ROWS for every (SW1 << 8) | SW2 code: little endian uint16, zlib compressed, base85 encoded
+SW_TABLE = (
+    'c-rmS_m3210LS5Ph@w~#B`Q|z28=CMqOr%`TM&DVMx)UvQL*=iy=$xidjl20-g__DJ2r~`130;C)OdHZ=1w@W@AG`}&U-hrGrRBX'
+    '?ftaVrvm^00000000000000000000000000000000000000000000000000000000K+g+B>!qTbEwiV8(e=(8nKOMdSC_9acQxke'
+    ';<@uSsk^INDDzcg{%Z8C#scY=1*`e*7S76rw@4PvfGn29vqYB6QdxSYKKsBdlV!79mhYtQUVo*mkQJ+KXAR2WtfFFDHLGRKqFcSC'
+    'SGPu!*2>yhC+lXt3~7<pZ<&?Mj5f%ID!7fZMd59nO|oe=Ythwh-lQ$FRrV~pt+P$G&34&7J7mY~^w<8K+dXoZS@QMoT6=W2?4CVp'
+    '8k)n3Zm$f>-q|PnX20y819D&v%E2wPzC&_oZHMOw72J_IN(Faxj#0rKo8we)$7i^T?S%LS1ONa4000000000000000^t==EM_VT~'
+    '=93$9DUB#>z5ni%oSM@**nfI8&Zs%>%xawVKRo~0J-GIBx^?!sIj`EDp9?yD#D%%2_6irbZ7*rJe`MSC(p=W$6<prr_!ZT-GFR0;'
+    '=ISP0GlSoQYYYGU^?cXm`rP0?6xxlsDL3bq+?v~Rd+x}c?uiO&lzUKkql;esUDdd|8ut|bS8#9c%l&yE59Xob*8Xrc9+~0KGN!}5'
+    'W1F1y=zqBKWB!YExyKvxxZ>}`6B(Zgd9tuoKh>C@ZrK$+lV^R-C8?(8s_}eY$cuUDAA4WUD|t1q<@LN#{q|<w%G-G-?^Zv*m-q8Q'
+    'KFmk8SN%AjWMa+nPxDzm&lmYJUv+r=>wJ@M^Ig8r5BV{Z+8zHXKj)YHn%}&GU21Y;p5k5<+0^{r*0jc~vhocG000000000000000'
+    '00000000000000000000000000000000000000000001H1%ConSgN}'
+)
@@ -0,0 +1,164 @@
+import argparse
+import base64
+import csv
+import os
+import sys
+import zlib
+from array import array
+
+"""
+Generator of the precompiled ISO 7816 status word table (apdu_response_table.py)
+
+The csv table (apdu_response.csv) is only read here, at build time, and compiled into an importable module holding the
+rows and the 65536 entries table giving for each (SW1 << 8) | SW2 code the index of its most specific row.
+
+usage:
+    python -m smartcard_control.utils.apdu_response_table_gen            # regenerate apdu_response_table.py
+    python -m smartcard_control.utils.apdu_response_table_gen --check    # verify it matches apdu_response.csv
+"""
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_FILE = os.path.join(UTILS_DIR, 'apdu_response.csv')
+TABLE_FILE = os.path.join(UTILS_DIR, 'apdu_response_table.py')
+
+NO_MATCH = 0xFFFF
+
+
+def readIsoApduResponseCsv(csv_file=CSV_FILE):
+    """Read the csv table.
+
+    @return: (header, rows) where header is the upper cased first line and rows the list of the following lines
+    """
+    with open(csv_file, encoding='utf-8-sig', newline='') as csvfile:
+        reader = csv.reader(csvfile, delimiter=';')
+        header = tuple(v.upper() for v in next(reader))
+        rows = [tuple(line) for line in reader]
+    return header, rows
+
+
+def parseStatusBytePattern(pattern):
+    """Parse a SW1 or SW2 column of the csv table.
+
+    @return: (mask, value, wildcard rank) where the byte b matches if b & mask == value.
+      The wildcard rank is 1 for 'XX' (any value, the byte is meaningful) and 0 for '--' or '' (any value, generic group).
+    """
+    pattern = pattern.strip().upper()
+    if pattern in ('', '--', '-'):
+        return 0x00, 0x00, 0
+    if pattern == 'XX':
+        return 0x00, 0x00, 1
+    if len(pattern) == 1 or pattern[1] in ('X', '-'):
+        return 0xF0, int(pattern[0], 16) << 4, 0
+    return 0xFF, int(pattern, 16), 0
+
+
+def buildStatusWordTable(rows):
+    """Build the 65536 entries table giving for each status word the index of its most specific row.
+
+    A row is more specific than another if it fixes more bits of SW1 and SW2, then if its SW2 is 'XX' rather than '--'.
+    When two rows are equally specific, the first one of the csv file is kept.
+
+    @param rows: rows of the csv table (SW1, SW2, message type, description)
+    @return: (value_masks, table) where value_masks gives for each row the bits of SW2 carrying a value
+      (the whole byte for 'XX', the low nibble for 'CX', 'FX', '0x'..., None otherwise)
+    """
+    table = array('H', [NO_MATCH]) * 0x10000
+    ranks = array('b', [-1]) * 0x10000
+    value_masks = []
+    for index, row in enumerate(rows):
+        sw1_mask, sw1_value, _ = parseStatusBytePattern(row[0])
+        sw2_mask, sw2_value, sw2_wildcard = parseStatusBytePattern(row[1])
+        rank = 2 * (bin(sw1_mask).count('1') + bin(sw2_mask).count('1')) + sw2_wildcard
+
+        if sw2_wildcard:
+            value_masks.append(0xFF)
+        elif sw2_mask == 0xF0:
+            value_masks.append(0x0F)
+        else:
+            value_masks.append(None)
+
+        sw1_list = [sw1 for sw1 in range(0x100) if sw1 & sw1_mask == sw1_value]
+        sw2_list = [sw2 for sw2 in range(0x100) if sw2 & sw2_mask == sw2_value]
+        for sw1 in sw1_list:
+            for sw2 in sw2_list:
+                code = (sw1 << 8) | sw2
+                if rank > ranks[code]:
+                    ranks[code] = rank
+                    table[code] = index
+    return value_masks, table
+
+
+def packTable(table):
+    """Pack the table as little endian uint16, zlib compressed and base85 encoded."""
+    table = array('H', table)
+    if sys.byteorder == 'big':
+        table.byteswap()
+    return base64.b85encode(zlib.compress(table.tobytes(), 9)).decode('ascii')
+
+
+def unpackTable(packed_table):
+    """Inverse of packTable."""
+    table = array('H')
+    table.frombytes(zlib.decompress(base64.b85decode(packed_table)))
+    if sys.byteorder == 'big':
+        table.byteswap()
+    return table
+
+
+def renderTableModule(csv_file=CSV_FILE):
+    """Render the source of the apdu_response_table module from the csv table."""
+    header, rows = readIsoApduResponseCsv(csv_file)
+    value_masks, table = buildStatusWordTable(rows)
+
+    lines = ['"""',
+             'ISO 7816 status word table generated from apdu_response.csv, do not edit',
+             'Regenerate it with: python -m smartcard_control.utils.apdu_response_table_gen',
+             '"""',
+             '',
+             'NO_MATCH = {}'.format(hex(NO_MATCH)),
+             '',
+             'HEADER = {!r}'.format(header),
+             '',
+             '# (SW1, SW2, message type, description, SW2 value mask)',
+             'ROWS = (']
+    for row, value_mask in zip(rows, value_masks):
+        lines.append('    {!r},'.format(tuple(row) + (value_mask,)))
+    lines.append(')')
+    lines.append('')
+    lines.append('# Index in ROWS for every (SW1 << 8) | SW2 code: little endian uint16, zlib compressed, base85 encoded')
+    lines.append('SW_TABLE = (')
+    packed_table = packTable(table)
+    for i in range(0, len(packed_table), 100):
+        lines.append('    {!r}'.format(packed_table[i:i + 100]))
+    lines.append(')')
+    lines.append('')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the ISO 7816 status word table from {}'.format(os.path.basename(CSV_FILE)))
+    parser.add_argument("--check",
+                        action="store_true",
+                        help="only verify that {} matches the csv table".format(os.path.basename(TABLE_FILE)))
+    args = parser.parse_args()
+
+    source = renderTableModule()
+    if args.check:
+        try:
+            with open(TABLE_FILE, encoding='utf-8') as table_file:
+                up_to_date = table_file.read() == source
+        except FileNotFoundError:
+            up_to_date = False
+        if not up_to_date:
+            print("{} is out of date, regenerate it".format(TABLE_FILE))
+            return 1
+        print("{} is up to date".format(TABLE_FILE))
+        return 0
+
+    with open(TABLE_FILE, 'w', encoding='utf-8') as table_file:
+        table_file.write(source)
+    print("{} generated".format(TABLE_FILE))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,4 @@
-import csv
+from collections import namedtuple
 
 """
 APDU predefined messages
@@ -21,6 +21,8 @@ VERIFY_PIN_9876_CMD = VERIFY_CMD + [0x10] + PIN_9876 + PIN_PADDING_11
 MODIFY_1234to1234_CDM = MODIFY_CMD + [0x20] + PIN_1234 + PIN_PADDING_11 + PIN_1234 + PIN_PADDING_11
 MODIFY_1234to9876_CDM = MODIFY_CMD + [0x20] + PIN_1234 + PIN_PADDING_11 + PIN_9876 + PIN_PADDING_11
 MODIFY_9876to1234_CDM = MODIFY_CMD + [0x20] + PIN_9876 + PIN_PADDING_11 + PIN_1234 + PIN_PADDING_11
+# Get response
+GET_RESPONSE_INS = 0xC0
 
 APDU_ISO7816_RESPONSE_LIST_HEADER = []
 APDU_ISO7816_RESPONSE_LIST = []
@@ -29,39 +31,221 @@ APDU_ISO7816_RESPONSE_LIST = []
 Helper functions to manage Iso7816-4 APDU messages
 """
 def initIsoApduResponseList():
-    with open('apdu_response.csv', encoding='utf-8-sig') as csvfile:
-        reader = csv.reader(csvfile, delimiter=';')
-        for v in next(reader):
-            APDU_ISO7816_RESPONSE_LIST_HEADER.append(v.upper())
-        for line in reader:
-            tmp_dic = {}
-            for i, v in enumerate(line):
-                tmp_dic[APDU_ISO7816_RESPONSE_LIST_HEADER[i]] = v
-            APDU_ISO7816_RESPONSE_LIST.append(tmp_dic)
+    from smartcard_control.utils import apdu_response_table
+
+    APDU_ISO7816_RESPONSE_LIST_HEADER.extend(apdu_response_table.HEADER)
+    for row in apdu_response_table.ROWS:
+        APDU_ISO7816_RESPONSE_LIST.append(dict(zip(APDU_ISO7816_RESPONSE_LIST_HEADER, row)))
 
 
 def printIsoApduResponseList():
-    initIsoApduResponseList()
+    if len(APDU_ISO7816_RESPONSE_LIST) == 0 and len(APDU_ISO7816_RESPONSE_LIST_HEADER) == 0:
+        initIsoApduResponseList()
     print(APDU_ISO7816_RESPONSE_LIST_HEADER)
     print(APDU_ISO7816_RESPONSE_LIST)
 
 
+"""
+Precompiled status word decoder
+Every (SW1 << 8) | SW2 code is resolved into an index of the generated apdu_response_table.ROWS, so decoding is a single lookup.
+The table is compiled from apdu_response.csv by apdu_response_table_gen and loaded on the first decoding.
+"""
+IsoStatusWord = namedtuple('IsoStatusWord', ['sw1', 'sw2', 'message_type', 'description', 'value'])
+
+_NO_MATCH = 0xFFFF
+_SW_TABLE = None
+_SW_ROWS = ()
+
+
+def initIsoApduStatusWordTable():
+    """Load the precompiled status word table."""
+    global _SW_TABLE, _SW_ROWS
+    from smartcard_control.utils import apdu_response_table
+    from smartcard_control.utils.apdu_response_table_gen import unpackTable
+
+    _SW_ROWS = tuple((message_type, description, value_mask) for _, _, message_type, description, value_mask in apdu_response_table.ROWS)
+    _SW_TABLE = unpackTable(apdu_response_table.SW_TABLE)
+
+
+def decodeStatusWord(sw1, sw2):
+    """Decode a status word using the precompiled table.
+
+    @param sw1: first status byte (int)
+    @param sw2: second status byte (int)
+    @return: an IsoStatusWord or None if the status word is unknown.
+      Its value is the x of 'CX'/'FX'/'0x' rows (counters) or SW2 itself for 'XX' rows (61XX, 6CXX...), None otherwise.
+    """
+    if _SW_TABLE is None:
+        initIsoApduStatusWordTable()
+
+    index = _SW_TABLE[((sw1 & 0xFF) << 8) | (sw2 & 0xFF)]
+    if index == _NO_MATCH:
+        return None
+
+    message_type, description, value_mask = _SW_ROWS[index]
+    return IsoStatusWord(sw1, sw2, message_type, description, None if value_mask is None else sw2 & value_mask)
+
+
 def parseIsoApduResponse(sw1, sw2, message=None):
-    if len(APDU_ISO7816_RESPONSE_LIST) == 0 and len(APDU_ISO7816_RESPONSE_LIST_HEADER) == 0:
-        initIsoApduResponseList()
+    status_word = decodeStatusWord(int(sw1, 16), int(sw2, 16))
+    if status_word is None:
+        return None
+
+    response = "response ({}) > {} \n\tsw1 : {:02X} \n\tsw2 : {:02X}".format(status_word.message_type, status_word.description, status_word.sw1, status_word.sw2)
+    if status_word.value is not None:
+        response += " \n\tvalue : {}".format(status_word.value)
+    if message:
+        response += " \n\tmessage : {}".format(message)
+    return response
+
+
+"""
+APDU helpers, used to chain GET RESPONSE commands (61XX) and to correct Le (6CXX)
+"""
+
+
+def getResponseCommand(cla, le):
+    """GET RESPONSE command fetching le bytes (0 for 256), on the logical channel of cla.
+
+    The CLA is 00 (interindustry class) with the logical channel bits of cla, or cla itself for a proprietary class
+    """
+    if cla & 0x80:
+        return [cla, GET_RESPONSE_INS, 0x00, 0x00, le]
+    return [cla & 0x03, GET_RESPONSE_INS, 0x00, 0x00, le]
+
+
+def setApduLe(apdu_message, le):
+    """Copy of an APDU with its Le set (added or replaced), keeping its short or extended length encoding.
+
+    @param le: expected length, 0 for 256 (a 6CXX SW2)
+    @return: the APDU (list of int) or None if apdu_message is not a valid APDU
+    """
+    length = len(apdu_message)
+    if length == 4:
+        return list(apdu_message) + [le]
+    if length == 5:
+        return list(apdu_message[:4]) + [le]
+    lc = apdu_message[4]
+    if lc != 0:
+        # Short APDU
+        if length == 5 + lc:
+            return list(apdu_message) + [le]
+        if length == 6 + lc:
+            return list(apdu_message[:-1]) + [le]
+        return None
+    # Extended length APDU
+    extended_le = [(le or SHORT_MAX_LE) >> 8, (le or SHORT_MAX_LE) & 0xFF]
+    if length == 7:
+        return list(apdu_message[:5]) + extended_le
+    lc = (apdu_message[5] << 8) | apdu_message[6]
+    if length == 7 + lc:
+        return list(apdu_message) + extended_le
+    if length == 9 + lc:
+        return list(apdu_message[:-2]) + extended_le
+    return None
+
+
+"""
+APDU builder: short (Lc up to 255, Le up to 256) or extended length (Lc up to 65535, Le up to 65536) encoding,
+and command chaining of data longer than 255 bytes in short APDUs
+"""
+SHORT_MAX_LC = 255
+SHORT_MAX_LE = 256
+EXTENDED_MAX_LC = 65535
+EXTENDED_MAX_LE = 65536
+CHAINING_CLA_BIT = 0x10
+
+
+def needsExtendedLength(lc, le=None):
+    """@return: True if a command with lc data bytes and le expected bytes (None if none) cannot be a short APDU"""
+    return lc > SHORT_MAX_LC or (le is not None and le > SHORT_MAX_LE)
+
+
+def buildApdu(cla, ins, p1, p2, data=b'', le=None, extended=None):
+    """Build an APDU (ISO 7816-4 cases 1 to 4).
+
+    @param data: command data (bytes or list of int)
+    @param le: number of bytes expected in the response (256 or 65536 for the maximum), None if no response data is expected
+    @param extended: use the extended length encoding, only when needed if None
+    @return: the APDU as a list of int
+    @raise Exception: if data or le is too long
+    """
+    lc = len(data)
+    if lc > EXTENDED_MAX_LC or (le is not None and not 0 <= le <= EXTENDED_MAX_LE):
+        raise Exception("APDU data or expected length too long (Lc : {}, Le : {})".format(lc, le))
+    if extended is None:
+        extended = needsExtendedLength(lc, le)
+    elif not extended and needsExtendedLength(lc, le):
+        raise Exception("APDU data or expected length too long for a short APDU (Lc : {}, Le : {})".format(lc, le))
+
+    apdu = [cla, ins, p1, p2]
+    if not extended:
+        if lc:
+            apdu.append(lc)
+            apdu.extend(data)
+        if le is not None:
+            apdu.append(le & 0xFF)
+        return apdu
+
+    if lc:
+        apdu.extend((0x00, lc >> 8, lc & 0xFF))
+        apdu.extend(data)
+    if le is not None:
+        if not lc:
+            apdu.append(0x00)
+        apdu.extend(((le >> 8) & 0xFF, le & 0xFF))
+    return apdu
+
+
+def buildChainedApdus(cla, ins, p1, p2, data, le=None, chunk_size=SHORT_MAX_LC):
+    """Split a command with long data in short APDUs using command chaining: CLA bit 0x10 set on all but the last one,
+    which carries Le (at most 256, the rest of the response being read with GET RESPONSE).
+
+    @return: list of APDUs (lists of int)
+    """
+    data = bytes(data)
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)] or [b'']
+    apdus = [buildApdu(cla | CHAINING_CLA_BIT, ins, p1, p2, chunk, extended=False) for chunk in chunks[:-1]]
+    apdus.append(buildApdu(cla, ins, p1, p2, chunks[-1], None if le is None else min(le, SHORT_MAX_LE), extended=False))
+    return apdus
+
+
+
+"""
+Status word patterns ('9000', '6A82', '61XX', '6XXX'...), 'X' digits matching any value, compiled to (value, mask) pairs
+"""
+
+
+def parseStatusWordPattern(pattern):
+    """@param pattern: 4 hexadecimal digits, 'X' for any digit, or an int status word
+    @return: (value, mask), a status word sw matching if sw & mask == value
+    @raise Exception: if the pattern is malformed
+    """
+    if isinstance(pattern, int):
+        return pattern & 0xFFFF, 0xFFFF
+    digits = ''.join(str(pattern).split()).upper()
+    if len(digits) != 4:
+        raise Exception("Invalid status word pattern (4 hexadecimal digits expected): " + str(pattern))
+    value = 0
+    mask = 0
+    for digit in digits:
+        value <<= 4
+        mask <<= 4
+        if digit != 'X':
+            try:
+                value |= int(digit, 16)
+            except ValueError:
+                raise Exception("Invalid status word pattern: " + str(pattern))
+            mask |= 0xF
+    return value, mask
+
 
-    for response in APDU_ISO7816_RESPONSE_LIST:
-        if sw1.upper() in response.values() and sw2.upper() in response.values():
-            if not message:
-                return "response ({}) > {} \n\tsw1 : {} \n\tsw2 : {}".format(
-                    response.get(APDU_ISO7816_RESPONSE_LIST_HEADER[2]),
-                    response.get(APDU_ISO7816_RESPONSE_LIST_HEADER[3]),
-                    response.get(APDU_ISO7816_RESPONSE_LIST_HEADER[0]),
-                    response.get(APDU_ISO7816_RESPONSE_LIST_HEADER[1]))
-            else:
-                return "response ({}) > {} \n\tsw1 : {} \n\tsw2 : {} \n\tmessage : {}".format(
-                    response.get(APDU_ISO7816_RESPONSE_LIST_HEADER[2]),
-                    response.get(APDU_ISO7816_RESPONSE_LIST_HEADER[3]),
-                    response.get(APDU_ISO7816_RESPONSE_LIST_HEADER[0]),
-                    response.get(APDU_ISO7816_RESPONSE_LIST_HEADER[1]),
-                    message)
\ No newline at end of file
+def matchStatusWord(patterns, sw1, sw2):
+    """@param patterns: (value, mask) pairs returned by parseStatusWordPattern
+    @return: True if the status word matches one of the patterns
+    """
+    sw = (sw1 << 8) | sw2
+    for value, mask in patterns:
+        if sw & mask == value:
+            return True
+    return False
@@ -0,0 +1,174 @@
+from collections import namedtuple
+from functools import lru_cache
+
+from smartcard.scard import SCARD_PROTOCOL_T0, SCARD_PROTOCOL_T1
+
+"""
+ISO 7816-3 ATR parser
+
+The ATRs are parsed once: the results are immutable and memoized by ATR in a bounded LRU cache shared by the monitoring
+threads, the card managers and the UI.
+"""
+
+# Maximum number of different ATRs kept in the cache
+ATR_CACHE_SIZE = 256
+
+DIRECT_CONVENTION = 0x3B
+INVERSE_CONVENTION = 0x3F
+
+# TA1 high nibble: (Fi, f max in MHz), low nibble: Di (ISO 7816-3 tables 7 and 8), RFU values are missing
+FI_TABLE = {0x0: (372, 4), 0x1: (372, 5), 0x2: (558, 6), 0x3: (744, 8), 0x4: (1116, 12), 0x5: (1488, 16), 0x6: (1860, 20),
+            0x9: (512, 5), 0xA: (768, 7.5), 0xB: (1024, 10), 0xC: (1536, 15), 0xD: (2048, 20)}
+DI_TABLE = {0x1: 1, 0x2: 2, 0x3: 4, 0x4: 8, 0x5: 16, 0x6: 32, 0x7: 64, 0x8: 12, 0x9: 20}
+
+# Default values when the interface bytes are absent
+DEFAULT_FI = 372
+DEFAULT_DI = 1
+DEFAULT_F_MAX = 5
+DEFAULT_IFSC = 32
+DEFAULT_BWI = 4
+DEFAULT_CWI = 13
+
+# atr: the ATR (tuple of int), convention: 'direct' or 'inverse'
+# interface_bytes: tuple of dicts {'TA': value, 'TB': value, 'TC': value, 'TD': value} of the present bytes, one per group
+# protocols: protocols offered by the card (tuple of T values), specific_protocol: protocol of the specific mode (TA2) or None
+# fi, di, f_max: clock rate conversion integer, baud rate adjustment integer and maximum clock frequency (MHz) of TA1
+# extra_guard_time: N of TC1, ifsc/bwi/cwi/crc: T=1 parameters (first TA/TB/TC for T=1)
+# tck: check byte (None if absent), tck_valid: XOR of T0 to TCK is 0 (None if there is no TCK)
+# command_chaining, extended_length: card capabilities of the historical bytes (compact-TLV tag 7X)
+AtrInfo = namedtuple('AtrInfo', ['atr', 'convention', 'interface_bytes', 'protocols', 'specific_protocol', 'fi', 'di', 'f_max', 'extra_guard_time',
+                                 'ifsc', 'bwi', 'cwi', 'crc', 'historical_bytes', 'tck', 'tck_valid', 'command_chaining', 'extended_length'])
+
+
+def getAtrInfo(atr):
+    """Parse an ATR, the result being memoized.
+
+    @param atr: ATR as a list of int, bytes or an hexadecimal string ('3B 80 80 01 01')
+    @return: AtrInfo
+    @raise Exception: if the ATR is malformed
+    """
+    if isinstance(atr, str):
+        atr = bytes.fromhex(atr)
+    return _parseAtr(tuple(atr))
+
+
+def getAtrCacheInfo():
+    """@return: hits, misses, maxsize and currsize of the ATR cache"""
+    return _parseAtr.cache_info()
+
+
+def clearAtrCache():
+    _parseAtr.cache_clear()
+
+
+def getAtrProtocol(atr_info):
+    """PC/SC protocol to connect to a card with: the specific mode one if any, else the protocols offered (T=0 and/or T=1),
+    the reader choosing between them.
+
+    @return: SCARD_PROTOCOL_T0, SCARD_PROTOCOL_T1 or SCARD_PROTOCOL_T0 | SCARD_PROTOCOL_T1, None if neither is offered
+    """
+    protocols = (atr_info.specific_protocol,) if atr_info.specific_protocol is not None else atr_info.protocols
+    protocol = (SCARD_PROTOCOL_T0 if 0 in protocols else 0) | (SCARD_PROTOCOL_T1 if 1 in protocols else 0)
+    return protocol or None
+
+
+@lru_cache(maxsize=ATR_CACHE_SIZE)
+def _parseAtr(atr):
+    if len(atr) < 2:
+        raise Exception("ATR too short: {}".format(_toHex(atr)))
+    if atr[0] == DIRECT_CONVENTION:
+        convention = 'direct'
+    elif atr[0] == INVERSE_CONVENTION:
+        convention = 'inverse'
+    else:
+        raise Exception("Invalid ATR initial character (TS): {:02X}".format(atr[0]))
+
+    # Interface bytes
+    interface_bytes = []
+    group_protocols = []
+    index = 2
+    y = atr[1] >> 4
+    protocol = 0
+    while True:
+        group = {}
+        for name, bit in (('TA', 0x1), ('TB', 0x2), ('TC', 0x4), ('TD', 0x8)):
+            if y & bit:
+                if index >= len(atr):
+                    raise Exception("ATR truncated in the interface bytes: {}".format(_toHex(atr)))
+                group[name] = atr[index]
+                index += 1
+        interface_bytes.append(group)
+        group_protocols.append(protocol)
+        if 'TD' not in group:
+            break
+        y = group['TD'] >> 4
+        protocol = group['TD'] & 0x0F
+
+    protocols = sorted(set(group['TD'] & 0x0F for group in interface_bytes if 'TD' in group) - {15}) or [0]
+
+    # Historical bytes and check byte
+    historical_length = atr[1] & 0x0F
+    historical_bytes = atr[index:index + historical_length]
+    if len(historical_bytes) < historical_length:
+        raise Exception("ATR truncated in the historical bytes: {}".format(_toHex(atr)))
+    index += historical_length
+    tck = None
+    tck_valid = None
+    if protocols != [0] or index < len(atr):
+        if index >= len(atr):
+            raise Exception("ATR without its check byte (TCK): {}".format(_toHex(atr)))
+        tck = atr[index]
+        checksum = 0
+        for byte in atr[1:index + 1]:
+            checksum ^= byte
+        tck_valid = checksum == 0
+
+    # Global parameters
+    first = interface_bytes[0]
+    fi, f_max = FI_TABLE.get(first['TA'] >> 4, (None, None)) if 'TA' in first else (DEFAULT_FI, DEFAULT_F_MAX)
+    di = DI_TABLE.get(first['TA'] & 0x0F) if 'TA' in first else DEFAULT_DI
+    extra_guard_time = first.get('TC', 0)
+    specific_protocol = None
+    if len(interface_bytes) > 1 and 'TA' in interface_bytes[1]:
+        specific_protocol = interface_bytes[1]['TA'] & 0x0F
+
+    # T=1 parameters: first TA, TB and TC of the groups following a TD indicating T=1 (from the third group)
+    ifsc, bwi, cwi, crc = None, None, None, None
+    if 1 in protocols:
+        ifsc, bwi, cwi, crc = DEFAULT_IFSC, DEFAULT_BWI, DEFAULT_CWI, False
+        t1_groups = [group for i, group in enumerate(interface_bytes) if i >= 2 and group_protocols[i] == 1]
+        if t1_groups:
+            if 'TA' in t1_groups[0]:
+                ifsc = t1_groups[0]['TA']
+            if 'TB' in t1_groups[0]:
+                bwi, cwi = t1_groups[0]['TB'] >> 4, t1_groups[0]['TB'] & 0x0F
+            if 'TC' in t1_groups[0]:
+                crc = bool(t1_groups[0]['TC'] & 0x01)
+
+    command_chaining, extended_length = _getCardCapabilities(historical_bytes)
+
+    return AtrInfo(atr, convention, tuple(interface_bytes), tuple(protocols), specific_protocol, fi, di, f_max, extra_guard_time,
+                   ifsc, bwi, cwi, crc, tuple(historical_bytes), tck, tck_valid, command_chaining, extended_length)
+
+
+def _getCardCapabilities(historical_bytes):
+    """Command chaining and extended Lc and Le fields bits of the card capabilities (third software function table,
+    compact-TLV tag 7X) in the historical bytes.
+
+    @return: (command_chaining, extended_length)
+    """
+    if not historical_bytes or historical_bytes[0] not in (0x00, 0x80):
+        return False, False
+    # Category 00: the last 3 bytes are the status indicator
+    end = len(historical_bytes) - 3 if historical_bytes[0] == 0x00 else len(historical_bytes)
+    index = 1
+    while index < end:
+        tag, length = historical_bytes[index] >> 4, historical_bytes[index] & 0x0F
+        if tag == 0x07 and length >= 3 and index + 3 < end:
+            return bool(historical_bytes[index + 3] & 0x80), bool(historical_bytes[index + 3] & 0x40)
+        index += 1 + length
+    return False, False
+
+
+def _toHex(atr):
+    return ' '.join('{:02X}'.format(byte) for byte in atr)
@@ -27,6 +27,8 @@ def printCardMenu():
     print("=============== Card menu ===============")
     print("(t) : transmit")
     print("(i) : info about card")
+    print("(s) : show operations statistics")
+    print("(f) : dump a file (READ BINARY / READ RECORD)")
     print("(r) : reconnect")
     print("(d) : disconnect")
     print("(w) : warm reset")
@@ -37,7 +39,7 @@ def printCardMenu():
 
 def printShortCardMenu():
     print("============= Select action =============")
-    print("(t|i|r|d|w|c|e|h)")
+    print("(t|i|s|f|r|d|w|c|e|h)")
 
 
 def printTransmitMenu():
@@ -94,3 +96,57 @@ def printDisconnectedCard():
 
 def printTransmitDisconnectedCard():
     print("Error while transmiting message : Card disconnected")
+
+
+def printFileDump(file_reader):
+    print("\tread : {} bytes in {} exchanges, {:.3f} s ({:.0f} bytes/s)".format(file_reader.bytes_read, file_reader.round_trips, file_reader.duration,
+                                                                        file_reader.getThroughput()))
+
+
+def printScriptResult(result):
+    print("-------- SCRIPT {} --------".format(result.script.name))
+    for line, apdu, sw, expected in result.failures:
+        print("\tline {} : {} > {} (expected {})".format(line, apdu, sw, ' or '.join(expected)))
+    print("\t{} / {} APDUs sent{} in {} exchanges, {:.3f} s ({:.0f} APDUs/s)".format(result.apdus, result.script.apdu_count, " (stopped)" if result.stopped else "",
+                                                                                 result.round_trips, result.duration, result.getThroughput()))
+    print("\t{} failed expectations".format(len(result.failures)))
+
+
+def printProvisioningProgress(stats):
+    print("provisioned : {}, failed : {}, in progress : {}, retries : {}, {:.1f} cards/min".format(stats['provisioned'], stats['failed'], stats['in_progress'],
+                                                                                             stats['retried'], stats['cards_per_minute']))
+
+
+def printProvisioningStats(stats, failed_cards):
+    print("------------------------- PROVISIONING -------------------------")
+    printProvisioningProgress(stats)
+    print("{:<8} {:>7} {:>7} {:>10} {:>10} {:>10} {:>10}".format("stage", "count", "errors", "mean (ms)", "p50 (ms)", "p95 (ms)", "max (ms)"))
+    for stage in stats['stages']:
+        print("{:<8} {:>7} {:>7} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}".format(stage['stage'], stage['count'], stage['errors'], stage['mean'] * 1e3,
+                                                                              stage['p50'] * 1e3, stage['p95'] * 1e3, stage['max'] * 1e3))
+    for reader, atr, error in failed_cards:
+        print("failed : {} : {}".format(reader, error))
+    print("----------------------------------------------------------------")
+
+
+def printRoundTrips(round_trips):
+    print("\tround trips : {} (GET RESPONSE / Le correction)".format(round_trips))
+
+
+def printStats(stats):
+    print("------------------------------------- STATISTICS -------------------------------------")
+    print("{:<11} {:<24} {:>4} {:>5} {:>7} {:>9} {:>9} {:>9} {:>9}".format("operation", "reader", "INS", "SW", "count", "p50 (ms)", "p95 (ms)", "p99 (ms)", "max (ms)"))
+    for operation in stats['operations']:
+        print("{:<11} {:<24} {:>4} {:>5} {:>7} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f}".format(operation['operation'],
+                                                                                      str(operation['reader'])[:24],
+                                                                                      '' if operation['ins'] is None else '{:02X}'.format(operation['ins']),
+                                                                                      operation['sw_class'] or '',
+                                                                                      operation['count'],
+                                                                                      operation['p50'] * 1e3,
+                                                                                      operation['p95'] * 1e3,
+                                                                                      operation['p99'] * 1e3,
+                                                                                      operation['max'] * 1e3))
+    for error in stats['errors']:
+        print("errors : {} on {} : {}".format(error['operation'], error['reader'], error['count']))
+    print("reconnections and resets : {}".format(stats['reconnects']))
+    print("--------------------------------------------------------------------------------------")